@@ -1,19 +1,30 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph
-from typing import Dict, Any
-from main import load_json_file
+from asset_store import Snapshot, store
+from search_index import search_rows
+
+
+def _snapshot(config: Optional[RunnableConfig]) -> Snapshot:
+    # batches pin one snapshot in the run config; single calls read the store
+    snapshot = ((config or {}).get("configurable") or {}).get("snapshot")
+    return snapshot if snapshot is not None else store.get()
+
 
-def algo_node(state: Dict[str, Any]) -> Dict[str, Any]:
+def algo_node(state: Dict[str, Any], config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     show = int(state.get("show", 5))
-    if load_json_file:
-        try:
-            data = load_json_file("enriched_coins.json")
-        except Exception:
-            data = load_json_file("coins.json")
-    else:
-        data = load_json_file("coins.json")
+    query = (state.get("query") or "").strip()
+    snapshot = _snapshot(config)
+    if query:
+        lines = []
+        for m in search_rows(snapshot, query, show):
+            lines.append(f"{m['symbol']} — {m['name']} (price: {m['price']}, match: {m['match']})")
+        return {"result": "\n".join(lines) if lines else f"No asset matches '{query}'"}
 
+    # the store already resolves enriched_coins.json, then coins.json
     lines = []
-    for item in data[:show]:
+    for item in snapshot.assets[:show]:
         sym = (item.get("symbol") or "").upper()
         name = item.get("name") or ""
         price = None
@@ -30,3 +41,38 @@ graph.set_entry_point("algo")
 graph.set_finish_point("algo")
 
 agent = graph.compile()
+
+
+def _batch_config(snapshot: Optional[Snapshot], max_concurrency: Optional[int]) -> RunnableConfig:
+    config: RunnableConfig = {"configurable": {"snapshot": snapshot if snapshot is not None else store.get()}}
+    if max_concurrency:
+        config["max_concurrency"] = max_concurrency
+    return config
+
+
+def _item(index: int, output: Any) -> Dict[str, Any]:
+    if isinstance(output, Exception):
+        return {"index": index, "error": f"{type(output).__name__}: {output}"}
+    return {"index": index, "output": output}
+
+
+def run_batch(payloads: Sequence[Dict[str, Any]], snapshot: Optional[Snapshot] = None,
+              max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Run every payload through the graph against one snapshot, results in input order.
+
+    A failing payload yields an {"index", "error"} item instead of failing the batch.
+    """
+    if not payloads:
+        return []
+    outputs = agent.batch(list(payloads), _batch_config(snapshot, max_concurrency), return_exceptions=True)
+    return [_item(i, out) for i, out in enumerate(outputs)]
+
+
+def run_batch_as_completed(payloads: Sequence[Dict[str, Any]], snapshot: Optional[Snapshot] = None,
+                           max_concurrency: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    # same as run_batch, but each item is yielded as soon as it finishes
+    if not payloads:
+        return
+    for i, out in agent.batch_as_completed(list(payloads), _batch_config(snapshot, max_concurrency),
+                                           return_exceptions=True):
+        yield _item(i, out)
@@ -0,0 +1,335 @@
+# asset_listing.py
+import base64
+import json
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional: /assets needs numpy
+    np = None
+
+import metrics
+import scoring
+from asset_store import Snapshot
+from dataset_db import SqliteDataset
+
+NUMBER_FIELDS = ("cmc_rank", "price", "market_cap", "volume_24h", "percent_change_24h")
+STRING_FIELDS = ("name", "symbol", "slug", "binance_pair", "coinbase_pair", "okx_pair")
+FIELDS = ("id",) + STRING_FIELDS + NUMBER_FIELDS + ("score",)
+DEFAULT_FIELDS = ("id", "name", "symbol", "price", "market_cap", "score", "binance_pair", "coinbase_pair")
+
+# sort key -> default direction; "rank" is dataset (CMC) order
+SORT_KEYS = {
+    "rank": "asc",
+    "market_cap": "desc",
+    "score": "desc",
+    "volume_24h": "desc",
+    "percent_change_24h": "desc",
+    "price": "desc",
+    "symbol": "asc",
+}
+
+
+class CursorError(ValueError):
+    pass
+
+
+def available() -> bool:
+    return np is not None
+
+
+def _strings(assets: Sequence[Dict[str, Any]], name: str) -> List[Optional[str]]:
+    if hasattr(assets, "string"):
+        col = assets.string(name)
+        return [col[i] for i in range(len(col))]
+    return [a.get(name) for a in assets]
+
+
+def _float(v) -> float:
+    try:
+        return float(v) if v is not None else float("nan")
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _numbers(assets: Sequence[Dict[str, Any]], name: str):
+    # float64 column, NaN = missing
+    if hasattr(assets, "column"):
+        return np.asarray(assets.column(name), dtype=np.float64)
+    if name == "cmc_rank":
+        return np.array([_float(a.get(name)) for a in assets], dtype=np.float64)
+    out = np.empty(len(assets), dtype=np.float64)
+    for i, a in enumerate(assets):
+        q = a.get("quote")
+        usd = (q.get("USD") or {}) if isinstance(q, dict) else {}
+        out[i] = _float(usd.get(name))
+    return out
+
+
+def encode_cursor(sort: str, order: str, value: Any, pos: int) -> str:
+    raw = json.dumps([sort, order, value, pos], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, order: str) -> Tuple[Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        c_sort, c_order, value, pos = json.loads(raw)
+    except (ValueError, TypeError):
+        raise CursorError("malformed cursor")
+    if (c_sort, c_order) != (sort, order):
+        raise CursorError("cursor was issued for a different sort")
+    # the value is compared against the sort's column, so its type must match what encode_cursor wrote
+    number = lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)
+    if sort == "rank":
+        valid = number(value) and float(value).is_integer()
+    elif sort == "symbol":
+        valid = isinstance(value, str)
+    else:
+        valid = value is None or number(value)
+    if not valid or not number(pos) or not float(pos).is_integer():
+        raise CursorError("malformed cursor")
+    return value, int(pos)
+
+
+class AssetListing:
+    """Column data for one snapshot, built once and shared by every /assets request.
+
+    Values live in flat columns (NumPy for numbers); each sort order is a
+    position permutation computed on first use. Pages are cut from the
+    permutation after filter masks, and cursors are keysets (sort value,
+    position), so they stay valid across snapshot swaps.
+    """
+
+    def __init__(self, snapshot: Snapshot):
+        assets = snapshot.assets
+        self.count = len(assets)
+        if hasattr(assets, "column"):
+            ids = [int(x) for x in assets.column("id")]
+        else:
+            ids = [a.get("id") for a in assets]
+        self.values: Dict[str, Any] = {"id": ids}
+        for f in STRING_FIELDS:
+            self.values[f] = _strings(assets, f)
+        for f in NUMBER_FIELDS:
+            self.values[f] = _numbers(assets, f)
+        self.values["score"] = np.asarray(scoring.scores(snapshot), dtype=np.float64)
+        cols = scoring.columns(snapshot)
+        self.has = {ex: np.asarray(cols["has_" + ex], dtype=np.bool_) for ex in ("binance", "coinbase", "okx")}
+        self.pos = np.arange(self.count)
+        self._orders: Dict[Tuple[str, str], Tuple[Any, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _sort_values(self, sort: str):
+        if sort == "rank":
+            return self.pos
+        if sort == "symbol":
+            return np.array([(s or "").upper() for s in self.values["symbol"]], dtype=object)
+        return self.values[sort]
+
+    def order(self, sort: str, order: str):
+        # (permutation, sort keys in permutation order); cached per snapshot
+        key = (sort, order)
+        cached = self._orders.get(key)
+        if cached is not None:
+            return cached
+        with self._lock:
+            cached = self._orders.get(key)
+            if cached is None:
+                vals = self._sort_values(sort)
+                if vals.dtype == object:
+                    # strings: lexsort on dense codes, keys stay strings for cursor comparisons
+                    codes = {v: c for c, v in enumerate(sorted(set(vals.tolist())))}
+                    primary = np.array([codes[v] for v in vals.tolist()], dtype=np.float64)
+                    nan = np.zeros(self.count, dtype=np.bool_)
+                else:
+                    nan = np.isnan(vals) if vals.dtype.kind == "f" else np.zeros(self.count, dtype=np.bool_)
+                    primary = np.where(nan, 0.0, vals)
+                # ties in position order; missing numbers last in either direction
+                perm = np.lexsort((self.pos, -primary if order == "desc" else primary, nan))
+                cached = (perm, vals[perm])
+                self._orders[key] = cached
+            return cached
+
+    def select(self, sort: str = "rank", order: Optional[str] = None, cursor: Optional[str] = None,
+               limit: int = 100, has_binance: Optional[bool] = None, has_coinbase: Optional[bool] = None,
+               min_market_cap: Optional[float] = None):
+        """Positions for one page plus (total matching, next cursor)."""
+        if sort not in SORT_KEYS:
+            raise ValueError(f"unknown sort key {sort!r}")
+        order = order or SORT_KEYS[sort]
+        perm, keys = self.order(sort, order)
+
+        mask = np.ones(self.count, dtype=np.bool_)
+        if has_binance is not None:
+            mask &= self.has["binance"] == has_binance
+        if has_coinbase is not None:
+            mask &= self.has["coinbase"] == has_coinbase
+        if min_market_cap is not None:
+            mask &= self.values["market_cap"] >= min_market_cap  # NaN never matches
+        keep = mask[perm]
+        perm, keys = perm[keep], keys[keep]
+        total = len(perm)
+
+        start = 0
+        if cursor:
+            value, pos = decode_cursor(cursor, sort, order)
+            start = self._after(keys, perm, value, pos, order)
+        end = min(total, start + limit)
+        page = perm[start:end]
+        next_cursor = None
+        if end < total and len(page):
+            last = int(page[-1])
+            next_cursor = encode_cursor(sort, order, self._cursor_value(sort, last), last)
+        return page, total, next_cursor
+
+    def _cursor_value(self, sort: str, i: int):
+        if sort == "rank":
+            return i
+        if sort == "symbol":
+            return (self.values["symbol"][i] or "").upper()
+        v = float(self.values[sort][i])
+        return None if v != v else v
+
+    def _after(self, keys, perm, value, pos: int, order: str) -> int:
+        # number of entries at or before (value, pos) in this order
+        if keys.dtype == object:
+            value = "" if value is None else str(value)
+            ahead = (keys > value) if order == "desc" else (keys < value)
+            return int(np.count_nonzero(ahead | ((keys == value) & (perm <= pos))))
+        nan = np.isnan(keys) if keys.dtype.kind == "f" else np.zeros(len(keys), dtype=np.bool_)
+        if value is None:
+            # cursor inside the missing-value tail, which is in position order
+            return int(np.count_nonzero(~nan) + np.count_nonzero(nan & (perm <= pos)))
+        with np.errstate(invalid="ignore"):
+            ahead = (keys > value) if order == "desc" else (keys < value)
+            return int(np.count_nonzero(ahead | ((keys == value) & (perm <= pos))))
+
+    def row(self, i: int, fields: Sequence[str]) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for f in fields:
+            v = self.values[f][i]
+            if f in NUMBER_FIELDS or f == "score":
+                v = float(v)
+                v = None if v != v else (int(v) if f == "cmc_rank" else v)
+            elif f == "symbol":
+                v = (v or "").upper()
+            out[f] = v
+        return out
+
+    def rows(self, positions, fields: Sequence[str]) -> Iterator[Dict[str, Any]]:
+        for i in positions.tolist():
+            yield self.row(i, fields)
+
+
+class SqlListing:
+    """AssetListing over a SqliteDataset, answered by indexed keyset queries.
+
+    Nothing is copied into the worker: each page reads its positions with
+    SqliteDataset.page() and decodes only those records. Same sorts,
+    filters, cursors and row fields as AssetListing, except that the build's
+    market_cap column holds 0 for a missing market cap, so such rows sort
+    and filter as 0 instead of coming last.
+    """
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+        self.ds: SqliteDataset = snapshot.assets
+        self.count = len(self.ds)
+        self._fallback: Optional[AssetListing] = None
+        self._lock = threading.Lock()
+
+    def _stale_score(self) -> Optional[AssetListing]:
+        # the default profile changed since the build, so the score column can't be sorted on;
+        # rank in memory until the next build (the refresh rebuilds it)
+        with self._lock:
+            if self._fallback is None:
+                self._fallback = AssetListing(self.snapshot)
+            return self._fallback
+
+    def select(self, sort: str = "rank", order: Optional[str] = None, cursor: Optional[str] = None,
+               limit: int = 100, has_binance: Optional[bool] = None, has_coinbase: Optional[bool] = None,
+               min_market_cap: Optional[float] = None):
+        if sort not in SORT_KEYS:
+            raise ValueError(f"unknown sort key {sort!r}")
+        order = order or SORT_KEYS[sort]
+        if sort == "score" and not self.ds._score_current():
+            fallback = self._stale_score()
+            page, total, next_cursor = fallback.select(sort, order, cursor, limit, has_binance=has_binance,
+                                                       has_coinbase=has_coinbase, min_market_cap=min_market_cap)
+            return page.tolist(), total, next_cursor
+
+        clauses: List[str] = []
+        params: List[Any] = []
+        for ex, want in (("binance", has_binance), ("coinbase", has_coinbase)):
+            if want is not None:
+                clauses.append(f"IFNULL({ex}_pair, '') {'<>' if want else '='} ''")
+        if min_market_cap is not None:
+            clauses.append("market_cap >= ?")
+            params.append(min_market_cap)
+        where = " AND ".join(clauses)
+
+        after = decode_cursor(cursor, sort, order) if cursor else None
+        keys = self.ds.page("pos" if sort == "rank" else sort, order, after, limit + 1, where, params)
+        next_cursor = None
+        if len(keys) > limit:
+            keys = keys[:limit]
+            value, pos = keys[-1]
+            if sort == "rank":
+                value = pos
+            elif sort == "symbol":
+                value = (value or "").upper()
+            next_cursor = encode_cursor(sort, order, value, pos)
+        return [pos for _, pos in keys], self.ds.count_where(where, params), next_cursor
+
+    def rows(self, positions, fields: Sequence[str]) -> Iterator[Dict[str, Any]]:
+        profile = scoring.get_profile("default")
+        for r in self.ds.records(positions):
+            q = r.get("quote")
+            usd = (q.get("USD") or {}) if isinstance(q, dict) else {}
+            out: Dict[str, Any] = {}
+            for f in fields:
+                if f == "score":
+                    v = float(scoring.score_record(r, profile))
+                elif f in NUMBER_FIELDS:
+                    v = _float(r.get(f) if f == "cmc_rank" else usd.get(f))
+                    v = None if v != v else (int(v) if f == "cmc_rank" else v)
+                elif f == "symbol":
+                    v = (r.get(f) or "").upper()
+                else:
+                    v = r.get(f)
+                out[f] = v
+            yield out
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    if not fields:
+        return DEFAULT_FIELDS
+    out = tuple(f.strip() for f in fields.split(",") if f.strip())
+    unknown = [f for f in out if f not in FIELDS]
+    if unknown:
+        raise ValueError(f"unknown field(s): {', '.join(unknown)}; available: {', '.join(FIELDS)}")
+    return out
+
+
+# one listing per data file, tied to the snapshot it was built from
+_listings: Dict[str, Tuple[Snapshot, Any]] = {}
+_listings_lock = threading.Lock()
+
+
+def get_listing(snapshot: Snapshot):
+    cached = _listings.get(snapshot.path)
+    if cached is not None and cached[0] is snapshot:
+        return cached[1]
+    with _listings_lock:
+        cached = _listings.get(snapshot.path)
+        if cached is not None and cached[0] is snapshot:
+            return cached[1]
+        if isinstance(snapshot.assets, SqliteDataset):
+            listing = SqlListing(snapshot)  # queried per page; nothing to build
+        else:
+            with metrics.timer("index_build_seconds", index="listing", mode="full"):
+                listing = AssetListing(snapshot)
+        _listings[snapshot.path] = (snapshot, listing)
+        return listing
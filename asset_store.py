@@ -0,0 +1,199 @@
+# asset_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import columnar
+import dataset_db
+import metrics
+
+DATA_FILES = ("enriched_coins.json", "coins.json")
+
+
+def load_json_file(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found")
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError(f"{path} does not contain a JSON list")
+    return data
+
+
+def resolve_data_file(candidates: Sequence[str] = DATA_FILES) -> str:
+    # first existing file wins; fall back to the last candidate so the error names it
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    return candidates[-1]
+
+
+@dataclass(frozen=True, eq=False)
+class Snapshot:
+    version: int
+    path: str
+    mtime_ns: int
+    size: int
+    assets: Sequence[Dict[str, Any]]  # tuple of dicts, a mmap'd ColumnarDataset or a SqliteDataset
+    loaded_at: float
+    load_seconds: float
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "path": self.path,
+            "records": len(self.assets),
+            "mtime_ns": self.mtime_ns,
+            "size": self.size,
+            "loaded_at": self.loaded_at,
+            "load_seconds": round(self.load_seconds, 6),
+        }
+
+
+class AssetStore:
+    """Process-wide dataset cache.
+
+    The file is parsed once and kept as an immutable Snapshot. Each get() does a
+    single stat(); a new snapshot is built only when the file path, mtime or size
+    changes, and is published with one reference assignment so readers never see
+    a partially loaded list.
+    """
+
+    def __init__(self, candidates: Sequence[str] = DATA_FILES, columnar_dir: Optional[str] = None,
+                 sqlite_path: Optional[str] = None):
+        self.candidates = tuple(candidates)
+        self.columnar_dir = columnar_dir
+        self.sqlite_path = sqlite_path
+        self._snapshot: Optional[Snapshot] = None
+        self._lock = threading.Lock()
+        self._version = 0
+        self._sources: Dict[str, Tuple[Tuple[int, int], Optional[str]]] = {}
+
+    def _build_source(self, path: str, st: os.stat_result) -> Optional[str]:
+        # the JSON file a columnar/SQLite build was made from; re-read only when the build changes
+        ident = (st.st_mtime_ns, st.st_size)
+        hit = self._sources.get(path)
+        if hit is not None and hit[0] == ident:
+            return hit[1]
+        if self.sqlite_path and path == self.sqlite_path:
+            source = dataset_db.read_meta(path).get("source")
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                source = json.load(f).get("source")
+        self._sources[path] = (ident, source)
+        return source
+
+    def _serves(self, build: str, path: str) -> Optional[Tuple[str, int, int]]:
+        # a build stands in for the JSON only if it was made from that file and is not older than it
+        try:
+            st = os.stat(build)
+            if not os.path.exists(path):
+                return build, st.st_mtime_ns, st.st_size
+            source = self._build_source(build, st)
+            if (source is not None and os.path.abspath(source) == os.path.abspath(path)
+                    and st.st_mtime_ns >= os.stat(path).st_mtime_ns):
+                return build, st.st_mtime_ns, st.st_size
+        except (OSError, ValueError, sqlite3.Error):
+            pass
+        return None
+
+    def _file_key(self) -> Tuple[str, int, int]:
+        path = resolve_data_file(self.candidates)
+        if self.sqlite_path:
+            key = self._serves(self.sqlite_path, path)
+            if key is not None:
+                return key
+        if self.columnar_dir and columnar.available():
+            # prefer the columnar build unless the JSON has been rewritten since
+            key = self._serves(columnar.meta_path(self.columnar_dir), path)
+            if key is not None:
+                return key
+        st = os.stat(path)  # raises FileNotFoundError like load_json_file
+        return path, st.st_mtime_ns, st.st_size
+
+    def _load(self, path: str) -> Sequence[Dict[str, Any]]:
+        if self.sqlite_path and path == self.sqlite_path:
+            return dataset_db.SqliteDataset(path)
+        if self.columnar_dir and path == columnar.meta_path(self.columnar_dir):
+            return columnar.ColumnarDataset(self.columnar_dir)
+        return tuple(load_json_file(path))
+
+    def _backend(self, path: str) -> str:
+        if self.sqlite_path and path == self.sqlite_path:
+            return "sqlite"
+        if self.columnar_dir and path == columnar.meta_path(self.columnar_dir):
+            return "columnar"
+        return "json"
+
+    def _is_current(self, snap: Optional[Snapshot], key: Tuple[str, int, int]) -> bool:
+        return snap is not None and (snap.path, snap.mtime_ns, snap.size) == key
+
+    def get(self) -> Snapshot:
+        key = self._file_key()
+        snap = self._snapshot
+        if self._is_current(snap, key):
+            return snap
+
+        with self._lock:
+            # another thread may have reloaded while we waited
+            snap = self._snapshot
+            key = self._file_key()
+            if self._is_current(snap, key):
+                return snap
+
+            t0 = time.perf_counter()
+            data = self._load(key[0])
+            elapsed = time.perf_counter() - t0
+            metrics.observe("dataset_load_seconds", elapsed, backend=self._backend(key[0]))
+
+            self._version += 1
+            snap = Snapshot(
+                version=self._version,
+                path=key[0],
+                mtime_ns=key[1],
+                size=key[2],
+                assets=data,
+                loaded_at=time.time(),
+                load_seconds=elapsed,
+            )
+            self._snapshot = snap
+            return snap
+
+    def peek(self) -> Optional[Snapshot]:
+        # non-blocking read for async callers: the published snapshot if the file is
+        # unchanged or another thread is already reloading it; None if a load is needed
+        snap = self._snapshot
+        if snap is None:
+            return None
+        try:
+            key = self._file_key()
+        except OSError:
+            return None  # let get() raise
+        if self._is_current(snap, key) or self._lock.locked():
+            return snap
+        return None
+
+    def current(self) -> Optional[Snapshot]:
+        # last published snapshot without touching the filesystem
+        return self._snapshot
+
+    def stats(self) -> Dict[str, Any]:
+        snap = self._snapshot
+        if snap is None:
+            return {"version": 0, "loaded": False}
+        out = snap.stats()
+        out["loaded"] = True
+        return out
+
+
+# shared instance used by the API and agent entry points
+store = AssetStore(columnar_dir=columnar.COLUMNAR_DIR,
+                   sqlite_path=dataset_db.DATASET_DB if dataset_db.enabled() else None)
+
+
+def get_snapshot() -> Snapshot:
+    return store.get()
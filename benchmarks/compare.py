@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark result files written by benchmarks/run.py.
+
+  python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+from typing import Dict, Optional, Tuple
+
+
+def headline(r: Dict) -> Optional[Tuple[str, float]]:
+    # one comparable number per result: median seconds, or p50 latency for http
+    if "seconds" in r:
+        return "s", r["seconds"]["median"]
+    if "latency_ms" in r:
+        return "ms p50", r["latency_ms"]["p50"]
+    return None
+
+
+def index(report: Dict) -> Dict[Tuple[str, int], Dict]:
+    return {(r["bench"], r["size"]): r for r in report["results"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark runs")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    with open(args.before, "r", encoding="utf-8") as f:
+        before = index(json.load(f))
+    with open(args.after, "r", encoding="utf-8") as f:
+        after = index(json.load(f))
+
+    print(f"{'bench':<48} {'size':>9} {'before':>12} {'after':>12} {'ratio':>7}")
+    for key in sorted(set(before) | set(after)):
+        b, a = before.get(key), after.get(key)
+        hb = headline(b) if b else None
+        ha = headline(a) if a else None
+        unit = (ha or hb)[0] if (ha or hb) else ""
+        vb = f"{hb[1]:.4f}" if hb else "-"
+        va = f"{ha[1]:.4f}" if ha else "-"
+        ratio = f"{ha[1] / hb[1]:.2f}x" if ha and hb and hb[1] else ""
+        print(f"{key[0]:<48} {key[1]:>9} {vb:>12} {va:>12} {ratio:>7}  {unit}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the Algo Hunter hot paths.
+
+Every run writes machine-readable JSON so two runs can be compared with
+benchmarks/compare.py.
+
+Usage examples:
+  # everything on 10k / 100k / 1M synthetic records
+  python -m benchmarks.run --out bench.json
+
+  # quick run on one size, selected benches only
+  python -m benchmarks.run --sizes 10000 --only load,rank,http --out bench.json
+
+  # cold import time of each entry point (fresh interpreter per run)
+  python -m benchmarks.run --only boot --out bench.json
+
+  # compare two runs
+  python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import asyncio
+import contextlib
+import dataclasses
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO not in sys.path:
+    sys.path.insert(0, REPO)
+
+# keys the apps check; set before they are imported (load_dotenv never overrides)
+os.environ.setdefault("CMC_API_KEY", "bench")
+os.environ.setdefault("API_KEY", "bench")
+os.environ.setdefault("ALGO_API_KEY", "bench")
+os.environ.setdefault("PROBE_CACHE", "0")  # the enrich benches measure network probing; enrich.cached opts in
+
+from benchmarks.synthetic import records, write_dataset  # noqa: E402
+from benchmarks.stub_exchange import StubExchange  # noqa: E402
+
+BENCHES = ["load", "rank", "leaderboard", "enrich", "http", "boot"]
+BOOT_MODULES = ["main", "api", "langgraph_server", "multi_fetcher"]
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def timed(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return {
+        "runs": repeat,
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "mean": statistics.fmean(runs),
+        "max": max(runs),
+    }
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    s = sorted(samples)
+
+    def pct(p):
+        return s[min(len(s) - 1, int(round(p / 100 * (len(s) - 1))))] * 1000
+
+    return {"p50": pct(50), "p95": pct(95), "p99": pct(99), "max": s[-1] * 1000}
+
+
+def repeats_for(size: int) -> int:
+    return 5 if size <= 10_000 else 3 if size <= 100_000 else 1
+
+
+# ---------------- BENCHES ----------------
+def bench_load(size: int, out: List[Dict]):
+    from asset_store import AssetStore, load_json_file
+    import columnar
+
+    rep = repeats_for(size)
+    out.append({"bench": "load.load_json_file", "size": size,
+                "seconds": timed(lambda: load_json_file("enriched_coins.json"), rep)})
+    out.append({"bench": "load.asset_store_cold", "size": size,
+                "seconds": timed(lambda: AssetStore(("enriched_coins.json",)).get(), rep)})
+    warm = AssetStore(("enriched_coins.json",))
+    warm.get()
+    out.append({"bench": "load.asset_store_warm_x1000", "size": size,
+                "seconds": timed(lambda: [warm.get() for _ in range(1000)], rep)})
+
+    if columnar.available():
+        data = load_json_file("enriched_coins.json")
+        out.append({"bench": "load.columnar_build", "size": size,
+                    "seconds": timed(lambda: columnar.build_columns(data, columnar.COLUMNAR_DIR, source="enriched_coins.json"), 1)})
+        del data
+        out.append({"bench": "load.columnar_open", "size": size,
+                    "seconds": timed(lambda: columnar.ColumnarDataset(columnar.COLUMNAR_DIR), rep)})
+
+
+def _legacy_top10(assets):
+    # the pre-index /top10 path: score every coin in Python, full sort, slice
+    scored = []
+    for c in assets:
+        mc = c.get("quote", {}).get("USD", {}).get("market_cap", 0) or 0
+        binance = 1 if c.get("binance_pair") else 0
+        coinbase = 1 if c.get("coinbase_pair") else 0
+        score = (binance * 150) + (coinbase * 90) + (0 if mc == 0 else (mc ** 0.5))
+        scored.append((score, c))
+    return sorted(scored, key=lambda x: x[0], reverse=True)[:10]
+
+
+def bench_rank(size: int, out: List[Dict]):
+    from asset_store import AssetStore
+    import ranking
+    import scoring
+
+    rep = repeats_for(size)
+    snap = AssetStore(("enriched_coins.json",)).get()
+    assets = snap.assets
+
+    out.append({"bench": "rank.legacy_sort_top10", "size": size,
+                "seconds": timed(lambda: _legacy_top10(assets), rep)})
+    out.append({"bench": "rank.index_build_python", "size": size,
+                "seconds": timed(lambda: ranking.RankingIndex(assets).top_k(10), rep)})
+    if scoring.np is not None:
+        def vector_build():
+            s = dataclasses.replace(snap)  # new identity -> cold scoring cache
+            values = {"score": scoring.scores(s).tolist(), "market_cap": scoring.columns(s)["market_cap"].tolist()}
+            return ranking.RankingIndex(assets, values=values).top_k(10)
+
+        out.append({"bench": "rank.index_build_vectorized", "size": size,
+                    "seconds": timed(vector_build, rep)})
+    idx = ranking.get_index(snap)
+    idx.top_k(10)
+    out.append({"bench": "rank.top10_warm_x1000", "size": size,
+                "seconds": timed(lambda: [idx.top_k(10) for _ in range(1000)], rep)})
+
+
+def bench_leaderboard(size: int, out: List[Dict]):
+    import leaderboard
+
+    def run():
+        # the CLI build (every board, size and format plus top10.csv) into a scratch directory
+        with tempfile.TemporaryDirectory() as d, contextlib.redirect_stdout(io.StringIO()):
+            leaderboard.main(["--out", d, "--csv", os.path.join(d, "top10.csv")])
+
+    out.append({"bench": "leaderboard.csv_export", "size": size,
+                "seconds": timed(run, repeats_for(size))})
+
+
+def bench_enrich(n: int, latency: float, concurrency: int, out: List[Dict]):
+    import multi_fetcher
+
+    coins = list(records(n, seed=7))
+    syms = [c["symbol"] for c in coins]
+    stub = StubExchange(
+        binance=[s + "USDT" for s in syms[::10]],
+        coinbase=syms[::15],
+        okx=[s + "-USDT" for s in syms[::20]],
+        latency=latency,
+    ).start()
+    saved = (multi_fetcher.BINANCE_TICKER, multi_fetcher.COINBASE_SPOT)
+    try:
+        multi_fetcher.BINANCE_TICKER = stub.url + "/api/v3/ticker/price?symbol={}"
+        multi_fetcher.COINBASE_SPOT = stub.url + "/v2/prices/{}-USD/spot"
+
+        stub.requests = 0
+        t = timed(lambda: multi_fetcher.enrich_batch(coins, exchange_delay=0), 1)
+        out.append({"bench": "enrich.serial", "size": n, "latency_s": latency,
+                    "requests": stub.requests, "seconds": t})
+
+        if hasattr(multi_fetcher, "enrich_batch_concurrent"):
+            from concurrent.futures import ThreadPoolExecutor
+            stub.requests = 0
+            with ThreadPoolExecutor(max_workers=concurrency) as ex:
+                limiter = multi_fetcher.HostRateLimiter(0)  # unlimited: measure the engine, not the budget
+                t = timed(lambda: multi_fetcher.enrich_batch_concurrent(coins, ex, limiter), 1)
+            out.append({"bench": "enrich.concurrent", "size": n, "latency_s": latency, "concurrency": concurrency,
+                        "requests": stub.requests, "seconds": t})
+
+        if hasattr(multi_fetcher, "probe_cache"):
+            # re-enrich of an unchanged universe: first pass fills the cache, the timed pass reads it
+            from probe_cache import ProbeCache
+            saved_cache = multi_fetcher.probe_cache.cache
+            with tempfile.TemporaryDirectory() as d:
+                multi_fetcher.probe_cache.cache = ProbeCache(os.path.join(d, "probes.sqlite"))
+                try:
+                    multi_fetcher.enrich_batch(coins, exchange_delay=0)
+                    stub.requests = 0
+                    t = timed(lambda: multi_fetcher.enrich_batch(coins, exchange_delay=0), 1)
+                    out.append({"bench": "enrich.cached", "size": n, "latency_s": latency,
+                                "requests": stub.requests, "seconds": t})
+                finally:
+                    multi_fetcher.probe_cache.cache.close()
+                    multi_fetcher.probe_cache.cache = saved_cache
+    finally:
+        multi_fetcher.BINANCE_TICKER, multi_fetcher.COINBASE_SPOT = saved
+        stub.stop()
+
+
+async def _load_test(app, method: str, path: str, headers: Dict[str, str], body: Optional[dict],
+                     requests_total: int, concurrency: int) -> Dict[str, Any]:
+    import httpx
+
+    latencies: List[float] = []
+    errors = 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # warm-up request builds snapshots / indexes outside the measurement
+        await client.request(method, path, headers=headers, json=body)
+        queue = list(range(requests_total))
+
+        async def worker():
+            nonlocal errors
+            while queue:
+                queue.pop()
+                t0 = time.perf_counter()
+                r = await client.request(method, path, headers=headers, json=body)
+                latencies.append(time.perf_counter() - t0)
+                if r.status_code >= 400:
+                    errors += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - t0
+    return {"requests": requests_total, "concurrency": concurrency, "errors": errors,
+            "rps": requests_total / wall if wall else 0.0, "latency_ms": percentiles(latencies)}
+
+
+def bench_http(size: int, requests_total: int, concurrency: int, out: List[Dict]):
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        print("  (skipping http: httpx not installed)")
+        return
+
+    targets = []
+    import main
+    key = {"x-api-key": os.environ["API_KEY"]}
+    for path in ["/health", "/top10", "/preview?show=20", "/top?k=50&by=market_cap", "/search?q=bit"]:
+        targets.append(("main", main.app, "GET", path, key, None))
+    import api
+    targets.append(("api", api.app, "GET", "/top10", {"x-api-key": api.API_KEY}, None))
+    try:
+        import langgraph_server
+        targets.append(("langgraph_server", langgraph_server.app, "GET", "/health", {}, None))
+        targets.append(("langgraph_server", langgraph_server.app, "POST", "/run",
+                        {"x-api-key": os.environ["API_KEY"]}, {"show": 5}))
+    except ImportError as e:
+        print(f"  (skipping langgraph_server: {e})")
+
+    for name, app, method, path, headers, body in targets:
+        res = asyncio.run(_load_test(app, method, path, headers, body, requests_total, concurrency))
+        res.update({"bench": f"http.{name}.{method} {path}", "size": size})
+        out.append(res)
+
+
+def bench_boot(repeat: int, out: List[Dict]):
+    # import cost a new worker pays before serving; each run is a fresh interpreter
+    env = dict(os.environ, PYTHONPATH=REPO + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    for module in BOOT_MODULES:
+        code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+        runs = []
+        for _ in range(repeat):
+            try:
+                runs.append(float(subprocess.check_output([sys.executable, "-c", code], env=env, text=True,
+                                                          stderr=subprocess.DEVNULL).strip().splitlines()[-1]))
+            except (subprocess.CalledProcessError, ValueError, IndexError):
+                print(f"  (skipping boot.{module}: import failed)")
+                break
+        if runs:
+            out.append({"bench": f"boot.import {module}", "size": 0,
+                        "seconds": {"runs": len(runs), "min": min(runs), "median": statistics.median(runs),
+                                    "mean": statistics.fmean(runs), "max": max(runs)}})
+
+
+# ---------------- DRIVER ----------------
+def git_rev() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Algo Hunter benchmark suite")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma separated synthetic dataset sizes")
+    parser.add_argument("--only", default=",".join(BENCHES), help=f"Subset of: {','.join(BENCHES)}")
+    parser.add_argument("--out", default="bench_results.json", help="Where to write the JSON results")
+    parser.add_argument("--enrich-coins", type=int, default=200, help="Coins probed by the enrich bench")
+    parser.add_argument("--enrich-latency", type=float, default=0.02, help="Stub exchange latency per request (s)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrency for enrich and http benches")
+    parser.add_argument("--http-requests", type=int, default=500, help="Requests per endpoint in the http bench")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated datasets")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    only = {b.strip() for b in args.only.split(",") if b.strip()}
+    unknown = only - set(BENCHES)
+    if unknown:
+        raise SystemExit(f"unknown benches: {', '.join(sorted(unknown))}")
+
+    results: List[Dict] = []
+    cwd = os.getcwd()
+    work = tempfile.mkdtemp(prefix="algo-bench-")
+    try:
+        os.chdir(work)
+        if "enrich" in only:
+            print(f"[enrich] {args.enrich_coins} coins, stub latency {args.enrich_latency}s")
+            bench_enrich(args.enrich_coins, args.enrich_latency, args.concurrency, results)
+        if "boot" in only:
+            print("[boot] cold imports")
+            bench_boot(5, results)
+
+        for size in sizes:
+            per_size = {"load", "rank", "leaderboard", "http"} & only
+            if not per_size:
+                break
+            d = os.path.join(work, str(size))
+            os.makedirs(d, exist_ok=True)
+            os.chdir(d)
+            t0 = time.perf_counter()
+            write_dataset("enriched_coins.json", size)
+            print(f"[{size}] dataset written in {time.perf_counter() - t0:.1f}s "
+                  f"({os.path.getsize('enriched_coins.json') / 1e6:.0f} MB)")
+            for bench in ["load", "rank", "leaderboard", "http"]:
+                if bench not in per_size:
+                    continue
+                print(f"[{size}] {bench} ...")
+                if bench == "http":
+                    bench_http(size, args.http_requests, args.concurrency, results)
+                else:
+                    globals()[f"bench_{bench}"](size, results)
+            os.chdir(work)
+    finally:
+        os.chdir(cwd)
+        if not args.keep:
+            import shutil
+            shutil.rmtree(work, ignore_errors=True)
+        else:
+            print(f"datasets kept in {work}")
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "git_rev": git_rev(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "sizes": sizes,
+            "benches": sorted(only),
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"{len(results)} results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/stub_exchange.py — local stand-in for the Binance / Coinbase / OKX endpoints
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Optional, Set
+
+_TICKER = re.compile(r"^/api/v3/ticker/price\?symbol=(\w+)")
+_SPOT = re.compile(r"^/v2/prices/([\w.]+)-USD/spot")
+
+
+class StubExchange:
+    """Threaded HTTP server answering ticker/spot probes and bulk catalog listings.
+
+    `latency` adds a fixed per-request delay to mimic network round trips.
+    """
+
+    def __init__(self, binance: Iterable[str] = (), coinbase: Iterable[str] = (), okx: Iterable[str] = (),
+                 latency: float = 0.0):
+        self.binance: Set[str] = set(binance)
+        self.coinbase: Set[str] = set(coinbase)  # base symbols, e.g. "BTC"
+        self.okx: Set[str] = set(okx)
+        self.latency = latency
+        self.requests = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code: int, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                p = self.path
+                m = _TICKER.match(p)
+                if m:
+                    sym = m.group(1)
+                    if sym in stub.binance:
+                        return self._send(200, {"symbol": sym, "price": "1.0"})
+                    return self._send(400, {"code": -1121, "msg": "Invalid symbol."})
+                m = _SPOT.match(p)
+                if m:
+                    if m.group(1) in stub.coinbase:
+                        return self._send(200, {"data": {"base": m.group(1), "currency": "USD", "amount": "1.0"}})
+                    return self._send(404, {"errors": [{"id": "not_found"}]})
+                if p.startswith("/api/v3/exchangeInfo"):
+                    return self._send(200, {"symbols": [{"symbol": s, "status": "TRADING"} for s in sorted(stub.binance)]})
+                if p.startswith("/products"):
+                    return self._send(200, [{"id": f"{s}-USD"} for s in sorted(stub.coinbase)])
+                if p.startswith("/api/v5/public/instruments"):
+                    return self._send(200, {"data": [{"instId": s} for s in sorted(stub.okx)]})
+                self._send(404, {})
+
+        return Handler
+
+    def start(self) -> "StubExchange":
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
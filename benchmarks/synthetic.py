@@ -0,0 +1,67 @@
+# benchmarks/synthetic.py — CMC-shaped synthetic datasets
+import json
+import random
+from typing import Any, Dict, Iterator
+
+_WORDS = ["bit", "coin", "chain", "swap", "moon", "doge", "meta", "verse", "link", "dao",
+          "fi", "net", "pay", "dex", "labs", "protocol", "token", "cash", "gold", "ai"]
+
+
+def make_record(i: int, rng: random.Random) -> Dict[str, Any]:
+    name = " ".join(rng.choice(_WORDS).capitalize() for _ in range(rng.randint(1, 3))) + f" {i}"
+    symbol = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(rng.randint(2, 5)))
+    # heavy-tailed market caps like the real listing; some coins have no market cap at all
+    mc = None if rng.random() < 0.15 else round(rng.paretovariate(0.6) * 1e5, 2)
+    price = round(rng.lognormvariate(0, 3), 8)
+    return {
+        "id": i,
+        "name": name,
+        "symbol": symbol,
+        "slug": name.lower().replace(" ", "-"),
+        "cmc_rank": i,
+        "num_market_pairs": rng.randint(0, 900),
+        "date_added": "2021-01-01T00:00:00.000Z",
+        "tags": rng.sample(_WORDS, 3),
+        "max_supply": None,
+        "circulating_supply": rng.random() * 1e9,
+        "total_supply": rng.random() * 1e9,
+        "platform": None,
+        "last_updated": "2024-01-01T00:00:00.000Z",
+        "quote": {
+            "USD": {
+                "price": price,
+                "volume_24h": rng.random() * 1e8,
+                "volume_change_24h": rng.uniform(-50, 50),
+                "percent_change_1h": rng.uniform(-5, 5),
+                "percent_change_24h": rng.uniform(-20, 20),
+                "percent_change_7d": rng.uniform(-40, 40),
+                "market_cap": mc,
+                "market_cap_dominance": 0,
+                "fully_diluted_market_cap": mc,
+                "last_updated": "2024-01-01T00:00:00.000Z",
+            }
+        },
+        "binance_pair": f"{symbol}USDT" if rng.random() < 0.05 else None,
+        "coinbase_pair": f"{symbol}-USD" if rng.random() < 0.03 else None,
+    }
+
+
+def records(n: int, seed: int = 42) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    for i in range(1, n + 1):
+        yield make_record(i, rng)
+
+
+def write_dataset(path: str, n: int, seed: int = 42, indent: int = 2) -> int:
+    # streamed so 1M records don't need to sit in memory twice; same layout as multi_fetcher output
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i, rec in enumerate(records(n, seed)):
+            body = json.dumps(rec, ensure_ascii=False, indent=indent)
+            if indent:
+                body = body.replace("\n", "\n" + " " * indent)
+                f.write(("," if i else "") + "\n" + " " * indent + body)
+            else:
+                f.write(("," if i else "") + body)
+        f.write("\n]" if n and indent else "]")
+    return n
@@ -0,0 +1,80 @@
+# boot.py
+import importlib
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Optional
+
+# process-relative clock; reset in each forked worker
+_t0 = time.perf_counter()
+_phases: Dict[str, float] = {}
+_parent: Optional[int] = None
+_slot: Optional[int] = None  # worker slot under serve.py; None when not forked
+_ready: Optional[float] = None
+
+
+@contextmanager
+def phase(name: str):
+    # time one startup step; reported by /health and serve.py
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases[name] = round(time.perf_counter() - t0, 6)
+
+
+def import_module(name: str):
+    with phase(f"import {name}"):
+        return importlib.import_module(name)
+
+
+def preload(modules: Iterable[str] = (), warm: bool = True):
+    """Import optional heavy modules and warm the dataset before workers fork.
+
+    Forked workers inherit the parsed snapshot and its indexes (copy-on-write;
+    a columnar build is mmap'd and shared outright), so they start serving
+    without loading anything.
+    """
+    for name in modules:
+        import_module(name)
+    if warm:
+        from asset_store import store
+        from scheduler import warm_snapshot
+        with phase("warm"):
+            try:
+                warm_snapshot(store.get())
+            except FileNotFoundError as e:
+                print(f"boot: nothing to warm ({e})")
+
+
+def forked(slot: int = 0):
+    # call first thing in a worker after fork(): its boot time is measured from here
+    global _t0, _parent, _slot, _ready
+    _parent = os.getppid()
+    _slot = slot
+    _t0 = time.perf_counter()
+    _ready = None
+
+
+def primary() -> bool:
+    # the one process that runs server-wide duties (remote refresh, notifications, leaderboard
+    # builds): a single-process server, or worker slot 0 under serve.py (restarts keep the slot)
+    return _slot in (None, 0)
+
+
+def ready():
+    # the app's lifespan startup ran; the worker accepts requests from now on
+    global _ready
+    if _ready is None:
+        _ready = round(time.perf_counter() - _t0, 6)
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "pid": os.getpid(),
+        "parent": _parent,
+        "slot": _slot,
+        "primary": primary(),
+        "phases": dict(_phases),
+        "ready_seconds": _ready,
+    }
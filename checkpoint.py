@@ -0,0 +1,91 @@
+# checkpoint.py
+import json
+import os
+from typing import Dict, Iterable, Iterator, List
+
+
+class JsonlCheckpoint:
+    """Append-only JSON Lines checkpoint.
+
+    Each append writes only the new records and fsyncs, so checkpointing is
+    linear in bytes written. A crash can at worst leave a torn last line,
+    which is dropped (and truncated away) on the next read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def append(self, records: Iterable[Dict]) -> int:
+        lines = [json.dumps(r, ensure_ascii=False) + "\n" for r in records]
+        if not lines:
+            return 0
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        return len(lines)
+
+    def __iter__(self) -> Iterator[Dict]:
+        if not self.exists():
+            return
+        good = 0
+        torn = False
+        with open(self.path, "rb") as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    torn = True
+                    break
+                try:
+                    rec = json.loads(raw)
+                except ValueError:
+                    torn = True
+                    break
+                good += len(raw)
+                yield rec
+        if torn:
+            print(f"Warning: dropping torn record at byte {good} of {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(good)
+
+    def count(self) -> int:
+        return sum(1 for _ in self)
+
+    def seed(self, records: List[Dict]):
+        # start a checkpoint from a legacy JSON list (written atomically)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for r in records:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def export_json(self, out_file: str) -> int:
+        # stream into the legacy pretty-printed JSON list format, then swap it in atomically
+        tmp = out_file + ".tmp"
+        n = 0
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("[")
+            for rec in self:
+                body = json.dumps(rec, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+                f.write(("," if n else "") + "\n  " + body)
+                n += 1
+            f.write("\n]" if n else "]")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, out_file)
+        return n
+
+    def compact(self, out_file: str) -> int:
+        # final step: publish the JSON list and drop the checkpoint
+        n = self.export_json(out_file)
+        os.remove(self.path)
+        return n
+
+
+def checkpoint_for(json_file: str) -> JsonlCheckpoint:
+    # coins.json -> coins.jsonl
+    return JsonlCheckpoint(json_file + "l" if json_file.endswith(".json") else json_file + ".jsonl")
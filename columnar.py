@@ -0,0 +1,227 @@
+# columnar.py
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # optional: JSON loading still works without numpy
+    np = None
+
+COLUMNAR_DIR = "enriched_coins.cols"
+META_FILE = "meta.json"
+
+# numeric fields from quote.USD (NaN = missing)
+QUOTE_FIELDS = ["price", "market_cap", "volume_24h", "percent_change_1h", "percent_change_24h", "percent_change_7d"]
+# top-level numeric fields
+NUMBER_FIELDS = ["cmc_rank"]
+# top-level string fields (stored as utf-8 blob + offsets + null mask)
+STRING_FIELDS = ["name", "symbol", "slug", "binance_pair", "coinbase_pair", "okx_pair"]
+# everything else in a record (platform, tags, supplies, timestamps, other quote fields) is kept
+# as one JSON document per record in this side column, so records round-trip unchanged
+EXTRA_FIELD = "extra"
+
+
+def available() -> bool:
+    return np is not None
+
+
+def _float(v) -> float:
+    try:
+        return float(v) if v is not None else float("nan")
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _encode_strings(values: List[Optional[str]]):
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    nulls = np.zeros(len(values), dtype=np.bool_)
+    parts = []
+    pos = 0
+    for i, v in enumerate(values):
+        if v is None:
+            nulls[i] = True
+            b = b""
+        else:
+            b = str(v).encode("utf-8")
+        parts.append(b)
+        pos += len(b)
+        offsets[i + 1] = pos
+    blob = np.frombuffer(b"".join(parts), dtype=np.uint8) if pos else np.zeros(0, dtype=np.uint8)
+    return blob, offsets, nulls
+
+
+def _extra(r: Dict[str, Any]) -> Optional[str]:
+    typed = {"id", "quote", *NUMBER_FIELDS, *STRING_FIELDS}
+    rest = {k: v for k, v in r.items() if k not in typed}
+    q = r.get("quote")
+    if isinstance(q, dict):
+        quote = {cur: v for cur, v in q.items() if cur != "USD"}
+        usd = q.get("USD") or {}
+        usd_rest = {k: v for k, v in usd.items() if k not in QUOTE_FIELDS}
+        if usd_rest:
+            quote["USD"] = usd_rest
+        if quote:
+            rest["quote"] = quote
+    return json.dumps(rest, ensure_ascii=False, separators=(",", ":")) if rest else None
+
+
+def build_columns(records: Sequence[Dict[str, Any]], out_dir: str = COLUMNAR_DIR,
+                  source: Optional[str] = None) -> Dict[str, Any]:
+    if np is None:
+        raise RuntimeError("numpy is required to build the columnar dataset")
+    os.makedirs(out_dir, exist_ok=True)
+    build = f"{int(time.time() * 1000):x}"
+    arrays: Dict[str, Any] = {}
+
+    ids = np.array([int(r.get("id") if r.get("id") is not None else -1) for r in records], dtype=np.int64)
+    arrays["id"] = ids
+    for f in NUMBER_FIELDS:
+        arrays[f] = np.array([_float(r.get(f)) for r in records], dtype=np.float64)
+    for f in QUOTE_FIELDS:
+        col = []
+        for r in records:
+            q = r.get("quote")
+            usd = (q.get("USD") or {}) if isinstance(q, dict) else {}
+            col.append(_float(usd.get(f)))
+        arrays[f] = np.array(col, dtype=np.float64)
+    strings = {f: [r.get(f) for r in records] for f in STRING_FIELDS}
+    strings[EXTRA_FIELD] = [_extra(r) for r in records]
+    for f, values in strings.items():
+        blob, offsets, nulls = _encode_strings(values)
+        arrays[f + ".blob"] = blob
+        arrays[f + ".offsets"] = offsets
+        arrays[f + ".null"] = nulls
+
+    # every build writes its own files; the meta swap below is the publish step,
+    # so readers holding mmaps of an older build are never disturbed
+    files = {}
+    for name, arr in arrays.items():
+        fname = f"{build}.{name}.npy"
+        np.save(os.path.join(out_dir, fname), arr)
+        files[name] = fname
+
+    meta = {
+        "build": build,
+        "count": len(records),
+        "source": source,
+        "built_at": time.time(),
+        "quote_fields": QUOTE_FIELDS,
+        "number_fields": NUMBER_FIELDS,
+        "string_fields": STRING_FIELDS,
+        "extra_field": EXTRA_FIELD,
+        "files": files,
+    }
+    mpath = meta_path(out_dir)
+    try:
+        with open(mpath, "r", encoding="utf-8") as f:
+            previous = json.load(f)["files"]
+    except (OSError, ValueError, KeyError):
+        previous = {}
+    tmp = mpath + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, mpath)
+
+    # drop files from older builds (open mmaps stay valid after unlink); the previous build is
+    # kept for a reader that has read the old meta.json but not yet opened its arrays
+    keep = set(files.values()) | set(previous.values()) | {META_FILE}
+    for fname in os.listdir(out_dir):
+        if fname.endswith(".npy") and fname not in keep:
+            try:
+                os.remove(os.path.join(out_dir, fname))
+            except OSError:
+                pass
+    return meta
+
+
+class StringColumn:
+    def __init__(self, blob, offsets, nulls):
+        self.blob = blob
+        self.offsets = offsets
+        self.nulls = nulls
+
+    def __len__(self) -> int:
+        return len(self.nulls)
+
+    def __getitem__(self, i: int) -> Optional[str]:
+        if self.nulls[i]:
+            return None
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+
+class ColumnarDataset:
+    """Read-only, memory-mapped view of a build_columns() directory.
+
+    Behaves like a sequence of CMC-shaped dicts (records are materialized on
+    access), and exposes the raw arrays via column() for vectorized work.
+    """
+
+    def __init__(self, path: str = COLUMNAR_DIR):
+        if np is None:
+            raise RuntimeError("numpy is required to load the columnar dataset")
+        self.path = path
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        files = self.meta["files"]
+
+        def load(name):
+            return np.load(os.path.join(path, files[name]), mmap_mode="r")
+
+        self.count = int(self.meta["count"])
+        self.arrays = {name: load(name) for name in files if name.split(".")[-1] not in ("blob", "offsets", "null")}
+        self.strings = {
+            f: StringColumn(load(f + ".blob"), load(f + ".offsets"), load(f + ".null"))
+            for f in self.meta["string_fields"]
+        }
+        # builds from before the side column only carry the typed fields
+        extra = self.meta.get("extra_field")
+        self.extra = StringColumn(load(extra + ".blob"), load(extra + ".offsets"), load(extra + ".null")) if extra else None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def column(self, name: str):
+        return self.arrays[name]
+
+    def string(self, name: str) -> StringColumn:
+        return self.strings[name]
+
+    def record(self, i: int) -> Dict[str, Any]:
+        def num(v):
+            v = float(v)
+            return None if v != v else v
+
+        usd = {f: num(self.arrays[f][i]) for f in self.meta["quote_fields"]}
+        out: Dict[str, Any] = {"id": int(self.arrays["id"][i])}
+        for f in self.meta["string_fields"]:
+            out[f] = self.strings[f][i]
+        rank = num(self.arrays["cmc_rank"][i])
+        out["cmc_rank"] = None if rank is None else int(rank)
+        out["quote"] = {"USD": usd}
+        raw = self.extra[i] if self.extra is not None else None
+        if raw is not None:
+            rest = json.loads(raw)
+            quote = rest.pop("quote", {})
+            usd.update(quote.pop("USD", {}))
+            out["quote"].update(quote)
+            out.update(rest)
+        return out
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.record(i) for i in range(*key.indices(self.count))]
+        if key < 0:
+            key += self.count
+        if not 0 <= key < self.count:
+            raise IndexError("dataset index out of range")
+        return self.record(key)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self.count):
+            yield self.record(i)
+
+
+def meta_path(path: str = COLUMNAR_DIR) -> str:
+    return os.path.join(path, META_FILE)
@@ -9,10 +9,14 @@ load_dotenv()
 BINANCE_SYMBOL = os.getenv("BINANCE_SYMBOL", "BTCUSDT")     # default symbol
 SIGNAL_THRESHOLD = float(os.getenv("SIGNAL_THRESHOLD", "0.05"))  # 5% change
 FETCH_INTERVAL = int(os.getenv("FETCH_INTERVAL", "60"))     # seconds
+REFRESH_ENABLED = os.getenv("REFRESH_ENABLED", "0") == "1"  # pull fresh CMC quotes from the API process
+RUN_BATCH_MAX = int(os.getenv("RUN_BATCH_MAX", "256"))      # payloads per /run/batch call
+LEADERBOARDS_ENABLED = os.getenv("LEADERBOARDS_ENABLED", "0") == "1"  # rebuild leaderboard files on each refresh
 
 # Notifications (optional)
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")    # put your bot token in .env if used
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")        # your chat id (number)
+TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")        # your chat id (number), comma separated for several
+TELEGRAM_API = os.getenv("TELEGRAM_API", "https://api.telegram.org")  # point at a local stand-in for testing
 
 # Environment mode
 ENV = os.getenv("ENV", "development")  # set to "production" when deployed
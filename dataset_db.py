@@ -0,0 +1,311 @@
+# dataset_db.py
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from dataclasses import asdict
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DATASET_DB = os.getenv("DATASET_DB", "enriched_coins.sqlite")
+# opt-in: the API serves from SQLite only when DATASET_BACKEND=sqlite
+BACKEND = os.getenv("DATASET_BACKEND", "")
+
+CHUNK = 1000  # rows per query when iterating
+
+_SCHEMA = """
+CREATE TABLE assets (
+    pos                INTEGER PRIMARY KEY,  -- dataset order
+    id                 INTEGER,
+    symbol             TEXT,
+    name               TEXT,
+    slug               TEXT,
+    cmc_rank           INTEGER,
+    price              REAL,
+    market_cap         REAL NOT NULL,        -- ranking.market_cap(): missing -> 0
+    volume_24h         REAL,
+    percent_change_24h REAL,
+    score              REAL NOT NULL,        -- default scoring profile at build time
+    binance_pair       TEXT,
+    coinbase_pair      TEXT,
+    okx_pair           TEXT,
+    record             TEXT NOT NULL         -- the full record as JSON
+);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+# created after the bulk insert; (value DESC, pos) matches RankingIndex tie order
+_INDEXES = """
+CREATE INDEX assets_id ON assets (id);
+CREATE INDEX assets_symbol ON assets (symbol COLLATE NOCASE);
+CREATE INDEX assets_name ON assets (name COLLATE NOCASE);
+CREATE INDEX assets_slug ON assets (slug COLLATE NOCASE);
+CREATE INDEX assets_market_cap ON assets (market_cap DESC, pos);
+CREATE INDEX assets_score ON assets (score DESC, pos);
+CREATE INDEX assets_volume_24h ON assets (volume_24h DESC, pos);
+CREATE INDEX assets_percent_change_24h ON assets (percent_change_24h DESC, pos);
+CREATE INDEX assets_price ON assets (price DESC, pos);
+CREATE INDEX assets_symbol_sort ON assets (IFNULL(symbol, '') COLLATE NOCASE, pos);
+"""
+
+SORT_COLUMNS = {"score", "market_cap"}
+# keyset page() orders: dataset position, a symbol (missing = ""), or a number column (missing last)
+PAGE_NUMBERS = ("market_cap", "score", "volume_24h", "percent_change_24h", "price", "cmc_rank")
+_SYMBOL_KEY = "IFNULL(symbol, '') COLLATE NOCASE"
+# every column except the JSON record
+COLUMNS = ("id", "symbol", "name", "slug", "cmc_rank", "price", "market_cap", "volume_24h",
+           "percent_change_24h", "score", "binance_pair", "coinbase_pair", "okx_pair")
+
+
+def enabled() -> bool:
+    return BACKEND == "sqlite"
+
+
+def _usd(r: Dict[str, Any]) -> Dict[str, Any]:
+    q = r.get("quote")
+    return (q.get("USD") or {}) if isinstance(q, dict) else {}
+
+
+def build_database(records: Sequence[Dict[str, Any]], path: str = DATASET_DB,
+                   source: Optional[str] = None) -> Dict[str, Any]:
+    # written to a temp file and renamed into place; open readers keep the old file
+    import ranking
+    import scoring
+
+    profile = scoring.get_profile("default")
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    db = sqlite3.connect(tmp)
+    try:
+        db.execute("PRAGMA journal_mode=OFF")
+        db.execute("PRAGMA synchronous=OFF")
+        db.executescript(_SCHEMA)
+        rows = []
+        for pos, r in enumerate(records):
+            usd = _usd(r)
+            rows.append((
+                pos, r.get("id"), r.get("symbol"), r.get("name"), r.get("slug"), r.get("cmc_rank"),
+                usd.get("price"), ranking.market_cap(r), usd.get("volume_24h"), usd.get("percent_change_24h"),
+                scoring.score_record(r, profile),
+                r.get("binance_pair"), r.get("coinbase_pair"), r.get("okx_pair"),
+                json.dumps(r, ensure_ascii=False, separators=(",", ":")),
+            ))
+        db.executemany("INSERT INTO assets VALUES (" + ",".join("?" * 15) + ")", rows)
+        db.executescript(_INDEXES)
+        meta = {
+            "count": len(records),
+            "source": source,
+            "built_at": time.time(),
+            "score_profile": asdict(profile),
+        }
+        db.executemany("INSERT INTO meta VALUES (?, ?)", [(k, json.dumps(v)) for k, v in meta.items()])
+        db.commit()
+    finally:
+        db.close()
+    os.replace(tmp, path)
+    return meta
+
+
+def read_meta(path: str = DATASET_DB) -> Dict[str, Any]:
+    # the build's meta table, without opening it as a dataset
+    db = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        return {k: json.loads(v) for k, v in db.execute("SELECT key, value FROM meta")}
+    finally:
+        db.close()
+
+
+class SqliteDataset:
+    """Read-only view of a build_database() file.
+
+    Behaves like a sequence of records, but slices, top-k and lookups are
+    answered by indexed queries, so only the rows asked for are decoded.
+    Also stands in for a RankingIndex (top_k / values) in ranking.get_index.
+    """
+
+    def __init__(self, path: str = DATASET_DB):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found")
+        self.path = path
+        # one connection for the object's lifetime: it pins the file, so a rebuild
+        # renamed over `path` never changes what an existing snapshot reads
+        self._db = self._connect()
+        self._lock = threading.Lock()
+        _open.add(self)
+        self.meta = {k: json.loads(v) for k, v in self._query("SELECT key, value FROM meta")}
+        self.count = int(self.meta["count"])
+        self._values: Dict[str, List[float]] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro&immutable=1", uri=True,
+                               check_same_thread=False)
+
+    def _reopen(self):
+        # a connection must not be used across fork(); workers forked by serve.py get their own
+        self._db = self._connect()
+        self._lock = threading.Lock()
+
+    def _query(self, sql: str, params: Sequence[Any] = ()) -> List[Tuple]:
+        # queries are short indexed lookups; serializing them keeps the shared connection safe
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def record(self, i: int) -> Dict[str, Any]:
+        rows = self._query("SELECT record FROM assets WHERE pos = ?", (i,))
+        if not rows:
+            raise IndexError("dataset index out of range")
+        return json.loads(rows[0][0])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.count)
+            if step != 1:
+                return [self.record(i) for i in range(start, stop, step)]
+            if stop <= start:
+                return []
+            rows = self._query("SELECT record FROM assets WHERE pos >= ? AND pos < ? ORDER BY pos", (start, stop))
+            return [json.loads(r[0]) for r in rows]
+        if key < 0:
+            key += self.count
+        if not 0 <= key < self.count:
+            raise IndexError("dataset index out of range")
+        return self.record(key)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for start in range(0, self.count, CHUNK):
+            yield from self[start:start + CHUNK]
+
+    def by_id(self, asset_id: int) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT record FROM assets WHERE id = ? ORDER BY pos LIMIT 1", (asset_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def by_symbol(self, symbol: str, limit: int = 10) -> List[Dict[str, Any]]:
+        rows = self._query("SELECT record FROM assets WHERE symbol = ? COLLATE NOCASE "
+                           "ORDER BY market_cap DESC, pos LIMIT ?", (symbol, limit))
+        return [json.loads(r[0]) for r in rows]
+
+    def scalar_column(self, name: str) -> List[Any]:
+        # one column in dataset order, without decoding records
+        if name not in COLUMNS:
+            raise KeyError(name)
+        return [r[0] for r in self._query(f"SELECT {name} FROM assets ORDER BY pos")]
+
+    def _score_current(self) -> bool:
+        import scoring
+        return self.meta.get("score_profile") == asdict(scoring.get_profile("default"))
+
+    # ---------- RankingIndex interface ----------
+    @property
+    def values(self) -> Dict[str, List[float]]:
+        if "market_cap" not in self._values:
+            self._values["market_cap"] = self.scalar_column("market_cap")
+        return self._values
+
+    def top_k(self, k: int, by: str = "score") -> List[Tuple[float, Dict[str, Any]]]:
+        if by not in SORT_COLUMNS:
+            raise ValueError(f"unknown rank key {by!r}")
+        if k <= 0:
+            return []
+        if by == "score" and not self._score_current():
+            return self._top_k_rescored(k)
+        rows = self._query(f"SELECT {by}, record FROM assets ORDER BY {by} DESC, pos LIMIT ?", (k,))
+        return [(v, json.loads(rec)) for v, rec in rows]
+
+    def _top_k_rescored(self, k: int) -> List[Tuple[float, Dict[str, Any]]]:
+        # the default profile changed since the build: rescore from the narrow columns only
+        import scoring
+        profile = scoring.get_profile("default")
+        scored = []
+        for pos, mc, vol, pct, b, cb, ok in self._query(
+                "SELECT pos, market_cap, volume_24h, percent_change_24h, binance_pair, coinbase_pair, okx_pair "
+                "FROM assets"):
+            stub = {"quote": {"USD": {"market_cap": mc, "volume_24h": vol, "percent_change_24h": pct}},
+                    "binance_pair": b, "coinbase_pair": cb, "okx_pair": ok}
+            scored.append((scoring.score_record(stub, profile), -pos))
+        best = heapq.nlargest(k, scored)
+        return [(s, self.record(-neg_pos)) for s, neg_pos in best]
+
+    def count_where(self, where: str = "", params: Sequence[Any] = ()) -> int:
+        if not where:
+            return self.count
+        return self._query(f"SELECT COUNT(*) FROM assets WHERE {where}", params)[0][0]
+
+    def records(self, positions: Sequence[int]) -> List[Dict[str, Any]]:
+        # records at the given positions, in that order
+        found: Dict[int, Dict[str, Any]] = {}
+        positions = list(positions)
+        for start in range(0, len(positions), 500):
+            chunk = positions[start:start + 500]
+            rows = self._query(f"SELECT pos, record FROM assets WHERE pos IN ({','.join('?' * len(chunk))})", chunk)
+            found.update((pos, json.loads(rec)) for pos, rec in rows)
+        return [found[p] for p in positions]
+
+    def find(self, where: str, params: Sequence[Any] = (), limit: int = 10) -> List[Tuple[float, int]]:
+        # (market cap, pos) of matching rows, largest first
+        return self._query(f"SELECT market_cap, pos FROM assets WHERE {where} "
+                           "ORDER BY market_cap DESC, pos LIMIT ?", list(params) + [limit])
+
+    def page(self, order_by: str = "pos", order: str = "asc", after: Optional[Tuple[Any, int]] = None,
+             limit: int = 100, where: str = "", params: Sequence[Any] = ()) -> List[Tuple[Any, int]]:
+        """Keyset page: (sort value, pos) of up to `limit` rows after `after`.
+
+        Ties are in position order in either direction. A missing symbol
+        sorts as "" (case-insensitive); rows with a missing number come last,
+        in position order, as in AssetListing.
+        """
+        if order_by != "pos" and order_by != "symbol" and order_by not in PAGE_NUMBERS:
+            raise ValueError(f"unknown sort key {order_by!r}")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"unknown sort order {order!r}")
+        base = [where] if where else []
+        if order_by == "pos":
+            clauses, args = list(base), list(params)
+            if after is not None:
+                clauses.append("pos > ?" if order == "asc" else "pos < ?")
+                args.append(after[1])
+            return self._page("pos", clauses, args, f"pos {order.upper()}", limit)
+
+        key = _SYMBOL_KEY if order_by == "symbol" else order_by
+        cmp = ">" if order == "asc" else "<"
+        out: List[Tuple[Any, int]] = []
+        if after is None or after[0] is not None:
+            clauses, args = list(base), list(params)
+            if order_by != "symbol":
+                clauses.append(f"{key} IS NOT NULL")
+            if after is not None:
+                clauses.append(f"({key} {cmp} ? OR ({key} = ? AND pos > ?))")
+                args.extend([after[0], after[0], after[1]])
+            out = self._page(key, clauses, args, f"{key} {order.upper()}, pos", limit)
+        if order_by != "symbol" and len(out) < limit:
+            # the missing-value tail; a cursor with no value is already inside it
+            clauses, args = base + [f"{key} IS NULL"], list(params)
+            if after is not None and after[0] is None:
+                clauses.append("pos > ?")
+                args.append(after[1])
+            out += self._page(key, clauses, args, "pos", limit - len(out))
+        return out
+
+    def _page(self, key: str, clauses: List[str], args: List[Any], order: str, limit: int) -> List[Tuple[Any, int]]:
+        sql = f"SELECT {key}, pos FROM assets"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return self._query(sql + f" ORDER BY {order} LIMIT ?", args + [limit])
+
+
+# datasets alive in this process, reconnected in forked children
+_open: "weakref.WeakSet[SqliteDataset]" = weakref.WeakSet()
+
+
+def _after_fork():
+    for ds in list(_open):
+        ds._reopen()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
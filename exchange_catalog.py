@@ -0,0 +1,156 @@
+# exchange_catalog.py
+import json
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import requests
+
+import http_client
+from http_client import HttpClient
+
+# base URLs can be overridden (e.g. to point at a local stub server)
+BINANCE_API = os.getenv("BINANCE_API", "https://api.binance.com")
+COINBASE_API = os.getenv("COINBASE_API", "https://api.coinbase.com")
+COINBASE_EXCHANGE_API = os.getenv("COINBASE_EXCHANGE_API", "https://api.exchange.coinbase.com")
+OKX_API = os.getenv("OKX_API", "https://www.okx.com")
+
+CACHE_DIR = os.getenv("CATALOG_CACHE_DIR", ".catalog_cache")
+DEFAULT_TTL = 6 * 3600  # seconds
+
+
+class CatalogProvider:
+    """One exchange's full symbol listing, downloaded once and resolved with set lookups.
+
+    Subclasses set `name` (cache key / CLI name), `field` (record key to fill),
+    implement fetch_symbols() and candidates(); resolve() returns the first
+    candidate pair that the exchange lists.
+    """
+
+    name = ""
+    field = ""
+
+    def fetch_symbols(self, client: HttpClient, timeout: float) -> Set[str]:
+        raise NotImplementedError
+
+    def candidates(self, sym: str) -> List[str]:
+        raise NotImplementedError
+
+    def resolve(self, sym: str, symbols: Set[str]) -> Optional[str]:
+        if not sym:
+            return None
+        for c in self.candidates(sym.upper()):
+            if c in symbols:
+                return c
+        return None
+
+
+class BinanceCatalog(CatalogProvider):
+    name = "binance"
+    field = "binance_pair"
+
+    def fetch_symbols(self, client, timeout):
+        r = client.get(BINANCE_API + "/api/v3/exchangeInfo", timeout=timeout)
+        r.raise_for_status()
+        return {s["symbol"] for s in r.json().get("symbols", []) if s.get("symbol")}
+
+    def candidates(self, sym):
+        # same preference order as multi_fetcher.probe_binance
+        return [f"{sym}USDT", f"{sym}BUSD", f"{sym}BTC"]
+
+
+class CoinbaseCatalog(CatalogProvider):
+    name = "coinbase"
+    field = "coinbase_pair"
+
+    def fetch_symbols(self, client, timeout):
+        r = client.get(COINBASE_EXCHANGE_API + "/products", timeout=timeout)
+        r.raise_for_status()
+        return {p["id"] for p in r.json() if p.get("id")}
+
+    def candidates(self, sym):
+        return [f"{sym}-USD"]
+
+
+class OkxCatalog(CatalogProvider):
+    name = "okx"
+    field = "okx_pair"
+
+    def fetch_symbols(self, client, timeout):
+        r = client.get(OKX_API + "/api/v5/public/instruments", params={"instType": "SPOT"}, timeout=timeout)
+        r.raise_for_status()
+        return {i["instId"] for i in r.json().get("data", []) if i.get("instId")}
+
+    def candidates(self, sym):
+        return [f"{sym}-USDT", f"{sym}-USDC", f"{sym}-BTC"]
+
+
+PROVIDERS: Dict[str, Callable[[], CatalogProvider]] = {
+    "binance": BinanceCatalog,
+    "coinbase": CoinbaseCatalog,
+    "okx": OkxCatalog,
+}
+
+
+def register_provider(name: str, factory: Callable[[], CatalogProvider]):
+    PROVIDERS[name] = factory
+
+
+def get_providers(names: Iterable[str]) -> List[CatalogProvider]:
+    out = []
+    for n in names:
+        n = n.strip().lower()
+        if not n:
+            continue
+        if n not in PROVIDERS:
+            raise ValueError(f"unknown exchange catalog: {n} (known: {', '.join(sorted(PROVIDERS))})")
+        out.append(PROVIDERS[n]())
+    return out
+
+
+def _cache_path(name: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, f"{name}.json")
+
+
+def load_symbols(provider: CatalogProvider, client: Optional[HttpClient] = None,
+                 ttl: float = DEFAULT_TTL, cache_dir: str = CACHE_DIR, timeout: float = 20.0) -> Set[str]:
+    path = _cache_path(provider.name, cache_dir)
+    cached = None
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except Exception:
+            cached = None
+    if cached and time.time() - cached.get("fetched_at", 0) < ttl:
+        return set(cached.get("symbols", []))
+
+    try:
+        symbols = provider.fetch_symbols(client or http_client.client, timeout)
+    except (requests.RequestException, ValueError) as e:
+        # a stale listing beats no listing
+        if cached:
+            print(f"Warning: {provider.name} catalog refresh failed ({e}); using stale cache")
+            return set(cached.get("symbols", []))
+        raise
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"fetched_at": time.time(), "symbols": sorted(symbols)}, f)
+    os.replace(tmp, path)
+    print(f"[catalog] {provider.name}: {len(symbols)} symbols cached -> {path}")
+    return symbols
+
+
+def enrich_with_catalogs(coins: List[Dict], providers: List[CatalogProvider],
+                         ttl: float = DEFAULT_TTL, cache_dir: str = CACHE_DIR) -> List[Dict]:
+    listings = [(p, load_symbols(p, ttl=ttl, cache_dir=cache_dir)) for p in providers]
+    out = []
+    for c in coins:
+        sym = (c.get("symbol") or "").upper()
+        c2 = dict(c)
+        for p, symbols in listings:
+            c2[p.field] = p.resolve(sym, symbols)
+        out.append(c2)
+    return out
@@ -0,0 +1,48 @@
+# file_lock.py
+import fcntl
+import os
+from typing import Optional
+
+
+class FileLock:
+    """Advisory cross-process lock on a file (flock).
+
+    The kernel drops the lock when its holder exits, so a crashed process
+    never leaves a stale lock behind. Not reentrant: one instance per holder.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if self._fd is not None:
+            raise RuntimeError(f"{self.path} is already held by this instance")
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fd, self._fd = self._fd, None
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
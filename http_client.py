@@ -0,0 +1,227 @@
+# http_client.py
+import bisect
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import metrics
+
+if TYPE_CHECKING:
+    import requests
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "20"))
+POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "16"))      # hosts with a cached connection pool
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))  # kept-alive connections per host
+
+# latency histogram bucket upper bounds, seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+def retry_after(r: "requests.Response") -> Optional[float]:
+    # Retry-After as seconds (delta or HTTP date); None if absent or unparseable
+    value = r.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How often and how long to back off.
+
+    Network errors and `statuses` are retried up to max_retries times, waiting
+    min(max_delay, base * 2**attempt) (with jitter unless disabled); a 429
+    waits for its Retry-After when the server sends one.
+    """
+
+    max_retries: int = 2
+    base: float = 0.5
+    max_delay: float = 60.0
+    jitter: bool = True
+    statuses: Tuple[int, ...] = (429, 500, 502, 503, 504)
+
+    def delay(self, attempt: int, response: Optional["requests.Response"] = None) -> float:
+        if response is not None and response.status_code == 429:
+            wait = retry_after(response)
+            if wait is not None:
+                return min(self.max_delay, wait)
+        d = min(self.max_delay, self.base * (2 ** attempt))
+        return d * (0.5 + random.random() / 2) if self.jitter else d
+
+
+NO_RETRY = RetryPolicy(max_retries=0)
+DEFAULT_RETRY = RetryPolicy()
+
+
+class HostMetrics:
+    """Request count, error count, status counts and a latency histogram for one host."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0      # network errors and 5xx
+        self.throttled = 0   # 429s
+        self.retries = 0
+        self.statuses: Dict[int, int] = {}
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+
+    def observe(self, seconds: float, status: Optional[int]):
+        self.requests += 1
+        self.latency_sum += seconds
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        if status is None or status >= 500:
+            self.errors += 1
+        if status == 429:
+            self.throttled += 1
+        if status is not None:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.requests, 6) if self.requests else 0.0,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "latency_sum": round(self.latency_sum, 6),
+            "latency_avg": round(self.latency_sum / self.requests, 6) if self.requests else None,
+            # non-cumulative counts per upper bound
+            "latency_buckets": {("+Inf" if b == float("inf") else str(b)): n
+                                for b, n in zip(LATENCY_BUCKETS, self.buckets)},
+        }
+
+
+class HttpClient:
+    """Process-wide HTTP layer for CMC, exchange probes and catalogs.
+
+    Every thread gets its own requests.Session (cookies/headers aren't
+    thread-safe), but they all mount one HTTPAdapter, so keep-alive
+    connections (and their DNS/TLS setup) are pooled per host and reused
+    across threads and calls. request() applies the timeout and RetryPolicy
+    and records per-host metrics. requests itself is imported on first use,
+    so importing this module (the API does, for metrics) stays cheap.
+    """
+
+    def __init__(self, connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 pool_hosts: int = POOL_HOSTS, pool_maxsize: int = POOL_MAXSIZE,
+                 retry: RetryPolicy = DEFAULT_RETRY):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retry = retry
+        self.pool_hosts = pool_hosts
+        self.pool_maxsize = pool_maxsize
+        self.adapter = None
+        self._local = threading.local()
+        self._metrics: Dict[str, HostMetrics] = {}
+        self._lock = threading.Lock()
+
+    def session(self) -> "requests.Session":
+        s = getattr(self._local, "session", None)
+        if s is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            with self._lock:
+                if self.adapter is None:
+                    self.adapter = HTTPAdapter(pool_connections=self.pool_hosts, pool_maxsize=self.pool_maxsize,
+                                               max_retries=0)
+            s = requests.Session()
+            s.mount("http://", self.adapter)
+            s.mount("https://", self.adapter)
+            self._local.session = s
+        return s
+
+    def _host(self, host: str) -> HostMetrics:
+        m = self._metrics.get(host)
+        if m is None:
+            with self._lock:
+                m = self._metrics.setdefault(host, HostMetrics())
+        return m
+
+    def request(self, method: str, url: str, *,
+                params: Optional[Dict[str, Any]] = None,
+                headers: Optional[Dict[str, str]] = None,
+                json: Any = None,
+                timeout: Union[None, float, Tuple[float, float]] = None,
+                retry: Optional[RetryPolicy] = None,
+                pace: Optional[Callable[[], None]] = None,
+                on_throttle: Optional[Callable[[Optional[float]], None]] = None,
+                label: Optional[str] = None) -> "requests.Response":
+        """Send with retries and return the last response.
+
+        A retryable status that survives every retry is returned, not raised;
+        a network error on the last attempt is re-raised. `pace` runs before
+        each attempt (rate limiters); when `on_throttle` is given, 429s are
+        reported to it instead of sleeping here.
+        """
+        import requests
+        policy = retry or self.retry
+        if timeout is None:
+            timeout = (self.connect_timeout, self.read_timeout)
+        elif not isinstance(timeout, tuple):
+            timeout = (min(self.connect_timeout, timeout), timeout)
+        host = urlsplit(url).netloc
+        per_host = self._host(host)
+        attempt = 0
+        while True:
+            if pace is not None:
+                pace()
+            t0 = time.perf_counter()
+            try:
+                r = self.session().request(method, url, params=params, headers=headers, json=json, timeout=timeout)
+            except requests.RequestException as e:
+                elapsed = time.perf_counter() - t0
+                with self._lock:
+                    per_host.observe(elapsed, None)
+                metrics.observe("http_client_request_seconds", elapsed, host=host, status="error")
+                if attempt >= policy.max_retries:
+                    raise
+                wait = policy.delay(attempt)
+                if label:
+                    print(f"[{label}] request error: {e}. Backing off {wait:.1f}s (retry {attempt + 1})")
+            else:
+                elapsed = time.perf_counter() - t0
+                with self._lock:
+                    per_host.observe(elapsed, r.status_code)
+                metrics.observe("http_client_request_seconds", elapsed, host=host, status=r.status_code)
+                if r.status_code not in policy.statuses or attempt >= policy.max_retries:
+                    return r
+                wait = policy.delay(attempt, r)
+                if r.status_code == 429 and on_throttle is not None:
+                    on_throttle(retry_after(r))
+                    wait = 0.0  # the limiter holds the next attempt
+                if label:
+                    print(f"[{label}] HTTP {r.status_code}. Backing off {wait:.1f}s (retry {attempt + 1})")
+            with self._lock:
+                per_host.retries += 1
+            if wait > 0:
+                time.sleep(wait)
+            attempt += 1
+
+    def get(self, url: str, **kwargs) -> "requests.Response":
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> "requests.Response":
+        return self.request("POST", url, **kwargs)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {host: m.snapshot() for host, m in sorted(self._metrics.items())}
+
+
+# shared client: one connection pool per process
+client = HttpClient()
@@ -1,8 +1,11 @@
 from typing import TypedDict
 from langgraph.graph import StateGraph, END
 from dotenv import load_dotenv
-import os
-import json
+
+from asset_store import store
+from ranking import get_index
+from search_index import search_rows
+from signals import engine as signal_engine
 
 load_dotenv()
 
@@ -14,28 +17,30 @@ class AgentState(TypedDict):
 
 # -------- CORE LOGIC --------
 def load_data():
-    if os.path.exists("enriched_coins.json"):
-        file = "enriched_coins.json"
-    else:
-        file = "coins.json"
-
-    with open(file, "r", encoding="utf-8") as f:
-        return json.load(f)
+    # shared snapshot: mmap'd columnar build if present, else enriched_coins.json / coins.json
+    return store.get().assets
 
 
 def run_algo(state: AgentState):
-    data = load_data()
+    snapshot = store.get()
+    query = (state.get("query") or "").strip()
 
-    # simple top10 by market cap
-    scored = []
-    for c in data:
-        mc = c.get("quote", {}).get("USD", {}).get("market_cap", 0) or 0
-        scored.append((mc, c))
+    if signal_engine is not None:
+        signal_engine.observe(snapshot)
 
-    ranked = sorted(scored, reverse=True)[:10]
+    # name / symbol search when a query is given
+    if query:
+        matches = search_rows(snapshot, query, 10)
+        result = {"matches": matches}
+        if signal_engine is not None:
+            result["signals"] = signal_engine.signals(ids=[m["id"] for m in matches])["signals"]
+        return {"query": query, "result": result}
+
+    # otherwise simple top10 by market cap, served from the shared ranking index
+    index = get_index(snapshot)
 
     out = []
-    for i, (_, r) in enumerate(ranked, start=1):
+    for i, (_, r) in enumerate(index.top_k(10, "market_cap"), start=1):
         out.append({
             "rank": i,
             "name": r.get("name"),
@@ -44,9 +49,14 @@ def run_algo(state: AgentState):
             "market_cap": r.get("quote", {}).get("USD", {}).get("market_cap"),
         })
 
+    result = {"top10": out}
+    if signal_engine is not None:
+        # biggest movers past SIGNAL_THRESHOLD since the previous snapshot
+        result["signals"] = signal_engine.signals(limit=10)["signals"]
+
     return {
-        "query": state["query"],
-        "result": {"top10": out},
+        "query": state.get("query", ""),
+        "result": result,
     }
 
 
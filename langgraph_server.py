@@ -1,5 +1,12 @@
-from fastapi import FastAPI, Header, HTTPException
-from agent_graph import agent  # agent_graph.py থেকে import
+import json
+from typing import List, Optional
+
+from fastapi import Body, FastAPI, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+import boot
+from asset_store import store
+from config import RUN_BATCH_MAX
+import offload
 
 import os
 from dotenv import load_dotenv
@@ -9,15 +16,45 @@ TEST_API_KEY = os.getenv("API_KEY")
 
 app = FastAPI(title="Algo Hunter LangGraph API")
 
+def _graph():
+    # agent_graph (and langgraph with it) loads on the first run, not at boot;
+    # serve.py --preload agent_graph imports it before forking instead
+    import agent_graph  # agent_graph.py থেকে import
+    return agent_graph
+
 def verify_key(x_api_key: str = Header(None)):
     if x_api_key != TEST_API_KEY:
         raise HTTPException(status_code=401, detail="Invalid API key")
 
 @app.get("/health")
-def health():
-    return {"status": "ok"}
+async def health():
+    return {"status": "ok", "boot": boot.stats()}
 
 @app.post("/run")
-def run_agent(payload: dict, x_api_key: str = Header(None)):
+async def run_agent(payload: dict, x_api_key: str = Header(None)):
+    verify_key(x_api_key)
+    # the graph loads data and ranks; keep it off the event loop
+    return await offload.run(lambda: _graph().agent.invoke(payload))
+
+@app.post("/run/batch")
+async def run_agent_batch(
+    payloads: List[dict] = Body(..., description="One /run payload per item"),
+    stream: bool = Query(False, description="Stream NDJSON items as they complete instead of one JSON list"),
+    max_concurrency: Optional[int] = Query(None, ge=1, le=64),
+    x_api_key: str = Header(None),
+):
     verify_key(x_api_key)
-    return agent.invoke(payload)
+    if len(payloads) > RUN_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"at most {RUN_BATCH_MAX} payloads per batch")
+    # every item reads the same snapshot, even if the file is swapped mid-batch
+    snapshot = await offload.snapshot(store)
+
+    if stream:
+        async def lines():
+            items = offload.iterate(lambda: _graph().run_batch_as_completed(payloads, snapshot, max_concurrency))
+            async for item in items:
+                yield json.dumps(item, ensure_ascii=False).encode("utf-8") + b"\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    results = await offload.run(lambda: _graph().run_batch(payloads, snapshot, max_concurrency))
+    return {"count": len(payloads), "results": results}
@@ -1,45 +1,311 @@
 # leaderboard.py
-import json
+import argparse
 import csv
-from pathlib import Path
+import heapq
+import importlib.util
+import io
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-IN = Path("enriched_coins.json")
-OUT = Path("top10.csv")
+import metrics
+import scoring
+from asset_store import Snapshot
+from file_lock import FileLock
+from ranking import market_cap, score, usd_quote
 
-if not IN.exists():
-    raise SystemExit("enriched_coins.json not found.")
+LEADERBOARD_DIR = os.getenv("LEADERBOARD_DIR", "leaderboards")
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".lock"  # one build at a time per directory, across the CLI and API processes
+# top-N sizes built for every board, e.g. "10,50,100"
+SIZES = tuple(sorted({int(n) for n in os.getenv("LEADERBOARD_SIZES", "10,100").split(",") if n.strip()}))
 
-with IN.open("r", encoding="utf-8") as f:
-    coins = json.load(f)
+# board -> description; every board ranks by its key descending, ties keep dataset order
+# (the same (-value, position) order RankingIndex uses, so "score" and "market_cap" match /top)
+BOARDS = {
+    "market_cap": "USD market cap",
+    "score": "default scoring profile, the /top10 formula",
+    "exchanges": "number of exchanges listing the asset (Binance, Coinbase, OKX), then market cap",
+}
+FIELDS = ["rank", "id", "name", "symbol", "score", "market_cap", "price", "exchanges",
+          "binance_pair", "coinbase_pair", "okx_pair"]
+MEDIA_TYPES = {
+    "json": "application/json",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
 
-# Sort by market cap (if present), descending. Fallback 0.
-def mcap(x):
-    try:
-        return float(x.get("quote", {}).get("USD", {}).get("market_cap") or 0)
-    except Exception:
-        return 0
 
-sorted_coins = sorted(coins, key=mcap, reverse=True)
+def parquet_available() -> bool:
+    # optional: CSV and JSON are always written, Parquet only with pyarrow
+    return importlib.util.find_spec("pyarrow") is not None
 
-top = sorted_coins[:10]
 
-# fields to write
-fields = ["rank", "id", "name", "symbol", "market_cap", "price", "binance_pair", "coinbase_pair"]
+def formats() -> List[str]:
+    return ["csv", "json"] + (["parquet"] if parquet_available() else [])
 
-with OUT.open("w", newline="", encoding="utf-8") as csvfile:
-    writer = csv.DictWriter(csvfile, fieldnames=fields)
-    writer.writeheader()
-    for i, c in enumerate(top, 1):
-        row = {
-            "rank": i,
-            "id": c.get("id"),
-            "name": c.get("name"),
-            "symbol": c.get("symbol"),
-            "market_cap": c.get("quote", {}).get("USD", {}).get("market_cap"),
-            "price": c.get("quote", {}).get("USD", {}).get("price"),
-            "binance_pair": c.get("binance_pair"),
-            "coinbase_pair": c.get("coinbase_pair"),
+
+def source_of(snapshot: Snapshot) -> Dict[str, Any]:
+    # file identity of the dataset the boards were built from; /leaderboards compares it to the served snapshot
+    return {"path": snapshot.path, "mtime_ns": snapshot.mtime_ns, "size": snapshot.size}
+
+
+def rank_values(snapshot: Snapshot) -> Dict[str, List[float]]:
+    """Market cap, score and exchange count for every record.
+
+    With numpy these come from scoring's per-snapshot columns, which the
+    ranking index and /scores already share; otherwise from one loop over
+    the records.
+    """
+    if scoring.np is not None:
+        cols = scoring.columns(snapshot)
+        exchanges = cols["has_binance"].astype("int64") + cols["has_coinbase"] + cols["has_okx"]
+        return {
+            "market_cap": cols["market_cap"].tolist(),
+            "score": scoring.scores(snapshot).tolist(),
+            "exchanges": exchanges.tolist(),
         }
-        writer.writerow(row)
+    out: Dict[str, List[float]] = {"market_cap": [], "score": [], "exchanges": []}
+    for c in snapshot.assets:
+        out["market_cap"].append(market_cap(c))
+        out["score"].append(score(c))
+        out["exchanges"].append(sum(1 for ex in ("binance", "coinbase", "okx") if c.get(ex + "_pair")))
+    return out
+
+
+def _select(values: Dict[str, List[float]], board: str, k: int) -> List[int]:
+    # partial selection of the top k positions; no full sort of the universe
+    if board == "exchanges":
+        ex, mc = values["exchanges"], values["market_cap"]
+        keys = ((-ex[i], -mc[i], i) for i in range(len(ex)))
+    else:
+        keys = ((-v, i) for i, v in enumerate(values[board]))
+    return [key[-1] for key in heapq.nsmallest(k, keys)]
+
+
+def _row(rank: int, c: Dict[str, Any], values: Dict[str, List[float]], pos: int) -> Dict[str, Any]:
+    usd = usd_quote(c)
+    return {
+        "rank": rank,
+        "id": c.get("id"),
+        "name": c.get("name"),
+        "symbol": (c.get("symbol") or "").upper(),
+        "score": values["score"][pos],
+        "market_cap": usd.get("market_cap"),
+        "price": usd.get("price"),
+        "exchanges": int(values["exchanges"][pos]),
+        "binance_pair": c.get("binance_pair"),
+        "coinbase_pair": c.get("coinbase_pair"),
+        "okx_pair": c.get("okx_pair"),
+    }
+
+
+def compute_boards(snapshot: Snapshot, sizes: Sequence[int] = SIZES) -> Dict[str, List[Dict[str, Any]]]:
+    # every board at the largest size; smaller top-N files are prefixes of these rows
+    values = rank_values(snapshot)
+    k = max(sizes)
+    assets = snapshot.assets
+    boards = {}
+    for board in BOARDS:
+        boards[board] = [_row(i, assets[pos], values, pos) for i, pos in enumerate(_select(values, board, k), start=1)]
+    return boards
+
+
+def _csv_bytes(rows: List[Dict[str, Any]]) -> bytes:
+    buf = io.StringIO(newline="")
+    writer = csv.DictWriter(buf, fieldnames=FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+    return buf.getvalue().encode("utf-8")
+
+
+def _json_bytes(board: str, n: int, rows: List[Dict[str, Any]], source: Dict[str, Any], build: str) -> bytes:
+    body = {"board": board, "n": n, "build": build, "source": source, "rows": rows}
+    return json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _parquet_bytes(rows: List[Dict[str, Any]]) -> bytes:
+    import pyarrow as pa  # deferred: heavy, and only the builder needs it
+    import pyarrow.parquet as pq
+    table = pa.Table.from_pylist(rows, schema=pa.schema([
+        ("rank", pa.int32()), ("id", pa.int64()), ("name", pa.string()), ("symbol", pa.string()),
+        ("score", pa.float64()), ("market_cap", pa.float64()), ("price", pa.float64()), ("exchanges", pa.int8()),
+        ("binance_pair", pa.string()), ("coinbase_pair", pa.string()), ("okx_pair", pa.string()),
+    ]))
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink)
+    return sink.getvalue().to_pybytes()
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _lock(out_dir: str) -> FileLock:
+    os.makedirs(out_dir, exist_ok=True)
+    return FileLock(os.path.join(out_dir, LOCK_FILE))
+
+
+def _build_id(name: str) -> Optional[int]:
+    # build ids are hex milliseconds, so they order like the builds themselves
+    try:
+        return int(name.split(".", 1)[0], 16)
+    except ValueError:
+        return None
+
+
+def build_leaderboards(snapshot: Snapshot, out_dir: str = LEADERBOARD_DIR,
+                       sizes: Sequence[int] = SIZES) -> Dict[str, Any]:
+    """Write every board at every size as CSV, JSON and (with pyarrow) Parquet.
+
+    Rank values are computed once for the snapshot and each board is a
+    partial selection over them. Files carry the build id in their name and
+    the manifest swap publishes the whole set at once; the previous build's
+    files are kept so a reader that just loaded the old manifest can still
+    open them. Builds into one directory are serialized by a file lock.
+    """
+    sizes = sorted({int(n) for n in sizes if int(n) > 0})
+    if not sizes:
+        raise ValueError("at least one leaderboard size is required")
+    with _lock(out_dir):
+        return _build(snapshot, out_dir, sizes)
+
+
+def _build(snapshot: Snapshot, out_dir: str, sizes: List[int]) -> Dict[str, Any]:
+    # caller holds the directory lock
+    t0 = time.perf_counter()
+    previous = load_manifest(out_dir, cached=False)
+    build_no = int(time.time() * 1000)
+    if previous is not None:
+        build_no = max(build_no, (_build_id(previous["build"]) or 0) + 1)
+    build = f"{build_no:x}"
+    source = source_of(snapshot)
+    with metrics.timer("leaderboard_seconds", step="rank"):
+        boards = compute_boards(snapshot, sizes)
+
+    files: Dict[str, Dict[str, Dict[str, str]]] = {}
+    with metrics.timer("leaderboard_seconds", step="write"):
+        for board, rows in boards.items():
+            files[board] = {}
+            for n in sizes:
+                top = rows[:n]
+                encoded = {"csv": _csv_bytes(top), "json": _json_bytes(board, n, top, source, build)}
+                if parquet_available():
+                    encoded["parquet"] = _parquet_bytes(top)
+                files[board][str(n)] = {}
+                for fmt, data in encoded.items():
+                    fname = f"{build}.{board}.top{n}.{fmt}"
+                    _write_atomic(os.path.join(out_dir, fname), data)
+                    files[board][str(n)][fmt] = fname
+
+    mpath = os.path.join(out_dir, MANIFEST_FILE)
+    manifest = {
+        "build": build,
+        "built_at": time.time(),
+        "build_seconds": round(time.perf_counter() - t0, 6),
+        "source": source,
+        "records": len(snapshot.assets),
+        "sizes": sizes,
+        "formats": formats(),
+        "boards": BOARDS,
+        "files": files,
+    }
+    _write_atomic(mpath, json.dumps(manifest, indent=2).encode("utf-8"))
+
+    # only builds older than the one the previous manifest named can go; it, and this build, stay
+    cutoff = _build_id(previous["build"]) if previous else build_no
+    for fname in os.listdir(out_dir):
+        built = _build_id(fname)
+        if built is not None and built < cutoff:  # includes temp files a crashed build left behind
+            try:
+                os.remove(os.path.join(out_dir, fname))
+            except OSError:
+                pass
+    return manifest
+
+
+# manifest as last read, keyed by its file identity so a rebuild (by any process) is picked up
+_manifests: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+_manifests_lock = threading.Lock()
+
+
+def load_manifest(out_dir: str = LEADERBOARD_DIR, cached: bool = True) -> Optional[Dict[str, Any]]:
+    mpath = os.path.join(out_dir, MANIFEST_FILE)
+    try:
+        st = os.stat(mpath)
+    except FileNotFoundError:
+        return None
+    ident = (st.st_mtime_ns, st.st_size)
+    hit = _manifests.get(mpath)
+    if cached and hit is not None and hit[0] == ident:
+        return hit[1]
+    with _manifests_lock:
+        with open(mpath, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        _manifests[mpath] = (ident, manifest)
+    return manifest
+
+
+def _current(manifest: Optional[Dict[str, Any]], snapshot: Snapshot) -> bool:
+    return manifest is not None and manifest.get("source") == source_of(snapshot) and manifest.get("formats") == formats()
+
+
+def publish(snapshot: Snapshot, out_dir: str = LEADERBOARD_DIR) -> Optional[Dict[str, Any]]:
+    # refresh hook: rebuild only when the boards on disk come from another dataset file;
+    # checked again under the lock, in case another process built them while we waited
+    if _current(load_manifest(out_dir), snapshot):
+        return None
+    with _lock(out_dir):
+        if _current(load_manifest(out_dir), snapshot):
+            return None
+        return _build(snapshot, out_dir, sorted(SIZES))
+
+
+def artifact_path(manifest: Dict[str, Any], board: str, n: int, fmt: str,
+                  out_dir: str = LEADERBOARD_DIR) -> str:
+    if board not in manifest["files"]:
+        raise KeyError(f"unknown board: {board} (built: {', '.join(manifest['files'])})")
+    sizes = manifest["files"][board]
+    if str(n) not in sizes:
+        raise KeyError(f"top {n} not built for {board} (built: {', '.join(sizes)})")
+    if fmt not in sizes[str(n)]:
+        raise KeyError(f"{fmt} not built (formats: {', '.join(sizes[str(n)])})")
+    return os.path.join(out_dir, sizes[str(n)][fmt])
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    from asset_store import store
+
+    parser = argparse.ArgumentParser(description="Build leaderboard snapshots (CSV, JSON; Parquet with pyarrow installed) for the current dataset")
+    parser.add_argument("--out", default=LEADERBOARD_DIR, help="Output directory (default: %(default)s)")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="Top-N sizes, comma separated (default: %(default)s)")
+    parser.add_argument("--csv", default="top10.csv", help="Also write the score board's top 10 here, as served by /top10 ('' to skip)")
+    args = parser.parse_args(argv)
+
+    try:
+        snapshot = store.get()
+    except FileNotFoundError as e:
+        raise SystemExit(f"No dataset found: {e}")
+    sizes = [int(n) for n in args.sizes.split(",") if n.strip()]
+    manifest = build_leaderboards(snapshot, args.out, sizes)
+    print(f"Leaderboards built from {snapshot.path} ({manifest['records']} records) in {manifest['build_seconds']:.3f}s: "
+          f"{', '.join(BOARDS)} x top {', '.join(map(str, manifest['sizes']))} as {', '.join(manifest['formats'])} -> {args.out}")
+    if not parquet_available():
+        print("Parquet skipped: pip install pyarrow")
+    if args.csv:
+        if 10 in manifest["sizes"]:
+            with open(artifact_path(manifest, "score", 10, "csv", args.out), "rb") as f:
+                data = f.read()
+        else:
+            data = _csv_bytes(compute_boards(snapshot, [10])["score"])
+        _write_atomic(args.csv, data)
+        print(f"Top 10 by score written to {args.csv}")
+
 
-print(f"Top {len(top)} written to {OUT}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
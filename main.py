@@ -1,27 +1,37 @@
 # main.py
-import json
 import argparse
 import os
-from typing import List, Dict, Any, Optional
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Sequence
 
-from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
+import asset_listing
+import boot
+from asset_store import store
+from config import FETCH_INTERVAL, LEADERBOARDS_ENABLED, REFRESH_ENABLED, SIGNAL_THRESHOLD
+import http_client
+import leaderboard
+import metrics
+from notifier import format_signal, notifier
+import offload
+from profiling import InstrumentMiddleware
+from ranking import get_index, ranked_rows
+from response_cache import ResponseCache, dumps, etag_matches
+from scheduler import RefreshScheduler, refresh_quotes, warm_snapshot
+from scoring import evaluate_profiles
+from search_index import search_rows
+from signals import engine as signal_engine
+
 # ---------------- ENV ----------------
 load_dotenv()
 API_KEY = os.getenv("API_KEY")  # set in .env
 
 # ---------------- CORE LOGIC ----------------
-def load_json_file(path: str) -> List[Dict[str, Any]]:
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"{path} not found")
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    if not isinstance(data, list):
-        raise ValueError(f"{path} does not contain a JSON list")
-    return data
-
 def extract_asset_info(item: Dict[str, Any]) -> Dict[str, Any]:
     usd = item.get("quote", {}).get("USD", {}) if isinstance(item.get("quote"), dict) else {}
     return {
@@ -32,15 +42,14 @@ def extract_asset_info(item: Dict[str, Any]) -> Dict[str, Any]:
         "market_cap": usd.get("market_cap"),
     }
 
-def get_assets_data() -> List[Dict[str, Any]]:
-    if os.path.exists("enriched_coins.json"):
-        data_file = "enriched_coins.json"
-    else:
-        data_file = "coins.json"
-    return load_json_file(data_file)
+def get_assets_data() -> Sequence[Dict[str, Any]]:
+    # served from the shared snapshot; reparsed only when the file changes.
+    # With DATASET_BACKEND=sqlite this is a lazy SqliteDataset: slices become LIMIT queries
+    return store.get().assets
 
-def get_preview_assets(show: int = 5) -> List[Dict[str, Any]]:
-    assets = get_assets_data()
+def get_preview_assets(show: int = 5, assets: Optional[Sequence[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    if assets is None:
+        assets = get_assets_data()
     return [extract_asset_info(a) for a in assets[:show]]
 
 # ---------------- CLI ----------------
@@ -68,7 +77,43 @@ def cli_main():
     print("🎯 Algo Hunter run complete!")
 
 # ---------------- FASTAPI ----------------
-app = FastAPI(title="Algo Hunter API")
+def publish_signals(snapshot):
+    # record the new snapshot and queue fresh threshold crossings for Telegram (never blocks)
+    if signal_engine is None or not signal_engine.observe(snapshot):
+        return
+    # every worker keeps its own history for /signals, but only the primary sends alerts
+    if notifier.enabled and boot.primary():
+        for s in signal_engine.signals(only_crossed=True, limit=100)["signals"]:
+            notifier.submit(format_signal(s), key=s["id"])
+
+# background refresh: reloads + warms the snapshot every FETCH_INTERVAL seconds off the request path;
+# with REFRESH_ENABLED=1 (and CMC_API_KEY set) it also pulls fresh quotes first.
+# Each new snapshot also becomes one sample in the signal engine's price history, and
+# (LEADERBOARDS_ENABLED=1) gets its leaderboard files written once, served by /leaderboards.
+scheduler = RefreshScheduler(
+    store,
+    FETCH_INTERVAL,
+    refresh_fn=refresh_quotes if REFRESH_ENABLED and os.getenv("CMC_API_KEY") else None,
+    warm_fns=[warm_snapshot, publish_signals] + ([leaderboard.publish] if LEADERBOARDS_ENABLED else []),
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if boot.primary():
+        notifier.start()
+    else:
+        # another serve.py worker: the primary refreshes the data files and builds the
+        # leaderboards; this one only reloads and warms the snapshot it serves
+        scheduler.refresh_fn = None
+        scheduler.warm_fns = [warm_snapshot, publish_signals]
+    scheduler.start()
+    boot.ready()
+    yield
+    await scheduler.stop()
+    await asyncio.to_thread(notifier.stop)
+    offload.shutdown()
+
+app = FastAPI(title="Algo Hunter API", lifespan=lifespan)
 
 # CORS
 from fastapi.middleware.cors import CORSMiddleware
@@ -83,62 +128,275 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# per-route latency histograms; with PROFILING=1, X-Profile plus a valid key returns a cProfile summary
+app.add_middleware(InstrumentMiddleware, authorize=lambda key: not API_KEY or key == API_KEY)
+
 def check_api_key(x_api_key: Optional[str]):
     if API_KEY:
         if not x_api_key or x_api_key != API_KEY:
             raise HTTPException(status_code=401, detail="Invalid or missing API key")
 
+# Handlers are async: cheap work (auth, cache hits, stats) stays on the event loop, while
+# dataset loads and recomputation go to offload's dedicated executor (API_WORKERS threads).
+
 # Responses
+# serialized bodies for /preview, /top10 and /top, keyed by snapshot + params
+responses = ResponseCache(maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "256")))
+
+# state owned by other components, read when /metrics is scraped
+metrics.registry.gauge("dataset_records", lambda: store.stats().get("records", 0), "Records in the served snapshot")
+metrics.registry.gauge("dataset_version", lambda: store.stats()["version"], "Snapshots loaded by this process")
+metrics.registry.gauge("response_cache_lookups", lambda: [({"result": "hit"}, responses.hits),
+                                                          ({"result": "miss"}, responses.misses)])
+metrics.registry.gauge("executor_inflight", lambda: offload.stats()["inflight"], "Calls running or queued on the API executor")
+metrics.registry.gauge("notifier_queue_depth", lambda: notifier.stats()["queue_depth"])
+
 class PreviewResponse(BaseModel):
     total: int
     preview: List[Dict[str, Any]]
 
 @app.get("/health")
-def health():
-    return {"status": "ok", "service": "algo-hunter"}
+async def health():
+    # never touches the data file, so it answers even while a reload is running
+    return {
+        "status": "ok",
+        "service": "algo-hunter",
+        "dataset": store.stats(),
+        "refresh": scheduler.stats(),
+        "response_cache": responses.stats(),
+        "signals": signal_engine.stats() if signal_engine is not None else None,
+        "notifier": notifier.stats(),
+        "http": http_client.client.metrics(),
+        "executor": offload.stats(),
+        "boot": boot.stats(),
+    }
 
-@app.get("/preview", response_model=PreviewResponse)
-def preview(show: int = Query(5, ge=1, le=100), x_api_key: Optional[str] = Header(None)):
-    check_api_key(x_api_key)
-    return {"total": len(get_assets_data()), "preview": get_preview_assets(show)}
+@app.get("/metrics")
+async def prometheus_metrics(format: str = Query("prometheus", pattern="^(prometheus|json)$")):
+    # Prometheus text, or JSON with p50/p95/p99 estimated from the buckets. Under serve.py every
+    # worker's series are included (label worker="<slot>"; other workers' at most 5s old), so a
+    # scrape landing on any worker sees the same series; read on the executor, it touches disk
+    if format == "json":
+        return await offload.run(metrics.registry.snapshot)
+    return PlainTextResponse(await offload.run(metrics.registry.render), media_type="text/plain; version=0.0.4; charset=utf-8")
 
-@app.get("/top10")
-def top10(x_api_key: Optional[str] = Header(None)):
+@app.get("/preview", response_model=PreviewResponse)
+async def preview(request: Request, show: int = Query(5, ge=1, le=100), x_api_key: Optional[str] = Header(None)):
     check_api_key(x_api_key)
-    assets = get_assets_data()
-
-    scored = []
-    for c in assets:
-        mc = c.get("quote", {}).get("USD", {}).get("market_cap", 0) or 0
-        binance = 1 if c.get("binance_pair") else 0
-        coinbase = 1 if c.get("coinbase_pair") else 0
-        score = (binance * 150) + (coinbase * 90) + (0 if mc == 0 else (mc ** 0.5))
-        scored.append((score, c))
+    snapshot = await offload.snapshot(store)
+    assets = snapshot.assets
+    return await responses.respond_async(request, snapshot, ("preview", show),
+                                         lambda: {"total": len(assets), "preview": get_preview_assets(show, assets)},
+                                         offload.run)
 
-    ranked = sorted(scored, key=lambda x: x[0], reverse=True)[:10]
+def build_top10(snapshot) -> Dict[str, Any]:
+    index = get_index(snapshot)
 
     out = []
-    for i, (score, r) in enumerate(ranked, start=1):
+    for row in ranked_rows(index, 10, "score"):
         out.append({
-            "rank": i,
-            "id": r.get("id"),
-            "name": r.get("name"),
-            "symbol": (r.get("symbol") or "").upper(),
-            "score": score,
-            "binance_pair": r.get("binance_pair"),
-            "coinbase_pair": r.get("coinbase_pair"),
-            "price": r.get("quote", {}).get("USD", {}).get("price"),
+            "rank": row["rank"],
+            "id": row["id"],
+            "name": row["name"],
+            "symbol": row["symbol"],
+            "score": row["score"],
+            "binance_pair": row["binance_pair"],
+            "coinbase_pair": row["coinbase_pair"],
+            "price": row["price"],
         })
 
     return {"top10": out}
 
+@app.get("/top10")
+async def top10(request: Request, x_api_key: Optional[str] = Header(None)):
+    check_api_key(x_api_key)
+    snapshot = await offload.snapshot(store)
+    return await responses.respond_async(request, snapshot, ("top10",), lambda: build_top10(snapshot), offload.run)
+
+@app.get("/top")
+async def top(
+    request: Request,
+    k: int = Query(10, ge=1, le=1000),
+    by: str = Query("score", pattern="^(score|market_cap)$"),
+    x_api_key: Optional[str] = Header(None),
+):
+    check_api_key(x_api_key)
+    snapshot = await offload.snapshot(store)
+    return await responses.respond_async(request, snapshot, ("top", k, by),
+                                         lambda: {"by": by, "k": k, "top": ranked_rows(get_index(snapshot), k, by)},
+                                         offload.run)
+
+@app.get("/scores")
+async def scores(
+    profiles: str = Query("default", description="Comma separated scoring profile names"),
+    k: int = Query(10, ge=1, le=1000),
+    x_api_key: Optional[str] = Header(None),
+):
+    check_api_key(x_api_key)
+    names = [p.strip() for p in profiles.split(",") if p.strip()]
+    try:
+        result = await offload.run(evaluate_profiles, await offload.snapshot(store), names, k)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"k": k, "profiles": result}
+
+@app.get("/search")
+async def search(
+    q: str = Query(..., min_length=1, max_length=100, description="Crypto name or symbol"),
+    limit: int = Query(10, ge=1, le=100),
+    x_api_key: Optional[str] = Header(None),
+):
+    check_api_key(x_api_key)
+    return {"query": q, "results": await offload.run(search_rows, await offload.snapshot(store), q, limit)}
+
+@app.get("/signals")
+async def signals(
+    threshold: float = Query(SIGNAL_THRESHOLD, gt=0, description="Absolute fractional change, 0.05 = 5%"),
+    window: int = Query(1, ge=1, description="Compare against the price this many refreshes ago"),
+    limit: int = Query(50, ge=1, le=1000),
+    crossed: bool = Query(False, description="Only assets that crossed the threshold on the latest refresh"),
+    x_api_key: Optional[str] = Header(None),
+):
+    check_api_key(x_api_key)
+    if signal_engine is None:
+        raise HTTPException(status_code=503, detail="Signals require numpy")
+    snapshot = await offload.snapshot(store)
+
+    def compute():
+        # make sure the snapshot being served is part of the history even between refreshes
+        publish_signals(snapshot)
+        return signal_engine.signals(threshold, window, limit, only_crossed=crossed)
+
+    return await offload.run(compute)
+
+@app.get("/assets")
+async def assets(
+    request: Request,
+    sort: str = Query("rank", pattern="^(" + "|".join(asset_listing.SORT_KEYS) + ")$"),
+    order: Optional[str] = Query(None, pattern="^(asc|desc)$"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=1_000_000, description="Page size; JSON pages cap at 1000, NDJSON streams any size"),
+    fields: Optional[str] = Query(None, description="Comma separated fields, e.g. id,symbol,price"),
+    has_binance: Optional[bool] = Query(None),
+    has_coinbase: Optional[bool] = Query(None),
+    min_market_cap: Optional[float] = Query(None, ge=0),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    x_api_key: Optional[str] = Header(None),
+):
+    check_api_key(x_api_key)
+    if not asset_listing.available():
+        raise HTTPException(status_code=503, detail="/assets requires numpy")
+    ndjson = format == "ndjson" or "application/x-ndjson" in request.headers.get("accept", "")
+    if ndjson and "limit" not in request.query_params:
+        limit = 1_000_000_000  # stream everything after the cursor
+    elif not ndjson and limit > 1000:
+        limit = 1000
+    snapshot = await offload.snapshot(store)
+
+    def select():
+        listing = asset_listing.get_listing(snapshot)
+        return (listing,) + listing.select(sort, order, cursor, limit, has_binance=has_binance,
+                                           has_coinbase=has_coinbase, min_market_cap=min_market_cap)
+
+    try:
+        projection = asset_listing.parse_fields(fields)
+        listing, page, total, next_cursor = await offload.run(select)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if ndjson:
+        # encoded chunk by chunk (500 lines) on the executor as the client reads:
+        # memory stays flat however many rows are requested
+        def encode(part) -> bytes:
+            with metrics.timer("serialize_seconds", route="assets.ndjson"):
+                return b"".join(dumps(row) + b"\n" for row in listing.rows(part, projection))
+
+        async def lines():
+            for start in range(0, len(page), 500):
+                yield await offload.run(encode, page[start:start + 500])
+
+        headers = {"X-Total-Count": str(total)}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return StreamingResponse(lines(), media_type="application/x-ndjson", headers=headers)
+
+    def body() -> bytes:
+        with metrics.timer("serialize_seconds", route="assets"):
+            return dumps({
+                "total": total,
+                "count": len(page),
+                "sort": sort,
+                "order": order or asset_listing.SORT_KEYS[sort],
+                "next_cursor": next_cursor,
+                "items": list(listing.rows(page, projection)),
+            })
+
+    return Response(content=await offload.run(body), media_type="application/json")
+
+@app.get("/leaderboards")
+async def leaderboards(x_api_key: Optional[str] = Header(None)):
+    check_api_key(x_api_key)
+    manifest = await offload.run(leaderboard.load_manifest)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="No leaderboards built yet (python leaderboard.py)")
+    snapshot = store.current()
+    return {
+        "build": manifest["build"],
+        "built_at": manifest["built_at"],
+        "source": manifest["source"],
+        # False while the served dataset is newer than the files (the next refresh rebuilds them)
+        "current": snapshot is not None and manifest["source"] == leaderboard.source_of(snapshot),
+        "records": manifest["records"],
+        "sizes": manifest["sizes"],
+        "formats": manifest["formats"],
+        "boards": manifest["boards"],
+    }
+
+@app.get("/leaderboards/{board}")
+async def leaderboard_file(
+    request: Request,
+    board: str,
+    n: int = Query(10, ge=1, description="Top-N size; one of the built sizes"),
+    format: str = Query("json", pattern="^(json|csv|parquet)$"),
+    x_api_key: Optional[str] = Header(None),
+):
+    check_api_key(x_api_key)
+    manifest = await offload.run(leaderboard.load_manifest)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="No leaderboards built yet (python leaderboard.py)")
+    try:
+        path = leaderboard.artifact_path(manifest, board, n, format)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+
+    # the prebuilt file as-is: nothing is ranked or serialized per request
+    etag = '"' + os.path.basename(path) + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    def read() -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    try:
+        body = await offload.run(read)
+    except FileNotFoundError:
+        # listed by a manifest that has since been replaced twice; the next request sees the new one
+        raise HTTPException(status_code=503, detail="Leaderboard is being rebuilt, retry shortly",
+                            headers={"Retry-After": "1"})
+    if format != "json":
+        headers["Content-Disposition"] = f'inline; filename="{board}_top{n}.{format}"'
+    return Response(content=body, media_type=leaderboard.MEDIA_TYPES[format], headers=headers)
+
 # ---------------- AGENTCHAT ROUTE ----------------
 @app.post("/run")
-def run_agent(payload: dict, x_api_key: Optional[str] = Header(None)):
+async def run_agent(payload: dict, x_api_key: Optional[str] = Header(None)):
     check_api_key(x_api_key)
     # simple agent logic: preview top 5 coins if no input
     show = payload.get("show", 5)
-    result = get_preview_assets(show)
+    snapshot = await offload.snapshot(store)
+    result = await offload.run(get_preview_assets, show, snapshot.assets)
     return {"result": result}
 
 # ---------------- ENTRY POINT ----------------
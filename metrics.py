@@ -0,0 +1,291 @@
+# metrics.py
+import bisect
+import functools
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+NAMESPACE = "algo"
+
+# histogram bucket upper bounds, seconds; finer at the low end than the HTTP
+# client's, since most hot-path steps take well under a millisecond
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+           0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _with_worker(labels: Labels, worker: str) -> Labels:
+    return tuple(sorted(labels + (("worker", worker),)))
+
+
+def _fmt_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)  # non-cumulative
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        # linear interpolation inside the bucket, like Prometheus' histogram_quantile
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lo = BUCKETS[i - 1] if i else 0.0
+                hi = BUCKETS[i]
+                if hi == float("inf"):
+                    return lo
+                return lo + (hi - lo) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-2]
+
+
+class Registry:
+    """In-process timers, counters and gauges.
+
+    Series are keyed by name and label set and created on first use; every
+    update is a dict lookup and a few increments under one lock, cheap enough
+    for per-request and per-probe call sites. render() produces the
+    Prometheus text format; snapshot() a JSON summary with p50/p95/p99
+    estimated from the buckets.
+
+    Under serve.py's pre-fork workers, enable_multiprocess() makes each
+    worker dump its series to a shared directory every few seconds; render()
+    and snapshot() then report every worker, each series labelled with the
+    worker slot, whichever worker answers the scrape.
+    """
+
+    def __init__(self, namespace: str = NAMESPACE):
+        self.namespace = namespace
+        self._hist: Dict[str, Dict[Labels, Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], Any]]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._mp_dir: Optional[str] = None
+        self._worker: Optional[str] = None
+
+    def describe(self, name: str, text: str):
+        self._help[name] = text
+
+    def observe(self, name: str, seconds: float, **labels: Any):
+        key = _labels(labels)
+        with self._lock:
+            series = self._hist.setdefault(name, {})
+            h = series.get(key)
+            if h is None:
+                h = series[key] = Histogram()
+            h.observe(seconds)
+
+    def inc(self, name: str, value: float = 1, **labels: Any):
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def gauge(self, name: str, fn: Callable[[], Any], help: str = ""):
+        # fn returns a number, or a list of (labels dict, number); read at render time
+        self._gauges[name] = (help, fn)
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def timed(self, name: str, **labels: Any):
+        def wrap(fn):
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return fn(*args, **kwargs)
+            return inner
+        return wrap
+
+    def _copy(self):
+        with self._lock:
+            hist = {n: {k: (list(h.counts), h.sum, h.count) for k, h in s.items()} for n, s in self._hist.items()}
+            counters = {n: dict(s) for n, s in self._counters.items()}
+        return hist, counters
+
+    def enable_multiprocess(self, directory: str, worker: Any, interval: float = 5.0):
+        # call in a forked worker; other workers' series are at most `interval` seconds old in a scrape
+        self._mp_dir = directory
+        self._worker = str(worker)
+
+        def flush():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.dump()
+                except Exception:
+                    pass  # next tick retries; metrics must never take a worker down
+
+        threading.Thread(target=flush, name="metrics-flush", daemon=True).start()
+
+    def _worker_file(self, worker: str) -> str:
+        return os.path.join(self._mp_dir, f"worker-{worker}.json")
+
+    def dump(self):
+        hist, counters, gauges = self._state()
+        data = {
+            "hist": {n: [[k, *v] for k, v in s.items()] for n, s in hist.items()},
+            "counters": {n: [[k, v] for k, v in s.items()] for n, s in counters.items()},
+            "gauges": {n: [help, [[k, float(v)] for k, v in samples]] for n, (help, samples) in gauges.items()},
+        }
+        path = self._worker_file(self._worker)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def _load(self, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        labels = lambda k: tuple(tuple(p) for p in k)
+        hist = {n: {labels(k): (counts, total, count) for k, counts, total, count in s}
+                for n, s in data["hist"].items()}
+        counters = {n: {labels(k): v for k, v in s} for n, s in data["counters"].items()}
+        gauges = {n: (help, [(labels(k), v) for k, v in samples]) for n, (help, samples) in data["gauges"].items()}
+        return hist, counters, gauges
+
+    def _state(self):
+        hist, counters = self._copy()
+        gauges = {name: (help, samples) for name, help, samples in self._gauge_samples()}
+        return hist, counters, gauges
+
+    def _collect(self):
+        # this process's series, merged with the other workers' last dumps when multiprocess
+        state = self._state()
+        if self._mp_dir is None:
+            return state
+        states = [(self._worker, state)]
+        try:
+            names = sorted(os.listdir(self._mp_dir))
+        except OSError:
+            names = []
+        for fname in names:
+            worker = fname[len("worker-"):-len(".json")]
+            if not fname.startswith("worker-") or not fname.endswith(".json") or worker == self._worker:
+                continue
+            try:
+                states.append((worker, self._load(os.path.join(self._mp_dir, fname))))
+            except (OSError, ValueError, KeyError, TypeError):
+                continue  # being replaced or torn: skip it this scrape
+        hist: Dict[str, Dict[Labels, Any]] = {}
+        counters: Dict[str, Dict[Labels, float]] = {}
+        gauges: Dict[str, Tuple[str, List[Tuple[Labels, float]]]] = {}
+        for worker, (h, c, g) in states:
+            for name, series in h.items():
+                hist.setdefault(name, {}).update((_with_worker(k, worker), v) for k, v in series.items())
+            for name, series in c.items():
+                counters.setdefault(name, {}).update((_with_worker(k, worker), v) for k, v in series.items())
+            for name, (help, samples) in g.items():
+                gauges.setdefault(name, (help, []))[1].extend((_with_worker(k, worker), v) for k, v in samples)
+        return hist, counters, gauges
+
+    def _gauge_samples(self) -> Iterable[Tuple[str, str, List[Tuple[Labels, float]]]]:
+        for name, (help, fn) in sorted(self._gauges.items()):
+            try:
+                value = fn()
+            except Exception:
+                continue  # a failing collector must not break the endpoint
+            if isinstance(value, (int, float)):
+                samples = [((), value)]
+            else:
+                samples = [(_labels(lbl), v) for lbl, v in value if v is not None]
+            yield name, help, samples
+
+    def render(self) -> str:
+        hist, counters, gauges = self._collect()
+        ns = self.namespace
+        lines: List[str] = []
+        for name in sorted(hist):
+            full = f"{ns}_{name}"
+            if name in self._help:
+                lines.append(f"# HELP {full} {self._help[name]}")
+            lines.append(f"# TYPE {full} histogram")
+            for labels, (counts, total, count) in sorted(hist[name].items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS, counts):
+                    cumulative += n
+                    lines.append(f"{full}_bucket{_fmt_labels(labels, ('le', _fmt_value(bound)))} {cumulative}")
+                lines.append(f"{full}_sum{_fmt_labels(labels)} {_fmt_value(total)}")
+                lines.append(f"{full}_count{_fmt_labels(labels)} {count}")
+        for name in sorted(counters):
+            full = f"{ns}_{name}"
+            if name in self._help:
+                lines.append(f"# HELP {full} {self._help[name]}")
+            lines.append(f"# TYPE {full} counter")
+            for labels, value in sorted(counters[name].items()):
+                lines.append(f"{full}{_fmt_labels(labels)} {_fmt_value(value)}")
+        for name, (help, samples) in sorted(gauges.items()):
+            full = f"{ns}_{name}"
+            if help:
+                lines.append(f"# HELP {full} {help}")
+            lines.append(f"# TYPE {full} gauge")
+            for labels, value in sorted(samples):
+                lines.append(f"{full}{_fmt_labels(labels)} {_fmt_value(float(value))}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        hist, counters, _ = self._collect()
+        out: Dict[str, Any] = {"timers": {}, "counters": {}}
+        for name, series in sorted(hist.items()):
+            rows = []
+            for labels, (counts, total, count) in sorted(series.items()):
+                h = Histogram()
+                h.counts, h.sum, h.count = counts, total, count
+                q = {f"p{int(p * 100)}": h.quantile(p) for p in (0.5, 0.95, 0.99)}
+                rows.append({"labels": dict(labels), "count": count, "sum": round(total, 6),
+                             **{k: (None if v is None or math.isinf(v) else round(v, 6)) for k, v in q.items()}})
+            out["timers"][name] = rows
+        for name, series in sorted(counters.items()):
+            out["counters"][name] = [{"labels": dict(k), "value": v} for k, v in sorted(series.items())]
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._hist.clear()
+            self._counters.clear()
+
+
+# process-wide registry; each worker process reports its own series
+registry = Registry()
+observe = registry.observe
+inc = registry.inc
+timer = registry.timer
+timed = registry.timed
@@ -11,71 +11,127 @@ Usage examples:
 
   # 3) Do both in sequence:
   python multi_fetcher.py --fetch --limit 5000 --delay 1 --auto-enrich --batch-size 300
+
+  # 4) Concurrent enrichment (probes in parallel, rate limited per exchange host)
+  python multi_fetcher.py --auto-enrich --concurrency 16 --rate 10
+
+  # 5) Catalog enrichment (one bulk symbol listing per exchange, cached on disk)
+  python multi_fetcher.py --auto-enrich --catalog --exchanges binance,coinbase,okx
+
+  # 6) Parallel fetch: 4 pages in flight, adaptive rate starting at 1 req/s
+  python multi_fetcher.py --fetch --limit 1000 --concurrency 4 --cmc-rate 1
+
+  # 7) Delta refresh: merge fresh quotes by id, re-probe only new/stale coins
+  python multi_fetcher.py --delta --probe-ttl 168
+
+  # 8) Build the compact columnar dataset (mmap'd by the API workers)
+  python multi_fetcher.py --build-columns
+
+  # 9) Build the indexed SQLite dataset (DATASET_BACKEND=sqlite serves from it)
+  python multi_fetcher.py --build-db
+
+  # 10) Sharded enrichment: 4 processes pull id-hash shards from a local queue (crash-safe, resumable)
+  python multi_fetcher.py --auto-enrich --workers 4 --concurrency 8 --rate 10
+
+  # 11) Record per-probe / per-page timings (p50/p95/p99 printed, Prometheus text written)
+  python multi_fetcher.py --auto-enrich --concurrency 16 --metrics fetch_metrics.prom
+
+Probe outcomes are cached in .probe_cache.sqlite (positive and negative
+results expire separately), so re-enriching an unchanged universe mostly
+skips the network; --no-probe-cache bypasses it.
 """
 import os
 import time
 import json
 import argparse
+import calendar
+import multiprocessing
+import multiprocessing.connection
+import shutil
+import socket
+import sqlite3
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import List, Dict, Optional
+from urllib.parse import urlsplit
 import requests
 from dotenv import load_dotenv
 
+import columnar
+import dataset_db
+import http_client
+import metrics
+import probe_cache
+from http_client import NO_RETRY, HttpClient, RetryPolicy, retry_after
+from probe_cache import ProbeCache
+from checkpoint import JsonlCheckpoint, checkpoint_for
+from file_lock import FileLock
+from work_queue import LEASE_SECONDS, ShardQueue, shard_positions
+from exchange_catalog import BINANCE_API, COINBASE_API, DEFAULT_TTL, enrich_with_catalogs, get_providers
+
 load_dotenv()
-API_KEY = os.getenv("CMC_API_KEY")
-if not API_KEY:
-    raise SystemExit("ERROR: CMC_API_KEY not found in .env (create .env with CMC_API_KEY=...)")
+MISSING_KEY = "ERROR: CMC_API_KEY not found in .env (create .env with CMC_API_KEY=...)"
 
 CMC_URL = "https://pro-api.coinmarketcap.com/v1/cryptocurrency/listings/latest"
-BINANCE_TICKER = "https://api.binance.com/api/v3/ticker/price?symbol={}"
-COINBASE_SPOT = "https://api.coinbase.com/v2/prices/{}-USD/spot"
-HEADERS = {"Accepts": "application/json", "X-CMC_PRO_API_KEY": API_KEY}
+# held by whoever rewrites coins.json / enriched_coins.json and the datasets built from them
+DATA_LOCK_FILE = os.getenv("DATA_LOCK_FILE", ".data.lock")
+BINANCE_TICKER = BINANCE_API + "/api/v3/ticker/price?symbol={}"
+COINBASE_SPOT = COINBASE_API + "/v2/prices/{}-USD/spot"
 
 
-def fetch_all_coins(limit: int = 5000, start: int = 1, delay_seconds: float = 1.0, out_file: str = "coins.json"):
-    all_data: List[Dict] = []
-    current_start = start
+def cmc_headers() -> Dict[str, str]:
+    # the key is checked when CMC is called, not at import, so the module can be reused without one
+    key = os.getenv("CMC_API_KEY")
+    if not key:
+        raise RuntimeError(MISSING_KEY)
+    return {"Accepts": "application/json", "X-CMC_PRO_API_KEY": key}
+
+
+# sequential fetch: up to 6 retries, 1s, 2s, 4s ... capped at 60s
+CMC_RETRY = RetryPolicy(max_retries=6, base=1.0, max_delay=60.0, jitter=False)
 
-    # resume if exists
-    if os.path.exists(out_file):
+
+def open_checkpoint(json_file: str) -> JsonlCheckpoint:
+    # JSONL checkpoint next to json_file; seeded once from a legacy JSON list if present
+    ckpt = checkpoint_for(json_file)
+    if not ckpt.exists() and os.path.exists(json_file):
         try:
-            with open(out_file, "r", encoding="utf-8") as f:
+            with open(json_file, "r", encoding="utf-8") as f:
                 existing = json.load(f)
             if isinstance(existing, list):
-                all_data = existing
-                current_start = 1 + len(all_data)
-                print(f"[resume] loaded {len(all_data)} records; next start={current_start}")
+                ckpt.seed(existing)
         except Exception:
-            print("Warning: couldn't load existing coins.json; starting fresh.")
+            print(f"Warning: couldn't load existing {json_file}; starting fresh.")
+    return ckpt
+
+
+def fetch_all_coins(limit: int = 5000, start: int = 1, delay_seconds: float = 1.0, out_file: str = "coins.json"):
+    all_data: List[Dict] = []
+    current_start = start
 
-    session = requests.Session()
-    session.headers.update(HEADERS)
+    # resume if a checkpoint (or a legacy coins.json) exists
+    ckpt = open_checkpoint(out_file)
+    all_data = list(ckpt)
+    if all_data:
+        current_start = 1 + len(all_data)
+        print(f"[resume] loaded {len(all_data)} records; next start={current_start}")
 
     while True:
         params = {"start": current_start, "limit": limit, "convert": "USD"}
         print(f"Fetching (start={current_start}, limit={limit}) ...")
-        retry = 0
-        while True:
-            try:
-                r = session.get(CMC_URL, params=params, timeout=20)
-                if r.status_code == 429:
-                    backoff = min(60, 2 ** retry)
-                    print(f"Rate limited (429). Backing off {backoff}s (retry {retry+1})...")
-                    time.sleep(backoff)
-                    retry += 1
-                    if retry > 6:
-                        raise RuntimeError("Max retries for 429")
-                    continue
-                r.raise_for_status()
-                data = r.json().get("data", [])
-                break
-            except requests.RequestException as e:
-                retry += 1
-                backoff = min(60, 2 ** retry)
-                print(f"Request error: {e}. Backing off {backoff}s (retry {retry})...")
-                time.sleep(backoff)
-                if retry > 6:
-                    print("Max retries exceeded. Returning what we have.")
-                    return all_data
+        t0 = time.perf_counter()
+        try:
+            r = http_client.client.get(CMC_URL, params=params, headers=cmc_headers(), timeout=20,
+                                       retry=CMC_RETRY, label=f"start={current_start}")
+            r.raise_for_status()
+            data = r.json().get("data", [])
+            metrics.observe("cmc_page_seconds", time.perf_counter() - t0, result="ok")
+        except requests.RequestException as e:
+            metrics.observe("cmc_page_seconds", time.perf_counter() - t0, result="error")
+            print(f"Max retries exceeded ({e}). Returning what we have.")
+            # publish partial progress but keep the checkpoint for the next resume
+            ckpt.export_json(out_file)
+            return all_data
 
         if not data:
             print("No more data from CMC. Finished fetching.")
@@ -84,13 +140,14 @@ def fetch_all_coins(limit: int = 5000, start: int = 1, delay_seconds: float = 1.
         all_data.extend(data)
         print(f"Added {len(data)} items -> total {len(all_data)}")
 
-        # save progress after each page
+        # save progress after each page (append only the new page); the cursor only
+        # moves past a page once it is on disk, so a failed save stops the run
         try:
-            with open(out_file, "w", encoding="utf-8") as f:
-                json.dump(all_data, f, ensure_ascii=False, indent=2)
-            print(f"Saved progress: {len(all_data)} -> {out_file}")
+            ckpt.append(data)
+            print(f"Saved progress: {len(all_data)} -> {ckpt.path}")
         except Exception as e:
-            print("Warning: failed to save progress:", e)
+            print(f"ERROR: failed to save progress ({e}); stopping, rerun to resume from {ckpt.path}")
+            raise
 
         if len(data) < limit:
             print("Last page fetched (returned less than limit).")
@@ -99,69 +156,324 @@ def fetch_all_coins(limit: int = 5000, start: int = 1, delay_seconds: float = 1.
         current_start += limit
         time.sleep(delay_seconds)
 
+    ckpt.compact(out_file)
     print(f"Fetch complete: {len(all_data)} records saved to {out_file}")
     return all_data
 
 
-def probe_binance(symbol: str, session: Optional[requests.Session] = None, timeout: float = 3.0) -> Optional[str]:
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, up to `burst` at once."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    # one token bucket per host, so Binance and Coinbase budgets are independent
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.blocked_until: Dict[str, float] = {}  # host -> monotonic time, set by back_off()
+        self.lock = threading.Lock()
+
+    def back_off(self, url: str, seconds: float):
+        # the host is throttling us: hold every request to it for `seconds`
+        host = urlsplit(url).netloc
+        with self.lock:
+            self.blocked_until[host] = max(self.blocked_until.get(host, 0.0), time.monotonic() + seconds)
+
+    def acquire(self, url: str):
+        host = urlsplit(url).netloc
+        while True:
+            wait = self.blocked_until.get(host, 0.0) - time.monotonic()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        if self.rate <= 0:
+            return
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            with self.lock:
+                bucket = self.buckets.setdefault(host, TokenBucket(self.rate, self.burst))
+        bucket.acquire()
+
+
+class AdaptiveRateLimiter:
+    """AIMD pacing shared by all CMC fetch workers.
+
+    Requests are spaced 1/rate apart. A 429 halves the rate and, if the server
+    sent Retry-After, holds every worker until then; each success adds
+    `increase` req/s back, up to max_rate.
+    """
+
+    def __init__(self, rate: float, min_rate: float = 0.1, max_rate: Optional[float] = None, increase: float = 0.05):
+        self.rate = float(rate)
+        self.min_rate = min_rate
+        self.max_rate = float(max_rate if max_rate is not None else rate)
+        self.increase = increase
+        self.next_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            at = max(now, self.next_at, self.blocked_until)
+            self.next_at = at + 1.0 / self.rate
+        if at > now:
+            time.sleep(at - now)
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        with self.lock:
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+
+def fetch_page(start: int, limit: int, limiter: AdaptiveRateLimiter, max_retries: int = 8):
+    # one CMC listing page -> (records, total_count or None); raises after max_retries
+    params = {"start": start, "limit": limit, "convert": "USD"}
+
+    def throttled(wait: Optional[float]):
+        limiter.on_throttle(wait)
+        print(f"[start={start}] rate limited (429); rate now {limiter.rate:.2f}/s"
+              + (f", Retry-After {wait:.1f}s" if wait else ""))
+
+    t0 = time.perf_counter()
+    try:
+        r = http_client.client.get(CMC_URL, params=params, headers=cmc_headers(), timeout=20,
+                                   retry=RetryPolicy(max_retries=max_retries, base=1.0),
+                                   pace=limiter.acquire, on_throttle=throttled, label=f"start={start}")
+        r.raise_for_status()
+        body = r.json()
+        metrics.observe("cmc_page_seconds", time.perf_counter() - t0, result="ok")
+    except requests.RequestException as e:
+        metrics.observe("cmc_page_seconds", time.perf_counter() - t0, result="error")
+        raise RuntimeError(f"max retries exceeded for start={start}: {e}")
+    limiter.on_success()
+    total = (body.get("status") or {}).get("total_count")
+    return body.get("data", []) or [], total
+
+
+def fetch_all_coins_parallel(limit: int = 5000, start: int = 1, concurrency: int = 4, rate: float = 1.0,
+                             out_file: str = "coins.json", max_retries: int = 8) -> int:
+    """Fetch listing pages concurrently and reassemble them in order.
+
+    Contiguous pages go straight to the JSONL checkpoint. Pages that finish
+    ahead of a gap are parked in <checkpoint>.pages so a restart skips every
+    offset already fetched. Returns the number of records written.
+    """
+    ckpt = open_checkpoint(out_file)
+    parked = JsonlCheckpoint(ckpt.path + ".pages")
+    count = ckpt.count()
+    next_start = start + count  # first offset not yet in the checkpoint
+
+    end: Optional[int] = None  # first offset past the listing, once known
+    pending: Dict[int, List[Dict]] = {}
+    for page in parked:
+        if page["start"] >= next_start:
+            pending[page["start"]] = page["data"]
+            if len(page["data"]) < limit:
+                end = min(end or page["start"] + len(page["data"]), page["start"] + len(page["data"]))
+    if count or pending:
+        print(f"[resume] {count} records checkpointed, {len(pending)} parked pages; next start={next_start}")
+
+    limiter = AdaptiveRateLimiter(rate, max_rate=rate * 2)
+    dispatch = next_start
+    inflight: Dict = {}
+    failed = False
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            # flush everything that is now contiguous, in order; this runs before the exit
+            # checks so pages parked by an earlier run are written even when nothing is dispatched
+            while next_start in pending:
+                data = pending.pop(next_start)
+                if data:
+                    ckpt.append(data)
+                    count += len(data)
+                    print(f"Saved progress: {count} -> {ckpt.path}")
+                next_start += limit
+            if end is not None and next_start >= end and not inflight:
+                break
+
+            while not failed and len(inflight) < concurrency and (end is None or dispatch < end):
+                if dispatch not in pending:
+                    print(f"Fetching (start={dispatch}, limit={limit}) ...")
+                    inflight[executor.submit(fetch_page, dispatch, limit, limiter, max_retries)] = dispatch
+                dispatch += limit
+            if not inflight:
+                if end is None and not failed:
+                    continue
+                break
+
+            finished, _ = wait(list(inflight), return_when=FIRST_COMPLETED)
+            for fut in finished:
+                s = inflight.pop(fut)
+                try:
+                    data, total = fut.result()
+                except Exception as e:
+                    print(f"Page start={s} failed: {e}. Stopping after in-flight pages.")
+                    failed = True
+                    continue
+                if total:
+                    end = min(end or total + 1, total + 1)
+                if len(data) < limit:
+                    end = min(end or s + len(data), s + len(data))
+                pending[s] = data
+                if s != next_start:
+                    parked.append([{"start": s, "data": data}])
+
+    # pages past the end of the listing are empty and can go; anything else left is unwritten data
+    unwritten = [s for s in pending if end is None or s < end]
+    if failed or unwritten:
+        # publish what is contiguous; checkpoint + parked pages stay for the next resume
+        ckpt.export_json(out_file)
+        print(f"Fetch incomplete: {count} records saved to {out_file}; rerun to resume.")
+        return count
+
+    ckpt.compact(out_file)
+    if parked.exists():
+        os.remove(parked.path)
+    print(f"Fetch complete: {count} records saved to {out_file} (429s: {limiter.throttled})")
+    return count
+
+
+def _pace(limiter: Optional[HostRateLimiter], url: str):
+    return (lambda: limiter.acquire(url)) if limiter is not None else None
+
+
+# "unknown symbol" answers; only these are remembered as not listed
+NOT_LISTED_STATUSES = (400, 404)
+# rate limited (429), IP ban (Binance's 418) or WAF block (403): back off, never cache
+THROTTLE_STATUSES = (403, 418, 429)
+PROBE_BACKOFF_SECONDS = float(os.getenv("PROBE_BACKOFF_SECONDS", "30"))
+
+
+def _probe(exchange: str, symbol: str, pair: str, url: str, client: Optional[HttpClient], timeout: float,
+           limiter: Optional[HostRateLimiter], cache: Optional[ProbeCache]) -> bool:
+    # True if the pair is listed; the probe cache answers first, and only definite outcomes are stored
+    cache = cache if cache is not None else probe_cache.cache
+    t0 = time.perf_counter()
+    if cache is not None:
+        try:
+            known = cache.get(exchange, symbol, pair)
+        except sqlite3.Error:
+            # the cache is only a shortcut: a locked or broken DB means asking the network
+            metrics.inc("probe_cache_errors_total", op="get")
+            known = None
+        if known is not None:
+            metrics.observe("probe_seconds", time.perf_counter() - t0, exchange=exchange, result="cached")
+            return known
+    try:
+        r = (client or http_client.client).get(url, timeout=timeout, retry=NO_RETRY, pace=_pace(limiter, url))
+    except requests.RequestException:
+        metrics.observe("probe_seconds", time.perf_counter() - t0, exchange=exchange, result="error")
+        return False
+    if r.status_code == 200:
+        listed = True
+    elif r.status_code in NOT_LISTED_STATUSES:
+        listed = False
+    elif r.status_code in THROTTLE_STATUSES:
+        # a miss for now; pause this host (Retry-After if sent) so the rest of the batch doesn't pile on
+        if limiter is not None:
+            limiter.back_off(url, retry_after(r) or PROBE_BACKOFF_SECONDS)
+        metrics.observe("probe_seconds", time.perf_counter() - t0, exchange=exchange, result="throttled")
+        return False
+    else:
+        # server error or another unexpected answer: a miss for now, but don't remember it
+        metrics.observe("probe_seconds", time.perf_counter() - t0, exchange=exchange, result="error")
+        return False
+    metrics.observe("probe_seconds", time.perf_counter() - t0, exchange=exchange,
+                    result="listed" if listed else "not_listed")
+    if cache is not None:
+        try:
+            cache.put(exchange, symbol, pair, listed)
+        except sqlite3.Error:
+            metrics.inc("probe_cache_errors_total", op="put")
+    return listed
+
+
+def probe_binance(symbol: str, client: Optional[HttpClient] = None, timeout: float = 3.0,
+                  limiter: Optional[HostRateLimiter] = None, cache: Optional[ProbeCache] = None) -> Optional[str]:
     if not symbol:
         return None
     s = symbol.upper()
     candidates = [f"{s}USDT", f"{s}BUSD", f"{s}BTC"]
-    if session is None:
-        session = requests.Session()
     for c in candidates:
-        try:
-            r = session.get(BINANCE_TICKER.format(c), timeout=timeout)
-            if r.status_code == 200:
-                return c
-        except requests.RequestException:
-            continue
+        if _probe("binance", s, c, BINANCE_TICKER.format(c), client, timeout, limiter, cache):
+            return c
     return None
 
 
-def probe_coinbase(symbol: str, session: Optional[requests.Session] = None, timeout: float = 4.0) -> Optional[str]:
+def probe_coinbase(symbol: str, client: Optional[HttpClient] = None, timeout: float = 4.0,
+                   limiter: Optional[HostRateLimiter] = None, cache: Optional[ProbeCache] = None) -> Optional[str]:
     if not symbol:
         return None
     s = symbol.upper()
-    url = COINBASE_SPOT.format(s)
-    if session is None:
-        session = requests.Session()
-    try:
-        r = session.get(url, timeout=timeout)
-        if r.status_code == 200:
-            return f"{s}-USD"
-    except requests.RequestException:
-        pass
+    pair = f"{s}-USD"
+    if _probe("coinbase", s, pair, COINBASE_SPOT.format(s), client, timeout, limiter, cache):
+        return pair
     return None
 
 
+def _enrich_one(c: Dict, limiter: HostRateLimiter) -> Dict:
+    sym = (c.get("symbol") or "").upper()
+    bin_pair = None
+    cb_pair = None
+    if sym:
+        try:
+            bin_pair = probe_binance(sym, limiter=limiter)
+        except Exception:
+            bin_pair = None
+        try:
+            cb_pair = probe_coinbase(sym, limiter=limiter)
+        except Exception:
+            cb_pair = None
+    c2 = dict(c)
+    c2["binance_pair"] = bin_pair
+    c2["coinbase_pair"] = cb_pair
+    return c2
+
+
 def enrich_batch(coins_slice: List[Dict], exchange_delay: float = 0.12):
-    out = []
-    session = requests.Session()
-    for c in coins_slice:
-        sym = (c.get("symbol") or "").upper()
-        bin_pair = None
-        cb_pair = None
-        if sym:
-            try:
-                bin_pair = probe_binance(sym, session=session)
-            except Exception:
-                bin_pair = None
-            time.sleep(exchange_delay)
-            try:
-                cb_pair = probe_coinbase(sym, session=session)
-            except Exception:
-                cb_pair = None
-        c2 = dict(c)
-        c2["binance_pair"] = bin_pair
-        c2["coinbase_pair"] = cb_pair
-        out.append(c2)
-    return out
+    # at most one request per exchange_delay per host; probes answered by the cache don't wait
+    limiter = HostRateLimiter(1.0 / exchange_delay, burst=1) if exchange_delay > 0 else HostRateLimiter(0)
+    return [_enrich_one(c, limiter) for c in coins_slice]
+
+
+def enrich_batch_concurrent(coins_slice: List[Dict], executor: ThreadPoolExecutor,
+                            limiter: HostRateLimiter) -> List[Dict]:
+    # same output as enrich_batch (input order preserved); the per-host limiter replaces the fixed sleeps
+    return list(executor.map(lambda c: _enrich_one(c, limiter), coins_slice))
 
 
 def auto_enrich_all(coins_file: str = "coins.json", enriched_file: str = "enriched_coins.json",
-                    batch_size: int = 300, exchange_delay: float = 0.12):
+                    batch_size: int = 300, exchange_delay: float = 0.12,
+                    concurrency: int = 1, rate: float = 10.0):
     if not os.path.exists(coins_file):
         print("ERROR: coins.json not found — run with --fetch first.")
         return
@@ -171,40 +483,419 @@ def auto_enrich_all(coins_file: str = "coins.json", enriched_file: str = "enrich
     total = len(coins)
     print(f"Auto-enrich starting: {total} coins; batch_size={batch_size}")
 
-    # resume previously enriched if file exists
-    enriched: List[Dict] = []
-    if os.path.exists(enriched_file):
-        try:
-            with open(enriched_file, "r", encoding="utf-8") as f:
-                enriched = json.load(f)
-            print(f"[resume] {len(enriched)} already enriched; resuming from {len(enriched)}")
-        except Exception:
-            enriched = []
+    # resume previously enriched if a checkpoint (or legacy enriched file) exists
+    ckpt = open_checkpoint(enriched_file)
+    done = ckpt.count()
+    if done:
+        print(f"[resume] {done} already enriched; resuming from {done}")
 
-    start = len(enriched)
+    start = done
     i = start
-    session = requests.Session()
 
-    while i < total:
-        end = min(total, i + batch_size)
-        print(f"Processing batch {i+1} .. {end} ...")
-        slice_coins = coins[i:end]
-        batch_result = enrich_batch(slice_coins, exchange_delay=exchange_delay)
-        enriched.extend(batch_result)
+    executor = None
+    limiter = None
+    if concurrency > 1:
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        limiter = HostRateLimiter(rate)
+        print(f"Concurrent mode: {concurrency} workers, {rate} req/s per host")
+
+    try:
+        while i < total:
+            end = min(total, i + batch_size)
+            print(f"Processing batch {i+1} .. {end} ...")
+            slice_coins = coins[i:end]
+            if executor is not None:
+                batch_result = enrich_batch_concurrent(slice_coins, executor, limiter)
+            else:
+                batch_result = enrich_batch(slice_coins, exchange_delay=exchange_delay)
+            # save after every batch (safe checkpoint, append only); never skip past an unsaved batch
+            try:
+                done += ckpt.append(batch_result)
+                print(f"Saved enriched {done}/{total} -> {ckpt.path}")
+            except Exception as e:
+                print(f"ERROR: failed to save enriched checkpoint ({e}); stopping, rerun to resume from {ckpt.path}")
+                raise
+
+            i = end
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    ckpt.compact(enriched_file)
+    print("Auto-enrich complete. Final enriched file:", enriched_file)
+
 
-        # save after every batch (safe checkpoint)
+def _shard_owner(pid: int) -> str:
+    return f"{socket.gethostname()}:{pid}"
+
+
+def _shard_checkpoint(work_dir: str, shard: int) -> JsonlCheckpoint:
+    return JsonlCheckpoint(os.path.join(work_dir, f"shard-{shard:04d}.jsonl"))
+
+
+def enrich_shard_worker(coins_file: str, work_dir: str, shards: int, batch_size: int = 100,
+                        concurrency: int = 4, rate: float = 10.0, lease_seconds: float = LEASE_SECONDS) -> int:
+    # one worker process: claim shards from the queue until none are left; returns shards completed
+    owner = _shard_owner(os.getpid())
+    queue = ShardQueue(os.path.join(work_dir, "queue.sqlite"), lease_seconds)
+    with open(coins_file, "r", encoding="utf-8") as f:
+        coins = json.load(f)
+    positions = shard_positions(coins, shards)
+    limiter = HostRateLimiter(rate)
+    executor = ThreadPoolExecutor(max_workers=concurrency) if concurrency > 1 else None
+    completed = 0
+    current: List[Optional[int]] = [None]
+    progress = [time.monotonic()]  # last claim or enriched coin: the main loop is moving
+    stop = threading.Event()
+
+    def enrich(c: Dict) -> Dict:
+        out = _enrich_one(c, limiter)
+        progress[0] = time.monotonic()
+        return out
+
+    def keep_alive():
+        # renews the lease however long a rate-limited batch takes, but only while coins keep
+        # getting enriched: a main loop stuck for a whole lease lets the shard expire and be reclaimed
+        hb = ShardQueue(queue.path, lease_seconds)
         try:
-            with open(enriched_file, "w", encoding="utf-8") as f:
-                json.dump(enriched, f, ensure_ascii=False, indent=2)
-            print(f"Saved enriched {len(enriched)}/{total} -> {enriched_file}")
-        except Exception as e:
-            print("Warning: failed to save enriched file:", e)
+            while not stop.wait(lease_seconds / 3):
+                if current[0] is not None and time.monotonic() - progress[0] < lease_seconds:
+                    hb.heartbeat(current[0], owner)
+        finally:
+            hb.close()
+
+    beat = threading.Thread(target=keep_alive, name="shard-heartbeat", daemon=True)
+    beat.start()
+    try:
+        while True:
+            claim = queue.claim(owner)
+            if claim is None:
+                if not queue.remaining():
+                    break
+                time.sleep(1.0)  # the rest is leased; pick it up if a lease runs out
+                continue
+            progress[0] = time.monotonic()
+            shard = current[0] = claim[0]
+            ckpt = _shard_checkpoint(work_dir, shard)
+            pos = positions[shard]
+            done = ckpt.count()  # resumes a reclaimed shard (a torn last line is dropped)
+            lost = False
+            for i in range(done, len(pos), batch_size):
+                batch = [coins[p] for p in pos[i:i + batch_size]]
+                if executor is not None:
+                    result = list(executor.map(enrich, batch))
+                else:
+                    result = [enrich(c) for c in batch]
+                # renew the lease before writing: a reclaimed shard must get no more lines from us
+                if not queue.heartbeat(shard, owner, done):
+                    lost = True
+                    break
+                done += ckpt.append(result)
+            current[0] = None
+            if lost:
+                print(f"[{owner}] lost the lease on shard {shard}; leaving it to its new owner")
+            elif queue.complete(shard, owner, done):
+                completed += 1
+    finally:
+        stop.set()
+        beat.join()
+        if executor is not None:
+            executor.shutdown(wait=True)
+        queue.close()
+    return completed
+
+
+def merge_shards(coins: List[Dict], work_dir: str, shards: int, enriched_file: str) -> int:
+    # checkpoint lines follow each shard's dataset positions, so the merge restores coins.json order
+    out: List[Optional[Dict]] = [None] * len(coins)
+    for shard, pos in enumerate(shard_positions(coins, shards)):
+        records = list(_shard_checkpoint(work_dir, shard))
+        if len(records) != len(pos):
+            raise RuntimeError(f"shard {shard} has {len(records)} of {len(pos)} records")
+        for p, r in zip(pos, records):
+            out[p] = r
+    _write_json_atomic(enriched_file, out)
+    return len(out)
+
+
+def sharded_enrich_all(coins_file: str = "coins.json", enriched_file: str = "enriched_coins.json",
+                       shards: int = 32, workers: int = 4, batch_size: int = 100, concurrency: int = 4,
+                       rate: float = 10.0, lease_seconds: float = LEASE_SECONDS):
+    """Enrich with `workers` processes pulling id-hash shards from a local SQLite queue.
+
+    Each shard has its own JSONL checkpoint under <enriched_file>.shards/, so
+    a rerun resumes where every shard stopped. A worker that dies has its
+    shards released at once (and is replaced); a hung one loses them when its
+    lease expires. `rate` is this machine's per-host budget, split evenly
+    across the workers. The shards are merged into `enriched_file` at the end.
+    """
+    if not os.path.exists(coins_file):
+        print("ERROR: coins.json not found — run with --fetch first.")
+        return
 
-        i = end
-        # small rest between batches
-        time.sleep(0.6)
+    with open(coins_file, "r", encoding="utf-8") as f:
+        coins = json.load(f)
+    work_dir = enriched_file + ".shards"
+    os.makedirs(work_dir, exist_ok=True)
+    queue = ShardQueue(os.path.join(work_dir, "queue.sqlite"), lease_seconds)
+    st = os.stat(coins_file)
+    if queue.prepare(shards, {"coins": len(coins), "size": st.st_size, "mtime_ns": st.st_mtime_ns}):
+        print(f"[resume] {queue.stats()['done']}/{shards} shards already done")
+    else:
+        for fn in os.listdir(work_dir):
+            if fn.startswith("shard-"):
+                os.remove(os.path.join(work_dir, fn))  # left over from a different coins.json
+    print(f"Sharded enrich starting: {len(coins)} coins in {shards} shards; {workers} workers x "
+          f"{concurrency} threads, {rate / workers:.2f} req/s per host per worker")
+
+    ctx = multiprocessing.get_context("spawn")  # fresh interpreters: no inherited sockets, threads or SQLite handles
+    args = (coins_file, work_dir, shards, batch_size, concurrency, rate / workers, lease_seconds)
+    procs: Dict[int, multiprocessing.Process] = {}
+    restarts = 0
+
+    def spawn():
+        p = ctx.Process(target=enrich_shard_worker, args=args, name="enrich-worker")
+        p.start()
+        procs[p.pid] = p
+
+    for _ in range(min(workers, shards)):
+        spawn()
+    finished_at = None
+    try:
+        while procs:
+            multiprocessing.connection.wait([p.sentinel for p in procs.values()], timeout=min(10.0, lease_seconds))
+            for pid, p in list(procs.items()):
+                if p.exitcode is None:
+                    continue
+                del procs[pid]
+                if p.exitcode != 0:
+                    released = queue.release(_shard_owner(pid))
+                    print(f"Worker {pid} exited with {p.exitcode}; {released} shard(s) back in the queue")
+                    if queue.remaining() and restarts < 3 * workers:
+                        restarts += 1
+                        spawn()
+            s = queue.stats()
+            print(f"Progress: {s['done']}/{shards} shards, {s['records']}/{len(coins)} coins checkpointed")
+            if not s["pending"] and not s["leased"]:
+                # everything is done; a worker still running after a lease period is hung
+                finished_at = finished_at or time.monotonic()
+                if time.monotonic() - finished_at > lease_seconds:
+                    break
+    finally:
+        for p in procs.values():
+            p.terminate()
+        for p in procs.values():
+            # a stopped/hung worker ignores SIGTERM, and multiprocessing joins children at exit
+            p.join(5.0)
+            if p.is_alive():
+                p.kill()
+                p.join()
+
+    remaining, reclaimed = queue.remaining(), queue.stats()["reclaimed"]
+    queue.close()
+    if remaining:
+        print(f"ERROR: {remaining} shard(s) unfinished after {restarts} worker restart(s); rerun to resume.")
+        return
+    n = merge_shards(coins, work_dir, shards, enriched_file)
+    shutil.rmtree(work_dir)
+    print(f"Sharded enrich complete: {n} coins ({reclaimed} shard reclaim(s)). Final enriched file:", enriched_file)
+
+
+def catalog_enrich_all(coins_file: str = "coins.json", enriched_file: str = "enriched_coins.json",
+                       exchanges: str = "binance,coinbase", ttl: float = DEFAULT_TTL):
+    if not os.path.exists(coins_file):
+        print("ERROR: coins.json not found — run with --fetch first.")
+        return
+
+    with open(coins_file, "r", encoding="utf-8") as f:
+        coins = json.load(f)
+    providers = get_providers(exchanges.split(","))
+    print(f"Catalog enrich starting: {len(coins)} coins; exchanges={','.join(p.name for p in providers)}")
+
+    enriched = enrich_with_catalogs(coins, providers, ttl=ttl)
+
+    # single pass, so write once via temp file + rename
+    tmp = enriched_file + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(enriched, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, enriched_file)
+    for p in providers:
+        found = sum(1 for x in enriched if x.get(p.field))
+        print(f"  {p.field}: {found}/{len(enriched)}")
+    print("Catalog enrich complete. Final enriched file:", enriched_file)
+
+
+def build_columnar(enriched_file: str = "enriched_coins.json", coins_file: str = "coins.json",
+                   out_dir: str = columnar.COLUMNAR_DIR):
+    if not columnar.available():
+        print("ERROR: numpy is required for --build-columns (pip install numpy)")
+        return
+    src = enriched_file if os.path.exists(enriched_file) else coins_file
+    if not os.path.exists(src):
+        print("ERROR: no dataset found — run with --fetch / --auto-enrich first.")
+        return
+    with open(src, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    meta = columnar.build_columns(records, out_dir, source=src)
+    size = sum(os.path.getsize(os.path.join(out_dir, fn)) for fn in meta["files"].values())
+    print(f"Columnar dataset built: {meta['count']} records, {size / 1e6:.1f} MB -> {out_dir}")
+
+
+def build_database(enriched_file: str = "enriched_coins.json", coins_file: str = "coins.json",
+                   out_path: str = dataset_db.DATASET_DB):
+    src = enriched_file if os.path.exists(enriched_file) else coins_file
+    if not os.path.exists(src):
+        print("ERROR: no dataset found — run with --fetch / --auto-enrich first.")
+        return
+    with open(src, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    meta = dataset_db.build_database(records, out_path, source=src)
+    print(f"SQLite dataset built: {meta['count']} records, {os.path.getsize(out_path) / 1e6:.1f} MB -> {out_path}")
+
+
+# delta_refresh stamps records with last_updated / last_probed (ISO-8601 UTC like CMC's own fields)
+PROBE_TTL_HOURS = 7 * 24
+# fields that change on every CMC refresh and must not count as a data change
+_VOLATILE = {"last_updated"}
+
+
+def _now_iso() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+
+
+def _parse_iso(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return calendar.timegm(time.strptime(value[:19], "%Y-%m-%dT%H:%M:%S"))
+    except (TypeError, ValueError):
+        return None
 
-    print("Auto-enrich complete. Final enriched file:", enriched_file)
+
+def _usd_of(c: Dict) -> Dict:
+    q = c.get("quote")
+    return (q.get("USD") or {}) if isinstance(q, dict) else {}
+
+
+def merge_listing(existing: List[Dict], fresh: List[Dict], now: Optional[str] = None):
+    """Merge a fresh CMC listing into existing records keyed by id.
+
+    Only records whose data actually changed are replaced (with copies, so
+    readers of the old list are unaffected), and only changed quote fields
+    are overwritten. New ids are appended; ids missing from the fresh listing
+    are kept as they are.
+    """
+    now = now or _now_iso()
+    merged = list(existing)
+    by_id = {r.get("id"): i for i, r in enumerate(existing)}
+    stats = {"added": 0, "updated": 0, "unchanged": 0, "missing": 0}
+    seen = set()
+
+    for new in fresh:
+        i = by_id.get(new.get("id"))
+        if i is None:
+            rec = dict(new)
+            rec["last_updated"] = new.get("last_updated") or now
+            merged.append(rec)
+            stats["added"] += 1
+            continue
+        seen.add(i)
+        old = merged[i]
+        old_usd, new_usd = _usd_of(old), _usd_of(new)
+        top = {k: v for k, v in new.items() if k != "quote" and k not in _VOLATILE and old.get(k) != v}
+        usd = {k: v for k, v in new_usd.items() if k not in _VOLATILE and old_usd.get(k) != v}
+        if not top and not usd:
+            stats["unchanged"] += 1
+            continue
+        rec = dict(old)
+        rec.update(top)
+        rec["quote"] = dict(old.get("quote") or {})
+        rec["quote"]["USD"] = {**old_usd, **usd, "last_updated": new_usd.get("last_updated", old_usd.get("last_updated"))}
+        rec["last_updated"] = new.get("last_updated") or now
+        merged[i] = rec
+        stats["updated"] += 1
+
+    stats["missing"] = len(existing) - len(seen)
+    return merged, stats
+
+
+def _write_json_atomic(path: str, data: List[Dict]):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def fetch_listing(limit: int = 5000, delay_seconds: float = 1.0, concurrency: int = 1, rate: float = 1.0) -> List[Dict]:
+    # a complete fresh listing, fetched through the usual checkpointed paths into a scratch file
+    scratch = ".delta_listing.json"
+    if os.path.exists(scratch):
+        os.remove(scratch)
+    if concurrency > 1:
+        fetch_all_coins_parallel(limit=limit, concurrency=concurrency, rate=rate, out_file=scratch)
+    else:
+        fetch_all_coins(limit=limit, delay_seconds=delay_seconds, out_file=scratch)
+    if checkpoint_for(scratch).exists():
+        raise RuntimeError("listing fetch incomplete; rerun --delta to resume")
+    with open(scratch, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    os.remove(scratch)
+    return data
+
+
+def delta_refresh(coins_file: str = "coins.json", enriched_file: str = "enriched_coins.json",
+                  limit: int = 5000, delay_seconds: float = 1.0, concurrency: int = 1, cmc_rate: float = 1.0,
+                  probe_ttl_hours: float = PROBE_TTL_HOURS, rate: float = 10.0,
+                  catalog: bool = False, exchanges: str = "binance,coinbase", catalog_ttl: float = DEFAULT_TTL):
+    fresh = fetch_listing(limit=limit, delay_seconds=delay_seconds, concurrency=concurrency, rate=cmc_rate)
+    now = _now_iso()
+    print(f"Delta refresh: {len(fresh)} listings fetched")
+
+    coins: List[Dict] = []
+    if os.path.exists(coins_file):
+        with open(coins_file, "r", encoding="utf-8") as f:
+            coins = json.load(f)
+    coins, stats = merge_listing(coins, fresh, now)
+    _write_json_atomic(coins_file, coins)
+    print(f"  {coins_file}: {stats}")
+
+    if not os.path.exists(enriched_file):
+        print(f"  {enriched_file} not present; run --auto-enrich to create it")
+        return
+
+    with open(enriched_file, "r", encoding="utf-8") as f:
+        enriched = json.load(f)
+    # legacy records without last_probed count as probed when the file was written
+    file_probed = os.path.getmtime(enriched_file)
+    enriched, stats = merge_listing(enriched, fresh, now)
+    print(f"  {enriched_file}: {stats}")
+
+    cutoff = time.time() - probe_ttl_hours * 3600
+    stale = []
+    for i, r in enumerate(enriched):
+        probed = _parse_iso(r.get("last_probed"))
+        if probed is None and "binance_pair" in r:
+            probed = file_probed
+            r["last_probed"] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(file_probed))
+        if probed is None or probed < cutoff:
+            stale.append(i)
+    print(f"  re-probing {len(stale)} new or stale coins (probe TTL {probe_ttl_hours}h)")
+
+    if stale:
+        subset = [enriched[i] for i in stale]
+        if catalog:
+            probed = enrich_with_catalogs(subset, get_providers(exchanges.split(",")), ttl=catalog_ttl)
+        elif concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                probed = enrich_batch_concurrent(subset, executor, HostRateLimiter(rate))
+        else:
+            probed = enrich_batch(subset)
+        for i, rec in zip(stale, probed):
+            rec["last_probed"] = now
+            enriched[i] = rec
+
+    _write_json_atomic(enriched_file, enriched)
+    print("Delta refresh complete.")
 
 
 def quick_stats(coins_file: str = "coins.json", enriched_file: str = "enriched_coins.json"):
@@ -226,6 +917,20 @@ def quick_stats(coins_file: str = "coins.json", enriched_file: str = "enriched_c
         print("enriched_coins.json not present")
 
 
+def write_metrics(path: str):
+    # textfile-collector friendly: written to a temp file and renamed
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(metrics.registry.render())
+    os.replace(tmp, path)
+    for name, rows in metrics.registry.snapshot()["timers"].items():
+        for row in rows:
+            labels = ",".join(f"{k}={v}" for k, v in row["labels"].items())
+            p = {q: (f"{row[q] * 1000:.1f}ms" if row[q] is not None else "-") for q in ("p50", "p95", "p99")}
+            print(f"{name}{{{labels}}}: n={row['count']} p50={p['p50']} p95={p['p95']} p99={p['p99']}")
+    print(f"Metrics written to {path}")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Final multi_fetcher (fetch + auto-batch enrich)")
     parser.add_argument("--fetch", action="store_true", help="Fetch coins from CMC (resume safe)")
@@ -234,15 +939,69 @@ def main():
     parser.add_argument("--auto-enrich", action="store_true", help="Run auto-batch exchange probing")
     parser.add_argument("--batch-size", type=int, default=300, help="Batch size for enrichment (phone-friendly)")
     parser.add_argument("--exchange-delay", type=float, default=0.12, help="Delay between probes inside batch")
+    parser.add_argument("--concurrency", type=int, default=1, help="Parallel fetch pages / probe workers (1 = serial)")
+    parser.add_argument("--cmc-rate", type=float, default=None, help="Initial CMC requests per second for parallel fetch (default 1/--delay)")
+    parser.add_argument("--max-retries", type=int, default=8, help="Retries per CMC page in parallel fetch")
+    parser.add_argument("--rate", type=float, default=10.0, help="Max probe requests per second per exchange host (concurrent mode)")
+    parser.add_argument("--catalog", action="store_true", help="Enrich from bulk exchange symbol listings instead of per-symbol probes")
+    parser.add_argument("--exchanges", default="binance,coinbase", help="Comma separated catalog providers (binance,coinbase,okx)")
+    parser.add_argument("--catalog-ttl", type=float, default=DEFAULT_TTL, help="Seconds before a cached exchange listing is re-downloaded")
+    parser.add_argument("--delta", action="store_true", help="Refresh quotes in place and re-probe only new or stale coins")
+    parser.add_argument("--probe-ttl", type=float, default=PROBE_TTL_HOURS, help="Hours before a coin's exchange pairs are re-probed (--delta)")
+    parser.add_argument("--build-columns", action="store_true", help="Write the compact columnar (NumPy, mmap) dataset")
+    parser.add_argument("--build-db", action="store_true", help="Write the indexed SQLite dataset (served with DATASET_BACKEND=sqlite)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for --auto-enrich (>1 = sharded mode with a local work queue)")
+    parser.add_argument("--shards", type=int, default=0, help="Shards for sharded enrichment (default 8 per worker)")
+    parser.add_argument("--lease", type=float, default=LEASE_SECONDS,
+                        help="Seconds without a heartbeat before a worker's shard is reclaimed")
+    parser.add_argument("--no-probe-cache", action="store_true", help="Ignore the on-disk probe cache and always hit the exchanges")
     parser.add_argument("--stats", action="store_true", help="Show quick stats about coins/enriched files")
+    parser.add_argument("--metrics", metavar="FILE", help="Write probe / CMC page timings (Prometheus text format) "
+                                                          "to FILE at exit and print a percentile summary")
     args = parser.parse_args()
 
-    if args.fetch:
-        fetch_all_coins(limit=args.limit, delay_seconds=args.delay)
-    if args.auto_enrich:
-        auto_enrich_all(batch_size=args.batch_size, exchange_delay=args.exchange_delay)
+    if (args.fetch or args.delta) and not os.getenv("CMC_API_KEY"):
+        raise SystemExit(MISSING_KEY)
+    if args.no_probe_cache:
+        probe_cache.cache = None
+
+    cmc_rate = args.cmc_rate or (1.0 / args.delay if args.delay > 0 else 10.0)
+    lock = FileLock(DATA_LOCK_FILE)
+    if args.delta or args.fetch or args.auto_enrich or args.build_columns or args.build_db:
+        # one writer at a time across CLI runs and API processes refreshing in the background
+        if not lock.acquire(blocking=False):
+            print(f"Waiting for {DATA_LOCK_FILE} (another fetch or refresh is writing the data files) ...")
+            lock.acquire()
+    try:
+        if args.delta:
+            delta_refresh(limit=args.limit, delay_seconds=args.delay, concurrency=args.concurrency, cmc_rate=cmc_rate,
+                          probe_ttl_hours=args.probe_ttl, rate=args.rate, catalog=args.catalog,
+                          exchanges=args.exchanges, catalog_ttl=args.catalog_ttl)
+        if args.fetch and args.concurrency > 1:
+            fetch_all_coins_parallel(limit=args.limit, concurrency=args.concurrency, rate=cmc_rate,
+                                     max_retries=args.max_retries)
+        elif args.fetch:
+            fetch_all_coins(limit=args.limit, delay_seconds=args.delay)
+        if args.auto_enrich and args.catalog:
+            catalog_enrich_all(exchanges=args.exchanges, ttl=args.catalog_ttl)
+        elif args.auto_enrich and (args.workers > 1 or args.shards > 0):
+            sharded_enrich_all(shards=args.shards or 8 * max(1, args.workers), workers=max(1, args.workers),
+                               batch_size=args.batch_size, concurrency=args.concurrency, rate=args.rate,
+                               lease_seconds=args.lease)
+        elif args.auto_enrich:
+            auto_enrich_all(batch_size=args.batch_size, exchange_delay=args.exchange_delay,
+                            concurrency=args.concurrency, rate=args.rate)
+        if args.build_columns:
+            build_columnar()
+        if args.build_db:
+            build_database()
+    finally:
+        lock.release()
     if args.stats:
         quick_stats()
+    if args.metrics:
+        write_metrics(args.metrics)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,220 @@
+# notifier.py
+import os
+import queue
+import random
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from config import TELEGRAM_API, TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
+
+if TYPE_CHECKING:
+    import requests
+
+QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "1000"))
+DIGEST_SECONDS = float(os.getenv("NOTIFY_DIGEST_SECONDS", "5"))
+CHAT_INTERVAL = float(os.getenv("NOTIFY_CHAT_INTERVAL", "1.0"))  # Telegram allows ~1 msg/s per chat
+MAX_MESSAGE = 4096  # Telegram's text limit
+
+
+def _chat_ids(value: Any) -> List[str]:
+    if isinstance(value, str):
+        return [c.strip() for c in value.split(",") if c.strip()]
+    return [str(c) for c in value or ()]
+
+
+class TelegramNotifier:
+    """Outbound alert queue for Telegram.
+
+    submit() never blocks: alerts go into a bounded queue (and are counted as
+    dropped when it is full). A daemon thread drains it, coalesces everything
+    that arrives within `digest_seconds` into digest messages (alerts sharing
+    a key keep only the latest text), and posts them to each chat, spacing
+    messages per chat and retrying 429/5xx/network errors with backoff.
+    """
+
+    def __init__(self, token: str = TELEGRAM_BOT_TOKEN, chat_ids: Any = TELEGRAM_CHAT_ID,
+                 api: str = TELEGRAM_API, maxsize: int = QUEUE_SIZE,
+                 digest_seconds: float = DIGEST_SECONDS, chat_interval: float = CHAT_INTERVAL,
+                 max_retries: int = 4, backoff: float = 1.0, timeout: float = 10.0,
+                 session: Optional["requests.Session"] = None):
+        self.token = token
+        self.chat_ids = _chat_ids(chat_ids)
+        self.api = api.rstrip("/")
+        self.digest_seconds = digest_seconds
+        self.chat_interval = chat_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = session  # created on the first send
+        self.maxsize = maxsize
+        self._queue: "queue.Queue[Tuple[Optional[Hashable], str]]" = queue.Queue(maxsize=maxsize)
+        self._next_send: Dict[str, float] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token and self.chat_ids)
+
+    def submit(self, text: str, key: Optional[Hashable] = None) -> bool:
+        # non-blocking; False if notifications are off or the queue is full
+        if not self.enabled:
+            return False
+        try:
+            self._queue.put_nowait((key, text))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    # ---------- dispatcher ----------
+    def start(self):
+        if self.enabled and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="telegram-notifier", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        # flushes what is already queued, then joins
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _collect(self) -> List[Tuple[Optional[Hashable], str]]:
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.digest_seconds
+        while not self._stop.is_set():
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=min(left, 0.5)))
+            except queue.Empty:
+                continue
+        while True:  # whatever is already waiting joins this digest
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch:
+                try:
+                    self.flush(batch)
+                except Exception as e:
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    traceback.print_exc()
+            elif self._stop.is_set():
+                return
+
+    def digest(self, batch: Sequence[Tuple[Optional[Hashable], str]]) -> List[str]:
+        # latest text per key, in first-seen order, packed into as few messages as fit
+        lines: "OrderedDict[Hashable, str]" = OrderedDict()
+        for i, (key, text) in enumerate(batch):
+            k = ("_", i) if key is None else key
+            if k in lines:
+                self.coalesced += 1
+            lines[k] = text
+        header = f"⚡ Algo Hunter — {len(lines)} alert{'s' if len(lines) != 1 else ''}"
+        cont = header + " (cont.)"
+        messages, cur = [], header
+        for text in lines.values():
+            # budget for the longer continuation header, so a line alone always fits one message
+            text = text[: MAX_MESSAGE - len(cont) - 1]
+            if len(cur) + 1 + len(text) > MAX_MESSAGE:
+                messages.append(cur)
+                cur = cont
+            cur += "\n" + text
+        messages.append(cur)
+        return messages
+
+    def flush(self, batch: Sequence[Tuple[Optional[Hashable], str]]):
+        for text in self.digest(batch):
+            for chat in self.chat_ids:
+                if self.send(chat, text):
+                    self.sent += 1
+                else:
+                    self.failed += 1
+
+    # ---------- delivery ----------
+    def _pace(self, chat: str):
+        wait = self._next_send.get(chat, 0.0) - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._next_send[chat] = time.monotonic() + self.chat_interval
+
+    def send(self, chat: str, text: str) -> bool:
+        import requests  # deferred: a server without a bot token never loads it
+        if self.session is None:
+            self.session = requests.Session()
+        url = f"{self.api}/bot{self.token}/sendMessage"
+        payload = {"chat_id": chat, "text": text, "disable_web_page_preview": True}
+        for attempt in range(self.max_retries + 1):
+            self._pace(chat)
+            delay = self.backoff * (2 ** attempt) + random.uniform(0, self.backoff)
+            try:
+                r = self.session.post(url, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+            else:
+                if r.status_code == 200:
+                    return True
+                self.last_error = f"HTTP {r.status_code}: {r.text[:200]}"
+                if r.status_code == 429:
+                    try:
+                        delay = float(r.json().get("parameters", {}).get("retry_after", delay))
+                    except (ValueError, AttributeError):
+                        pass
+                elif r.status_code < 500:
+                    return False  # bad token / chat id: retrying won't help
+            if attempt == self.max_retries:
+                break
+            self.retries += 1
+            time.sleep(delay)
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "chats": len(self.chat_ids),
+            "queue_depth": self._queue.qsize(),
+            "queue_size": self.maxsize,
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "sent_messages": self.sent,
+            "failed_messages": self.failed,
+            "retries": self.retries,
+            "last_error": self.last_error,
+        }
+
+
+def format_signal(s: Dict[str, Any]) -> str:
+    arrow = "🟢" if s.get("direction") == "up" else "🔴"
+    return f"{arrow} {s.get('symbol')} {s.get('change', 0.0) * 100:+.2f}% → {s.get('price'):.6g} ({s.get('name')})"
+
+
+# shared notifier for the API process; inert unless TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID are set
+notifier = TelegramNotifier()
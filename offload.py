@@ -0,0 +1,95 @@
+# offload.py
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional, TypeVar
+
+import metrics
+import profiling
+from asset_store import AssetStore, Snapshot
+
+# threads for dataset loads and heavy recomputation, separate from anyio's default pool
+API_WORKERS = int(os.getenv("API_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+_inflight = 0
+_completed = 0
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="api-worker")
+    return _executor
+
+
+async def run(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    # run blocking work on the API executor; the event loop only awaits
+    global _inflight, _completed
+    call = functools.partial(fn, *args, **kwargs)
+    profile = profiling.current()
+    if profile is not None:
+        call = functools.partial(profile.run, call)
+    submitted = time.perf_counter()
+
+    def task():
+        # time spent waiting for a free worker: a saturated pool shows up here
+        metrics.observe("executor_queue_seconds", time.perf_counter() - submitted)
+        return call()
+
+    with _lock:
+        _inflight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor(), task)
+    finally:
+        with _lock:
+            _inflight -= 1
+            _completed += 1
+
+
+async def iterate(fn: Callable[..., Iterable[T]], *args: Any, **kwargs: Any) -> AsyncIterator[T]:
+    # drain a blocking iterator on the executor, handing items to the loop as they arrive
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue" = asyncio.Queue()
+    done = object()
+
+    def drain():
+        try:
+            for item in fn(*args, **kwargs):
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    producer = asyncio.ensure_future(run(drain))
+    while True:
+        item = await queue.get()
+        if item is done:
+            break
+        yield item
+    await producer  # re-raise anything the iterator raised
+
+
+async def snapshot(store: AssetStore) -> Snapshot:
+    # current snapshot without leaving the loop; a (re)load happens on the executor
+    snap = store.peek()
+    return snap if snap is not None else await run(store.get)
+
+
+def shutdown():
+    global _executor
+    with _lock:
+        ex, _executor = _executor, None
+    if ex is not None:
+        ex.shutdown(wait=False)
+
+
+def stats() -> Dict[str, Any]:
+    return {"workers": API_WORKERS, "inflight": _inflight, "completed": _completed}
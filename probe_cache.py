@@ -0,0 +1,104 @@
+# probe_cache.py
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+PROBE_CACHE_FILE = os.getenv("PROBE_CACHE_FILE", ".probe_cache.sqlite")
+POSITIVE_TTL = float(os.getenv("PROBE_CACHE_POSITIVE_TTL", str(7 * 24 * 3600)))  # listed pairs rarely vanish
+NEGATIVE_TTL = float(os.getenv("PROBE_CACHE_NEGATIVE_TTL", str(24 * 3600)))      # new listings should show up within a day
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    exchange   TEXT NOT NULL,
+    symbol     TEXT NOT NULL,
+    pair       TEXT NOT NULL,
+    listed     INTEGER NOT NULL,
+    checked_at REAL NOT NULL,
+    PRIMARY KEY (exchange, symbol, pair)
+) WITHOUT ROWID
+"""
+
+
+class ProbeCache:
+    """Outcome of each (exchange, symbol, candidate pair) probe, on disk.
+
+    get() returns True (listed) / False (known absent) while the entry is
+    within its TTL, or None when the network has to be asked. Only definite
+    answers are stored: a 200 is positive, a 400/404 negative; throttling
+    (403, 418, 429), 5xx and network errors are not cached.
+    """
+
+    def __init__(self, path: str = PROBE_CACHE_FILE, positive_ttl: float = POSITIVE_TTL,
+                 negative_ttl: float = NEGATIVE_TTL):
+        self.path = path
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        # opened lazily so importing the module never touches the disk
+        if self._db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(_SCHEMA)
+            self._db = db
+        return self._db
+
+    def get(self, exchange: str, symbol: str, pair: str) -> Optional[bool]:
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT listed, checked_at FROM probes WHERE exchange=? AND symbol=? AND pair=?",
+                (exchange, symbol, pair)).fetchone()
+            if row is not None:
+                listed, checked_at = bool(row[0]), row[1]
+                ttl = self.positive_ttl if listed else self.negative_ttl
+                if time.time() - checked_at < ttl:
+                    self.hits += 1
+                    return listed
+            self.misses += 1
+            return None
+
+    def put(self, exchange: str, symbol: str, pair: str, listed: bool):
+        with self._lock:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO probes (exchange, symbol, pair, listed, checked_at) VALUES (?, ?, ?, ?, ?)",
+                (exchange, symbol, pair, int(listed), time.time()))
+            self.writes += 1
+
+    def purge(self) -> int:
+        # drop entries past their TTL; returns the number removed
+        now = time.time()
+        with self._lock:
+            cur = self._conn().execute(
+                "DELETE FROM probes WHERE (listed=1 AND checked_at < ?) OR (listed=0 AND checked_at < ?)",
+                (now - self.positive_ttl, now - self.negative_ttl))
+            return cur.rowcount
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._conn().execute("SELECT listed, COUNT(*) FROM probes GROUP BY listed").fetchall())
+        return {
+            "path": self.path,
+            "positive": counts.get(1, 0),
+            "negative": counts.get(0, 0),
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+        }
+
+
+# shared cache used by multi_fetcher's probes; PROBE_CACHE=0 turns it off
+cache: Optional[ProbeCache] = ProbeCache() if os.getenv("PROBE_CACHE", "1") != "0" else None
@@ -0,0 +1,148 @@
+# profiling.py
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+import metrics
+
+# per-request profiles are opt-in twice: the server must enable them, and the
+# caller must send the header together with a valid API key
+PROFILING = os.getenv("PROFILING", "0") == "1"
+HEADER = b"x-profile"
+TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP", "40"))
+
+_current: "ContextVar[Optional[RequestProfile]]" = ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    """cProfile stats for one request.
+
+    Handlers do their heavy work through offload.run(), which calls run() in
+    the worker thread when a profile is active for the request's context;
+    stats from every such call are merged. Work done on the event loop
+    itself is not profiled (it is shared with other requests) but shows in
+    the wall time.
+    """
+
+    def __init__(self, sort: str = "cumulative"):
+        self.sort = sort if sort in ("cumulative", "tottime", "calls") else "cumulative"
+        self.started = time.perf_counter()
+        self.calls = 0
+        self.skipped = 0
+        self._stats: Optional[pstats.Stats] = None
+        self._lock = threading.Lock()
+
+    def run(self, fn: Callable[[], Any]) -> Any:
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            # another profiler owns this thread: run unprofiled rather than fail the request
+            with self._lock:
+                self.skipped += 1
+            return fn()
+        try:
+            return fn()
+        finally:
+            prof.disable()
+            with self._lock:
+                self.calls += 1
+                if self._stats is None:
+                    self._stats = pstats.Stats(prof)
+                else:
+                    self._stats.add(prof)
+
+    def summary(self, status: int, body_bytes: int) -> str:
+        wall = time.perf_counter() - self.started
+        head = (f"status {status}, {body_bytes} body bytes, wall {wall * 1000:.2f} ms, "
+                f"{self.calls} profiled executor call(s)"
+                + (f", {self.skipped} skipped (profiler busy)" if self.skipped else "") + "\n\n")
+        with self._lock:
+            if self._stats is None:
+                return head + "no executor work to profile (answered on the event loop)\n"
+            out = io.StringIO()
+            self._stats.stream = out
+            self._stats.sort_stats(self.sort).print_stats(TOP_FUNCTIONS)
+        return head + out.getvalue()
+
+
+def current() -> Optional[RequestProfile]:
+    return _current.get()
+
+
+def _route(scope) -> str:
+    # the matched path template keeps label cardinality bounded; unmatched paths share one label
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class InstrumentMiddleware:
+    """ASGI middleware: a latency histogram per (method, route, status), plus
+    opt-in profiling.
+
+    With PROFILING=1, a request carrying `X-Profile: 1` (or `X-Profile: tottime`)
+    and passing `authorize(api_key)` runs normally, but the response body is
+    replaced by a plain-text cProfile summary; the original status is kept in
+    X-Profile-Status.
+    """
+
+    def __init__(self, app, authorize: Callable[[Optional[str]], bool] = lambda key: False):
+        self.app = app
+        self.authorize = authorize
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        t0 = time.perf_counter()
+        status = 500
+        profile = None
+        if PROFILING:
+            headers = dict(scope.get("headers") or ())
+            mode = headers.get(HEADER)
+            if mode and self.authorize((headers.get(b"x-api-key") or b"").decode("latin-1") or None):
+                profile = RequestProfile(sort=mode.decode("latin-1") if mode not in (b"1", b"true") else "cumulative")
+
+        if profile is None:
+            async def send_wrapper(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                metrics.observe("http_request_seconds", time.perf_counter() - t0,
+                                method=scope["method"], route=_route(scope), status=status)
+            return
+
+        body_bytes = 0
+
+        async def capture(message):
+            nonlocal status, body_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                body_bytes += len(message.get("body", b""))
+
+        token = _current.set(profile)
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            _current.reset(token)
+        metrics.inc("profiled_requests_total", route=_route(scope))
+        body = profile.summary(status, body_bytes).encode("utf-8")
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(body)).encode("ascii")),
+            (b"x-profile-status", str(status).encode("ascii")),
+            (b"cache-control", b"no-store"),
+        ]})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,194 @@
+# ranking.py
+import bisect
+import heapq
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import metrics
+import scoring
+from asset_store import Snapshot
+
+
+def usd_quote(c: Dict[str, Any]) -> Dict[str, Any]:
+    q = c.get("quote")
+    if not isinstance(q, dict):
+        return {}
+    return q.get("USD") or {}
+
+
+def market_cap(c: Dict[str, Any]) -> float:
+    try:
+        return float(usd_quote(c).get("market_cap") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def score(c: Dict[str, Any]) -> float:
+    # weights live in scoring.py ("default" profile)
+    return scoring.score_record(c, scoring.get_profile("default"))
+
+
+RANK_KEYS: Dict[str, Callable[[Dict[str, Any]], float]] = {
+    "score": score,
+    "market_cap": market_cap,
+}
+
+# sorted entries are (-value, position): ascending order == descending value,
+# ties keep dataset order exactly like sorted(..., reverse=True)
+Entry = Tuple[float, int]
+
+
+class RankingIndex:
+    """Top-k orders for one dataset snapshot.
+
+    Rank keys are computed once per record. Each order is kept as an exact
+    sorted prefix that is grown on demand with heapq partial selection, and
+    patched in place with bisect when individual records change.
+    """
+
+    def __init__(self, assets: Sequence[Dict[str, Any]], values: Optional[Dict[str, List[float]]] = None):
+        # a mmap'd ColumnarDataset is kept as-is so records are only built for returned rows
+        self.assets: Sequence[Dict[str, Any]] = assets if hasattr(assets, "column") else list(assets)
+        # precomputed rank keys (e.g. from scoring's vectorized pass) skip the per-record loop
+        values = dict(values or {})
+        for by, fn in RANK_KEYS.items():
+            if by not in values:
+                values[by] = [fn(c) for c in self.assets]
+        self.values: Dict[str, List[float]] = values
+        self._prefix: Dict[str, List[Entry]] = {by: [] for by in RANK_KEYS}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.assets)
+
+    def _ensure(self, by: str, k: int) -> List[Entry]:
+        prefix = self._prefix[by]
+        n = len(self.assets)
+        k = min(k, n)
+        if len(prefix) >= k:
+            return prefix
+        with self._lock:
+            prefix = self._prefix[by]
+            if len(prefix) < k:
+                vals = self.values[by]
+                # grow geometrically so a run of increasing k doesn't reselect each time
+                want = min(n, max(k, 2 * len(prefix)))
+                prefix = heapq.nsmallest(want, ((-v, i) for i, v in enumerate(vals)))
+                self._prefix[by] = prefix
+        return prefix
+
+    def top_k(self, k: int, by: str = "score") -> List[Tuple[float, Dict[str, Any]]]:
+        if by not in RANK_KEYS:
+            raise ValueError(f"unknown ranking key: {by}")
+        if k <= 0:
+            return []
+        prefix = self._ensure(by, k)
+        return [(-neg, self.assets[i]) for neg, i in prefix[:k]]
+
+    def update(self, changes: Iterable[Tuple[int, Dict[str, Any]]]) -> None:
+        # apply (position, new_record) changes without re-sorting
+        with self._lock:
+            for pos, rec in changes:
+                self.assets[pos] = rec
+                for by, fn in RANK_KEYS.items():
+                    vals = self.values[by]
+                    old, new = vals[pos], fn(rec)
+                    if old == new:
+                        continue
+                    vals[pos] = new
+                    prefix = self._prefix[by]
+                    if not prefix:
+                        continue
+                    tail = prefix[-1]
+                    full = len(prefix) == len(self.assets)
+                    j = bisect.bisect_left(prefix, (-old, pos))
+                    if j < len(prefix) and prefix[j] == (-old, pos):
+                        del prefix[j]
+                    # everything outside the prefix ranks below its old tail,
+                    # so the new entry belongs in the prefix only if it beats that tail
+                    entry = (-new, pos)
+                    if full or entry < tail:
+                        bisect.insort(prefix, entry)
+
+    def patched(self, assets: Sequence[Dict[str, Any]], max_changes: Optional[int] = None) -> Optional["RankingIndex"]:
+        # derive an index for a new snapshot with the same id layout, or None if a rebuild is cheaper
+        if not isinstance(self.assets, list) or hasattr(assets, "column") or len(assets) != len(self.assets):
+            return None
+        if max_changes is None:
+            max_changes = max(16, len(assets) // 20)
+        changes = []
+        for pos, (old, new) in enumerate(zip(self.assets, assets)):
+            if old is new:
+                continue
+            if old.get("id") != new.get("id"):
+                return None
+            if old != new:
+                changes.append((pos, new))
+                if len(changes) > max_changes:
+                    return None
+        idx = RankingIndex.__new__(RankingIndex)
+        idx.assets = list(self.assets)
+        idx.values = {by: list(v) for by, v in self.values.items()}
+        idx._prefix = {by: list(p) for by, p in self._prefix.items()}
+        idx._lock = threading.Lock()
+        idx.update(changes)
+        return idx
+
+
+# one index per data file, tied to the snapshot it was built from
+_indexes: Dict[str, Tuple[Snapshot, RankingIndex]] = {}
+_indexes_lock = threading.Lock()
+
+
+def _same_file(a: Snapshot, b: Snapshot) -> bool:
+    # snapshots from different stores over the same unchanged file share an index
+    return a is b or (a.mtime_ns, a.size) == (b.mtime_ns, b.size)
+
+
+def _vector_values(snapshot: Snapshot) -> Optional[Dict[str, List[float]]]:
+    if scoring.np is None:
+        return None
+    return {
+        "score": scoring.scores(snapshot).tolist(),
+        "market_cap": scoring.columns(snapshot)["market_cap"].tolist(),
+    }
+
+
+def get_index(snapshot: Snapshot) -> RankingIndex:
+    if hasattr(snapshot.assets, "top_k"):
+        # SqliteDataset answers top-k with indexed ORDER BY ... LIMIT queries
+        return snapshot.assets
+    cached = _indexes.get(snapshot.path)
+    if cached is not None and _same_file(cached[0], snapshot):
+        return cached[1]
+    with _indexes_lock:
+        cached = _indexes.get(snapshot.path)
+        if cached is not None and _same_file(cached[0], snapshot):
+            return cached[1]
+        idx = None
+        if cached is not None:
+            with metrics.timer("index_build_seconds", index="ranking", mode="patch"):
+                idx = cached[1].patched(snapshot.assets)
+        if idx is None:
+            with metrics.timer("index_build_seconds", index="ranking", mode="full"):
+                idx = RankingIndex(snapshot.assets, values=_vector_values(snapshot))
+        _indexes[snapshot.path] = (snapshot, idx)
+        return idx
+
+
+def ranked_rows(index: RankingIndex, k: int, by: str = "score") -> List[Dict[str, Any]]:
+    out = []
+    for i, (value, r) in enumerate(index.top_k(k, by), start=1):
+        usd = usd_quote(r)
+        out.append({
+            "rank": i,
+            "id": r.get("id"),
+            "name": r.get("name"),
+            "symbol": (r.get("symbol") or "").upper(),
+            "score": value if by == "score" else score(r),
+            "market_cap": usd.get("market_cap"),
+            "price": usd.get("price"),
+            "binance_pair": r.get("binance_pair"),
+            "coinbase_pair": r.get("coinbase_pair"),
+        })
+    return out
@@ -0,0 +1,118 @@
+# response_cache.py
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+import metrics
+from asset_store import Snapshot
+
+
+def dumps(payload: Any) -> bytes:
+    # same encoding FastAPI's JSONResponse uses
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def snapshot_tag(snapshot: Snapshot) -> str:
+    # derived from the file identity, not the per-process version counter,
+    # so every worker serving the same file hands out the same ETag
+    return f"{snapshot.path}:{snapshot.mtime_ns}:{snapshot.size}"
+
+
+def _etag(tag: str, key: Hashable) -> str:
+    return '"' + hashlib.sha1(f"{tag}|{key!r}".encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(t.strip().removeprefix("W/") == etag for t in if_none_match.split(","))
+
+
+def _route(key: Hashable) -> str:
+    # metric label: the route part of ("top", k, by)-style keys
+    return str(key[0] if isinstance(key, tuple) and key else key)
+
+
+class ResponseCache:
+    """Serialized JSON bodies per (snapshot, route key), bounded LRU.
+
+    Entries for older snapshots are dropped as soon as a new snapshot is seen.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[str, bytes]]" = OrderedDict()
+        self._tag: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, snapshot: Snapshot, key: Hashable, build: Callable[[], Any]) -> Tuple[str, bytes]:
+        tag = snapshot_tag(snapshot)
+        ck = (tag, key)
+        with self._lock:
+            if tag != self._tag:
+                self._entries.clear()
+                self._tag = tag
+            hit = self._entries.get(ck)
+            if hit is not None:
+                self._entries.move_to_end(ck)
+                self.hits += 1
+                return hit
+            self.misses += 1
+
+        # build outside the lock; a concurrent duplicate build is harmless
+        route = _route(key)
+        t0 = time.perf_counter()
+        payload = build()
+        t1 = time.perf_counter()
+        entry = (_etag(tag, key), dumps(payload))
+        metrics.observe("response_build_seconds", t1 - t0, route=route)
+        metrics.observe("serialize_seconds", time.perf_counter() - t1, route=route)
+        with self._lock:
+            if tag == self._tag:
+                self._entries[ck] = entry
+                self._entries.move_to_end(ck)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def peek(self, snapshot: Snapshot, key: Hashable) -> Optional[Tuple[str, bytes]]:
+        # cache hit or None; never builds
+        ck = (snapshot_tag(snapshot), key)
+        with self._lock:
+            hit = self._entries.get(ck)
+            if hit is not None:
+                self._entries.move_to_end(ck)
+                self.hits += 1
+            return hit
+
+    def respond(self, request: Request, snapshot: Snapshot, key: Hashable, build: Callable[[], Any]) -> Response:
+        return self._response(request, self.get(snapshot, key, build))
+
+    async def respond_async(self, request: Request, snapshot: Snapshot, key: Hashable, build: Callable[[], Any],
+                            run: Callable[..., Awaitable[Tuple[str, bytes]]]) -> Response:
+        # hits are answered on the event loop; a miss builds and serializes via `run` (an executor)
+        entry = self.peek(snapshot, key)
+        if entry is None:
+            entry = await run(self.get, snapshot, key, build)
+        return self._response(request, entry)
+
+    def _response(self, request: Request, entry: Tuple[str, bytes]) -> Response:
+        etag, body = entry
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,141 @@
+# scheduler.py
+import asyncio
+import os
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+from asset_store import AssetStore, Snapshot
+
+
+def warm_snapshot(snapshot: Snapshot):
+    # build the per-snapshot indexes so the first request after a swap doesn't pay for them
+    import asset_listing
+    from dataset_db import SqliteDataset
+    from ranking import get_index
+    from search_index import get_search_index
+    get_index(snapshot).top_k(10)
+    if isinstance(snapshot.assets, SqliteDataset):
+        return  # /search and /assets query the build directly; nothing to hold in memory
+    get_search_index(snapshot)
+    if asset_listing.available():
+        asset_listing.get_listing(snapshot)
+
+
+def refresh_quotes(probe_ttl_hours: float = float("inf")):
+    # quotes-only delta refresh (new coins still get probed), then rebuild the columnar / SQLite copies in use.
+    # Skipped while another process (a CLI run, another API server) holds the data lock: it is
+    # rewriting the same files, and the snapshot reload picks up its result
+    import columnar
+    import dataset_db
+    import multi_fetcher
+    from file_lock import FileLock
+    lock = FileLock(multi_fetcher.DATA_LOCK_FILE)
+    if not lock.acquire(blocking=False):
+        print(f"Refresh skipped: {multi_fetcher.DATA_LOCK_FILE} is held by another process")
+        return
+    try:
+        multi_fetcher.delta_refresh(probe_ttl_hours=probe_ttl_hours)
+        if columnar.available() and os.path.exists(columnar.meta_path()):
+            multi_fetcher.build_columnar()
+        if os.path.exists(dataset_db.DATASET_DB):
+            multi_fetcher.build_database()
+    finally:
+        lock.release()
+
+
+class RefreshScheduler:
+    """Periodic background refresh for the API process.
+
+    Every `interval` seconds the (optional) remote refresh runs in a worker
+    thread, then the dataset snapshot is reloaded and its indexes warmed in
+    that same thread; the store publishes it atomically. The event loop only
+    awaits, so requests are never blocked by a refresh.
+    """
+
+    def __init__(self, store: AssetStore, interval: float,
+                 refresh_fn: Optional[Callable[[], Any]] = None,
+                 warm_fns: Optional[List[Callable[[Snapshot], Any]]] = None):
+        self.store = store
+        self.interval = interval
+        self.refresh_fn = refresh_fn
+        self.warm_fns = warm_fns if warm_fns is not None else [warm_snapshot]
+        self._task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()  # one refresh at a time, even if triggered manually
+        self.runs = 0
+        self.failures = 0
+        self.last_started: Optional[float] = None
+        self.last_finished: Optional[float] = None
+        self.last_success: Optional[float] = None
+        self.last_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def refresh_once(self) -> Snapshot:
+        # blocking: run in a worker thread
+        with self._lock:
+            self.last_started = time.time()
+            t0 = time.perf_counter()
+            result = "error"
+            try:
+                if self.refresh_fn is not None:
+                    self.refresh_fn()
+                snapshot = self.store.get()
+                for fn in self.warm_fns:
+                    fn(snapshot)
+                self.last_success = time.time()
+                self.last_error = None
+                result = "ok"
+                return snapshot
+            except BaseException as e:
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                traceback.print_exc()
+                raise
+            finally:
+                self.runs += 1
+                self.last_seconds = time.perf_counter() - t0
+                self.last_finished = time.time()
+                metrics.observe("refresh_seconds", self.last_seconds, result=result)
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh_once)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass  # recorded in stats; try again next tick
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        snap = self.store.current()
+        return {
+            "enabled": self._task is not None,
+            "remote_refresh": self.refresh_fn is not None,
+            "interval": self.interval,
+            "running": self._lock.locked(),
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_refresh_at": self.last_finished,
+            "last_refresh_seconds": None if self.last_seconds is None else round(self.last_seconds, 6),
+            "last_error": self.last_error,
+            "seconds_since_success": None if self.last_success is None else round(now - self.last_success, 3),
+            # age of the data being served, from the data file's mtime
+            "data_age_seconds": None if snap is None else round(now - snap.mtime_ns / 1e9, 3),
+        }
@@ -0,0 +1,239 @@
+# scoring.py
+import json
+import math
+import os
+import threading
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Dict, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional: falls back to a per-record Python loop
+    np = None
+
+import metrics
+from asset_store import Snapshot
+
+PROFILES_FILE = os.getenv("SCORING_PROFILES_FILE", "scoring_profiles.json")
+
+
+@dataclass(frozen=True)
+class ScoringProfile:
+    # score = binance*has_binance + coinbase*has_coinbase + okx*has_okx
+    #       + market_cap*sqrt(mc) + volume*sqrt(vol_24h)
+    #       + percent_change_24h*pct_24h + exchange_count*n_exchanges
+    name: str = "default"
+    binance: float = 150.0
+    coinbase: float = 90.0
+    okx: float = 0.0
+    market_cap: float = 1.0
+    volume: float = 0.0
+    percent_change_24h: float = 0.0
+    exchange_count: float = 0.0
+
+
+# "default" is the long-standing /top10 formula
+DEFAULT_PROFILES: Dict[str, ScoringProfile] = {
+    "default": ScoringProfile(),
+    "liquidity": ScoringProfile(name="liquidity", binance=100.0, coinbase=60.0, okx=40.0, market_cap=0.5, volume=2.0),
+    "momentum": ScoringProfile(name="momentum", binance=50.0, coinbase=30.0, market_cap=0.25, percent_change_24h=500.0),
+    "availability": ScoringProfile(name="availability", binance=0.0, coinbase=0.0, market_cap=0.01, exchange_count=1000.0),
+}
+
+
+def load_profiles(path: str = PROFILES_FILE) -> Dict[str, ScoringProfile]:
+    # optional JSON file: {"name": {"binance": 120, "volume": 1.5, ...}, ...}
+    # entries override (or extend) the built-in profiles field by field
+    profiles = dict(DEFAULT_PROFILES)
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        for name, weights in raw.items():
+            base = profiles.get(name, ScoringProfile(name=name))
+            profiles[name] = replace(base, name=name, **{k: float(v) for k, v in weights.items()})
+    return profiles
+
+
+PROFILES = load_profiles()
+
+
+def get_profile(name: str) -> ScoringProfile:
+    if name not in PROFILES:
+        raise ValueError(f"unknown scoring profile: {name} (known: {', '.join(sorted(PROFILES))})")
+    return PROFILES[name]
+
+
+def _usd(c: Dict[str, Any]) -> Dict[str, Any]:
+    q = c.get("quote")
+    return (q.get("USD") or {}) if isinstance(q, dict) else {}
+
+
+def _num(v) -> float:
+    try:
+        v = float(v or 0)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if v != v else v
+
+
+def score_record(c: Dict[str, Any], profile: ScoringProfile = DEFAULT_PROFILES["default"]) -> float:
+    usd = _usd(c)
+    mc = _num(usd.get("market_cap"))
+    vol = _num(usd.get("volume_24h"))
+    b = 1 if c.get("binance_pair") else 0
+    cb = 1 if c.get("coinbase_pair") else 0
+    ok = 1 if c.get("okx_pair") else 0
+    s = (b * profile.binance) + (cb * profile.coinbase) + (0 if mc <= 0 else math.sqrt(mc) * profile.market_cap)
+    if profile.okx:
+        s += ok * profile.okx
+    if profile.volume and vol > 0:
+        s += math.sqrt(vol) * profile.volume
+    if profile.percent_change_24h:
+        s += _num(usd.get("percent_change_24h")) * profile.percent_change_24h
+    if profile.exchange_count:
+        s += (b + cb + ok) * profile.exchange_count
+    return s
+
+
+# ---------------- COLUMNS ----------------
+def build_columns(assets: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    if hasattr(assets, "column"):
+        # ColumnarDataset: arrays are already there (NaN = missing)
+        cols = {f: np.nan_to_num(np.asarray(assets.column(f), dtype=np.float64), nan=0.0)
+                for f in ("market_cap", "volume_24h", "percent_change_24h")}
+        for ex in ("binance", "coinbase", "okx"):
+            col = assets.string(ex + "_pair")
+            offsets = np.asarray(col.offsets)
+            # truthy like c.get(...): present and non-empty
+            cols["has_" + ex] = ~np.asarray(col.nulls) & (offsets[1:] > offsets[:-1])
+        return cols
+
+    if hasattr(assets, "scalar_column"):
+        # SqliteDataset: read the narrow columns, skip the JSON records
+        cols = {f: np.array([_num(v) for v in assets.scalar_column(f)])
+                for f in ("market_cap", "volume_24h", "percent_change_24h")}
+        for ex in ("binance", "coinbase", "okx"):
+            cols["has_" + ex] = np.array([bool(v) for v in assets.scalar_column(ex + "_pair")], dtype=np.bool_)
+        return cols
+
+    n = len(assets)
+    mc = np.zeros(n)
+    vol = np.zeros(n)
+    pct = np.zeros(n)
+    has = {ex: np.zeros(n, dtype=np.bool_) for ex in ("binance", "coinbase", "okx")}
+    for i, c in enumerate(assets):
+        usd = _usd(c)
+        mc[i] = _num(usd.get("market_cap"))
+        vol[i] = _num(usd.get("volume_24h"))
+        pct[i] = _num(usd.get("percent_change_24h"))
+        for ex, arr in has.items():
+            arr[i] = bool(c.get(ex + "_pair"))
+    cols = {"market_cap": mc, "volume_24h": vol, "percent_change_24h": pct}
+    for ex, arr in has.items():
+        cols["has_" + ex] = arr
+    return cols
+
+
+def score_columns(cols: Dict[str, Any], profile: ScoringProfile):
+    # same arithmetic order as score_record (both use a correctly rounded sqrt), so scores match it exactly
+    mc = cols["market_cap"]
+    b = cols["has_binance"]
+    cb = cols["has_coinbase"]
+    ok = cols["has_okx"]
+    s = (b * profile.binance) + (cb * profile.coinbase) + np.where(mc > 0, np.sqrt(np.maximum(mc, 0)), 0.0) * profile.market_cap
+    if profile.okx:
+        s += ok * profile.okx
+    if profile.volume:
+        vol = cols["volume_24h"]
+        s += np.where(vol > 0, np.sqrt(np.maximum(vol, 0)), 0.0) * profile.volume
+    if profile.percent_change_24h:
+        s += cols["percent_change_24h"] * profile.percent_change_24h
+    if profile.exchange_count:
+        s += (b.astype(np.int64) + cb + ok) * profile.exchange_count
+    return s
+
+
+# ---------------- PER-SNAPSHOT CACHE ----------------
+# path -> (snapshot, {"columns": ..., profile: scores})
+_cache: Dict[str, Tuple[Snapshot, Dict[Any, Any]]] = {}
+_cache_lock = threading.Lock()
+
+
+def _entry(snapshot: Snapshot) -> Dict[Any, Any]:
+    cached = _cache.get(snapshot.path)
+    if cached is not None and cached[0] is snapshot:
+        return cached[1]
+    with _cache_lock:
+        cached = _cache.get(snapshot.path)
+        if cached is None or cached[0] is not snapshot:
+            cached = (snapshot, {})
+            _cache[snapshot.path] = cached
+        return cached[1]
+
+
+def columns(snapshot: Snapshot) -> Dict[str, Any]:
+    entry = _entry(snapshot)
+    cols = entry.get("columns")
+    if cols is None:
+        with metrics.timer("scoring_seconds", step="columns"):
+            cols = build_columns(snapshot.assets)
+        entry["columns"] = cols
+    return cols
+
+
+def scores(snapshot: Snapshot, profile: ScoringProfile = DEFAULT_PROFILES["default"]):
+    # whole-universe scores for one profile: ndarray with numpy, list without
+    entry = _entry(snapshot)
+    out = entry.get(profile)
+    if out is None:
+        if np is not None:
+            cols = columns(snapshot)
+            with metrics.timer("scoring_seconds", step="score"):
+                out = score_columns(cols, profile)
+            out.setflags(write=False)
+        else:
+            with metrics.timer("scoring_seconds", step="score"):
+                out = [score_record(c, profile) for c in snapshot.assets]
+        entry[profile] = out
+    return out
+
+
+def top_indices(values, k: int) -> List[int]:
+    # indices of the k largest values, ties in dataset order (matches sorted(..., reverse=True))
+    n = len(values)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    if np is None:
+        return sorted(range(n), key=lambda i: -values[i])[:k]
+    values = np.asarray(values)
+    if k < n:
+        kth = np.partition(values, n - k)[n - k]
+        above = np.flatnonzero(values > kth)
+        ties = np.flatnonzero(values == kth)[: k - len(above)]
+        idx = np.concatenate([above, ties])
+    else:
+        idx = np.arange(n)
+    order = np.lexsort((idx, -values[idx]))
+    return idx[order].tolist()
+
+
+def evaluate_profiles(snapshot: Snapshot, names: Sequence[str], k: int = 10) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    assets = snapshot.assets
+    for name in names:
+        profile = get_profile(name)
+        vals = scores(snapshot, profile)
+        rows = []
+        for rank, i in enumerate(top_indices(vals, k), start=1):
+            r = assets[i]
+            rows.append({
+                "rank": rank,
+                "id": r.get("id"),
+                "name": r.get("name"),
+                "symbol": (r.get("symbol") or "").upper(),
+                "score": float(vals[i]),
+                "price": _usd(r).get("price"),
+            })
+        out[name] = {"weights": asdict(profile), "top": rows}
+    return out
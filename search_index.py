@@ -0,0 +1,215 @@
+# search_index.py
+import bisect
+import heapq
+import re
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import metrics
+from asset_store import Snapshot
+from dataset_db import SqliteDataset
+from ranking import get_index
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# match kinds, best first
+EXACT_SYMBOL = "symbol"
+EXACT_ID = "id"
+EXACT_NAME = "name"
+PREFIX = "prefix"
+FUZZY = "fuzzy"
+_KIND_ORDER = {EXACT_SYMBOL: 0, EXACT_ID: 1, EXACT_NAME: 2, PREFIX: 3, FUZZY: 4}
+
+
+def normalize(text: Any) -> str:
+    return " ".join(_WORD.findall(str(text or "").lower()))
+
+
+def _trigrams(text: str) -> List[str]:
+    t = f"  {text} "
+    return [t[i:i + 3] for i in range(len(t) - 2)]
+
+
+def _field(assets: Sequence[Dict[str, Any]], name: str):
+    # read one string field for every record; columnar builds skip record materialization
+    if hasattr(assets, "string"):
+        col = assets.string(name)
+        return [col[i] for i in range(len(col))]
+    return [a.get(name) for a in assets]
+
+
+class SearchIndex:
+    """Symbol/name lookup for one dataset snapshot.
+
+    Exact symbol/id/name/slug hits come from hash maps, prefix hits from a
+    sorted token list searched with bisect, and fuzzy hits from a trigram
+    index over names. Results within a match kind are ordered by market cap.
+    """
+
+    def __init__(self, assets: Sequence[Dict[str, Any]], market_caps: Optional[Sequence[float]] = None):
+        self.assets = assets
+        n = len(assets)
+        symbols = _field(assets, "symbol")
+        names = _field(assets, "name")
+        slugs = _field(assets, "slug")
+        if hasattr(assets, "column"):
+            ids = [int(x) for x in assets.column("id")]
+        else:
+            ids = [a.get("id") for a in assets]
+        self.market_caps = list(market_caps) if market_caps is not None else [0.0] * n
+
+        self.by_symbol: Dict[str, List[int]] = defaultdict(list)
+        self.by_id: Dict[str, int] = {}
+        self.by_name: Dict[str, List[int]] = defaultdict(list)
+        self.trigrams: Dict[str, List[int]] = defaultdict(list)
+        tokens: List[Tuple[str, int]] = []
+
+        for i in range(n):
+            sym = normalize(symbols[i]).replace(" ", "")
+            name = normalize(names[i])
+            slug = normalize(slugs[i])
+            if sym:
+                self.by_symbol[sym].append(i)
+                tokens.append((sym, i))
+            if ids[i] is not None:
+                self.by_id[str(ids[i])] = i
+            if name:
+                self.by_name[name].append(i)
+                if name.replace(" ", "") != name:
+                    self.by_name[name.replace(" ", "")].append(i)
+                seen = set()
+                for w in [name] + name.split():
+                    if w not in seen:
+                        seen.add(w)
+                        tokens.append((w, i))
+                for g in set(_trigrams(name)):
+                    self.trigrams[g].append(i)
+            if slug and slug != name:
+                self.by_name[slug].append(i)
+
+        tokens.sort()
+        self.token_keys = [t for t, _ in tokens]
+        self.token_pos = [i for _, i in tokens]
+
+    def _prefix(self, q: str, limit: int) -> List[int]:
+        lo = bisect.bisect_left(self.token_keys, q)
+        hi = bisect.bisect_left(self.token_keys, q + "\uffff", lo)
+        positions = set(self.token_pos[lo:hi])
+        return heapq.nlargest(limit, positions, key=lambda i: (self.market_caps[i], -i))
+
+    def _fuzzy(self, q: str, limit: int) -> List[int]:
+        grams = set(_trigrams(q))
+        if not grams:
+            return []
+        hits: Dict[int, int] = defaultdict(int)
+        for g in grams:
+            for i in self.trigrams.get(g, ()):
+                hits[i] += 1
+        # require a reasonable overlap so short queries don't match everything
+        need = max(1, len(grams) // 2)
+        scored = [(-cnt, -self.market_caps[i], i) for i, cnt in hits.items() if cnt >= need]
+        scored.sort()
+        return [i for _, _, i in scored[:limit]]
+
+    def search(self, query: str, limit: int = 10, fuzzy: bool = True) -> List[Tuple[str, Dict[str, Any]]]:
+        q = normalize(query)
+        if not q or limit <= 0:
+            return []
+        compact = q.replace(" ", "")
+        found: Dict[int, str] = {}
+
+        def add(kind: str, positions):
+            for i in positions:
+                if i not in found:
+                    found[i] = kind
+
+        add(EXACT_SYMBOL, self.by_symbol.get(compact, ()))
+        if compact in self.by_id:
+            add(EXACT_ID, [self.by_id[compact]])
+        add(EXACT_NAME, self.by_name.get(q, ()))
+        add(EXACT_NAME, self.by_name.get(compact, ()))
+        if len(found) < limit:
+            add(PREFIX, self._prefix(q, limit))
+        if fuzzy and len(found) < limit:
+            add(FUZZY, self._fuzzy(q, limit))
+
+        ranked = sorted(found.items(), key=lambda kv: (_KIND_ORDER[kv[1]], -self.market_caps[kv[0]], kv[0]))
+        return [(kind, self.assets[i]) for i, kind in ranked[:limit]]
+
+
+# one index per data file, tied to the snapshot it was built from
+_indexes: Dict[str, Tuple[Snapshot, SearchIndex]] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(snapshot: Snapshot) -> SearchIndex:
+    cached = _indexes.get(snapshot.path)
+    if cached is not None and cached[0] is snapshot:
+        return cached[1]
+    with _indexes_lock:
+        cached = _indexes.get(snapshot.path)
+        if cached is not None and cached[0] is snapshot:
+            return cached[1]
+        # market caps come from the ranking index (vectorized when numpy is present)
+        market_caps = get_index(snapshot).values["market_cap"]
+        with metrics.timer("index_build_seconds", index="search", mode="full"):
+            idx = SearchIndex(snapshot.assets, market_caps=market_caps)
+        _indexes[snapshot.path] = (snapshot, idx)
+        return idx
+
+
+def search_sql(ds: SqliteDataset, query: str, limit: int = 10, fuzzy: bool = True) -> List[Tuple[str, Dict[str, Any]]]:
+    """SearchIndex.search answered by indexed lookups on a SQLite build.
+
+    Exact and prefix matches compare the stored symbol/name/slug
+    case-insensitively (the NOCASE indexes serve = and LIKE 'q%'; a prefix
+    of a later word in the name is a scan of the name index). The fuzzy
+    step is a substring match on names instead of trigrams.
+    """
+    q = normalize(query)
+    if not q or limit <= 0:
+        return []
+    compact = q.replace(" ", "")
+    found: Dict[int, Tuple[int, float]] = {}
+
+    def add(kind: str, where: str, params: Sequence[Any]):
+        for mc, pos in ds.find(where, params, limit):
+            if pos not in found:
+                found[pos] = (_KIND_ORDER[kind], mc)
+
+    add(EXACT_SYMBOL, "symbol = ? COLLATE NOCASE", (compact,))
+    if compact.isdigit():
+        add(EXACT_ID, "id = ?", (int(compact),))
+    add(EXACT_NAME, "name = ? COLLATE NOCASE OR slug = ? COLLATE NOCASE", (q, q.replace(" ", "-")))
+    # the normalized query is [a-z0-9 ] only, so it never carries LIKE wildcards
+    if len(found) < limit:
+        add(PREFIX, "symbol LIKE ? OR name LIKE ? OR name LIKE ?", (compact + "%", q + "%", "% " + q + "%"))
+    if fuzzy and len(found) < limit:
+        add(FUZZY, "name LIKE ?", ("%" + q + "%",))
+
+    ranked = sorted(found.items(), key=lambda kv: (kv[1][0], -kv[1][1], kv[0]))[:limit]
+    kinds = {order: kind for kind, order in _KIND_ORDER.items()}
+    return list(zip([kinds[k[0]] for _, k in ranked], ds.records([pos for pos, _ in ranked])))
+
+
+def search_rows(snapshot: Snapshot, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+    if isinstance(snapshot.assets, SqliteDataset):
+        matches = search_sql(snapshot.assets, query, limit)
+    else:
+        matches = get_search_index(snapshot).search(query, limit)
+    out = []
+    for kind, r in matches:
+        q = r.get("quote")
+        usd = (q.get("USD") or {}) if isinstance(q, dict) else {}
+        out.append({
+            "match": kind,
+            "id": r.get("id"),
+            "name": r.get("name"),
+            "symbol": (r.get("symbol") or "").upper(),
+            "price": usd.get("price"),
+            "market_cap": usd.get("market_cap"),
+            "binance_pair": r.get("binance_pair"),
+            "coinbase_pair": r.get("coinbase_pair"),
+        })
+    return out
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+serve.py — pre-fork server entry point for the API.
+
+The parent imports the app and warms the dataset snapshot once, then forks
+workers that share the listening socket and inherit the warmed snapshot, so a
+new worker is serving as soon as fork() returns instead of re-importing and
+re-parsing everything.
+
+Worker slot 0 is the primary (boot.primary()): only it runs the server-wide
+background duties (remote data refresh, Telegram alerts, leaderboard
+builds); the other workers just reload and warm the snapshot it writes. A
+worker that keeps crashing right after it starts is restarted with a
+growing delay, and the server exits after MAX_FAST_EXITS in a row.
+
+Usage examples:
+  python serve.py --port 8000                        # app:app (main.py), WEB_CONCURRENCY workers
+  python serve.py --app langgraph_server:app --preload agent_graph --workers 4
+  python serve.py --no-warm                          # start immediately, load on first request
+"""
+import time
+
+_T0 = time.perf_counter()  # before the imports below, so their cost shows up in the startup report
+
+import argparse
+import gc
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import traceback
+from typing import Dict, List
+
+import boot
+import metrics
+
+
+# a worker that dies within this many seconds of its fork counts as a crash at startup;
+# each one in a row doubles the delay before the slot is restarted, and too many stop the server
+FAST_EXIT_SECONDS = 10.0
+MAX_FAST_EXITS = 5
+MAX_BACKOFF_SECONDS = 30.0
+
+
+def _fork_worker(server, sock, slot: int, metrics_dir: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        boot.forked(slot)
+        # every worker's series end up in each /metrics scrape, labelled worker="<slot>"
+        metrics.registry.enable_multiprocess(metrics_dir, slot)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            server.run(sockets=[sock])
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            print(f"serve: worker {os.getpid()} (slot {slot}) failed:", file=sys.stderr)
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+    return pid
+
+
+def _supervise(server, sock, workers: int) -> int:
+    children: Dict[int, int] = {}
+    started: Dict[int, float] = {}     # slot -> monotonic fork time
+    fast_exits: Dict[int, int] = {}    # slot -> consecutive crashes at startup
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    # objects created so far are never collected; keeps the GC from dirtying shared pages
+    gc.freeze()
+    metrics_dir = tempfile.mkdtemp(prefix="algo-metrics-")
+
+    def spawn(slot: int):
+        started[slot] = time.monotonic()
+        children[_fork_worker(server, sock, slot, metrics_dir)] = slot
+
+    for slot in range(workers):
+        spawn(slot)
+    print(f"serve: {workers} workers forked {time.perf_counter() - _T0:.3f}s after start (slot 0 is primary)")
+
+    failed = False
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = children.pop(pid, None)
+        if slot is None or stopping:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        if time.monotonic() - started[slot] < FAST_EXIT_SECONDS:
+            fast_exits[slot] = fast_exits.get(slot, 0) + 1
+        else:
+            fast_exits[slot] = 0
+        if fast_exits[slot] > MAX_FAST_EXITS:
+            print(f"serve: worker slot {slot} exited ({code}) within {FAST_EXIT_SECONDS:.0f}s of starting "
+                  f"{fast_exits[slot]} times in a row; shutting down", file=sys.stderr)
+            failed = True
+            stop(None, None)
+            continue
+        delay = min(MAX_BACKOFF_SECONDS, 2.0 ** (fast_exits[slot] - 1)) if fast_exits[slot] else 0.0
+        print(f"serve: worker {pid} (slot {slot}) exited ({code}), restarting"
+              + (f" in {delay:.0f}s" if delay else ""))
+        if delay:
+            time.sleep(delay)  # the other workers keep serving meanwhile
+            if stopping:
+                continue
+        spawn(slot)
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    return 1 if failed else 0
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Algo Hunter pre-fork API server")
+    parser.add_argument("--app", default="app:app", help="ASGI app as module:attribute")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")),
+                        help="Worker processes (forked after the warm-up)")
+    parser.add_argument("--preload", default=os.getenv("PRELOAD", ""),
+                        help="Comma separated modules to import before forking (e.g. agent_graph)")
+    parser.add_argument("--no-warm", action="store_true", help="Skip loading the dataset before forking")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    module, _, attr = args.app.partition(":")
+    app = getattr(boot.import_module(module), attr or "app")
+    boot.preload([m.strip() for m in args.preload.split(",") if m.strip()], warm=not args.no_warm)
+    phases = ", ".join(f"{k} {v:.3f}s" for k, v in boot.stats()["phases"].items())
+    print(f"serve: {phases}; ready to fork {time.perf_counter() - _T0:.3f}s after start")
+
+    config = uvicorn.Config(app, host=args.host, port=args.port, workers=args.workers)
+    server = uvicorn.Server(config)
+    sock = config.bind_socket()
+    if args.workers <= 1:
+        server.run(sockets=[sock])
+    else:
+        return _supervise(server, sock, args.workers)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+# signals.py
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional: signals are unavailable without numpy
+    np = None
+
+from asset_store import Snapshot
+from config import SIGNAL_THRESHOLD
+
+HISTORY_SAMPLES = int(os.getenv("SIGNAL_HISTORY", "64"))
+MAX_ASSETS = int(os.getenv("SIGNAL_MAX_ASSETS", "20000"))
+
+
+def available() -> bool:
+    return np is not None
+
+
+def _id_price_columns(assets: Sequence[Dict[str, Any]]):
+    if hasattr(assets, "column"):
+        return np.asarray(assets.column("id"), dtype=np.int64), np.asarray(assets.column("price"), dtype=np.float64)
+    if hasattr(assets, "scalar_column"):
+        ids = np.array([-1 if v is None else v for v in assets.scalar_column("id")], dtype=np.int64)
+        prices = np.array([np.nan if v is None else v for v in assets.scalar_column("price")], dtype=np.float64)
+        return ids, prices
+    n = len(assets)
+    ids = np.full(n, -1, dtype=np.int64)
+    prices = np.full(n, np.nan)
+    for i, c in enumerate(assets):
+        if c.get("id") is not None:
+            ids[i] = c["id"]
+        q = c.get("quote")
+        usd = (q.get("USD") or {}) if isinstance(q, dict) else {}
+        try:
+            prices[i] = float(usd.get("price"))
+        except (TypeError, ValueError):
+            pass
+    return ids, prices
+
+
+class SignalEngine:
+    """Rolling price history for the whole universe in one ring buffer.
+
+    prices is a (rows x samples) float64 array; every observed snapshot writes
+    one column at the shared head. Memory is fixed at max_assets x samples x 8
+    bytes once grown, independent of how long the process runs.
+    """
+
+    def __init__(self, samples: int = HISTORY_SAMPLES, max_assets: int = MAX_ASSETS):
+        if np is None:
+            raise RuntimeError("numpy is required for the signal engine")
+        self.samples = samples
+        self.max_assets = max_assets
+        self.prices = np.full((0, samples), np.nan)
+        self.times = np.full(samples, np.nan)
+        self.head = -1
+        self.count = 0
+        self.row_of: Dict[int, int] = {}
+        self.pos_of_row = np.empty(0, dtype=np.int64)  # row -> position in the last snapshot (-1 = absent)
+        self.dropped = 0
+        self._last_key: Optional[Tuple[str, int, int]] = None
+        self._snapshot: Optional[Snapshot] = None
+        self._lock = threading.Lock()
+
+    def _rows_for(self, ids) -> "np.ndarray":
+        rows = np.empty(len(ids), dtype=np.int64)
+        for i, id_ in enumerate(ids.tolist()):
+            r = self.row_of.get(id_)
+            if r is None:
+                if len(self.row_of) >= self.max_assets or id_ < 0:
+                    self.dropped += 1
+                    r = -1
+                else:
+                    r = len(self.row_of)
+                    self.row_of[id_] = r
+            rows[i] = r
+        needed = len(self.row_of)
+        if needed > self.prices.shape[0]:
+            cap = min(self.max_assets, max(needed, 2 * self.prices.shape[0], 1024))
+            grown = np.full((cap, self.samples), np.nan)
+            grown[: self.prices.shape[0]] = self.prices
+            self.prices = grown
+        return rows
+
+    def observe(self, snapshot: Snapshot) -> bool:
+        # record one sample per distinct data file version
+        key = (snapshot.path, snapshot.mtime_ns, snapshot.size)
+        if key == self._last_key:
+            return False
+        ids, prices = _id_price_columns(snapshot.assets)
+        with self._lock:
+            if key == self._last_key:
+                return False
+            rows = self._rows_for(ids)
+            valid = rows >= 0
+            self.head = (self.head + 1) % self.samples
+            self.prices[:, self.head] = np.nan
+            self.prices[rows[valid], self.head] = prices[valid]
+            self.times[self.head] = time.time()
+            self.count = min(self.count + 1, self.samples)
+            pos = np.full(self.prices.shape[0], -1, dtype=np.int64)
+            pos[rows[valid]] = np.flatnonzero(valid)
+            self.pos_of_row = pos
+            self._last_key = key
+            self._snapshot = snapshot
+        return True
+
+    def _change(self, end: int, window: int):
+        cur = self.prices[:, end % self.samples]
+        prev = self.prices[:, (end - window) % self.samples]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(prev > 0, (cur - prev) / prev, np.nan)
+
+    def compute(self, threshold: float = SIGNAL_THRESHOLD, window: int = 1) -> Dict[str, Any]:
+        # percent change over `window` samples for every asset, plus fresh threshold crossings
+        with self._lock:
+            window = max(1, min(window, self.count - 1))
+            if self.count < 2:
+                return {"window": 0, "samples": self.count}
+            change = self._change(self.head, window)
+            if self.count > window + 1:
+                before = self._change(self.head - 1, window)
+                was_above = np.abs(before) >= threshold
+            else:
+                was_above = np.zeros(len(change), dtype=np.bool_)
+            above = np.abs(change) >= threshold
+            return {
+                "window": window,
+                "samples": self.count,
+                "change": change,
+                "above": above,
+                "crossed": above & ~was_above,
+                "price": self.prices[:, self.head].copy(),
+                "prev_price": self.prices[:, (self.head - window) % self.samples].copy(),
+                "pos_of_row": self.pos_of_row,
+                "snapshot": self._snapshot,
+                "since": float(self.times[(self.head - window) % self.samples]),
+            }
+
+    def signals(self, threshold: float = SIGNAL_THRESHOLD, window: int = 1, limit: int = 50,
+                only_crossed: bool = False, ids: Optional[Sequence[int]] = None) -> Dict[str, Any]:
+        res = self.compute(threshold, window)
+        out: Dict[str, Any] = {"threshold": threshold, "window": res["window"], "samples": res["samples"], "signals": []}
+        if "change" not in res:
+            return out
+        mask = res["crossed"] if only_crossed else res["above"]
+        pos_of_row = res["pos_of_row"]
+        if ids is not None:
+            # report the given assets (e.g. search matches) whether or not they moved past the threshold
+            wanted = np.zeros(len(pos_of_row), dtype=np.bool_)
+            wanted[[self.row_of[i] for i in ids if i in self.row_of]] = True
+            mask = wanted & np.isfinite(res["change"])
+        rows = np.flatnonzero(mask & (pos_of_row >= 0))
+        rows = rows[np.argsort(-np.abs(res["change"][rows]), kind="stable")][:limit]
+        assets = res["snapshot"].assets
+        for r in rows.tolist():
+            a = assets[int(pos_of_row[r])]
+            chg = float(res["change"][r])
+            out["signals"].append({
+                "id": a.get("id"),
+                "symbol": (a.get("symbol") or "").upper(),
+                "name": a.get("name"),
+                "price": float(res["price"][r]),
+                "prev_price": float(res["prev_price"][r]),
+                "change": chg,
+                "direction": "up" if chg > 0 else "down",
+                "above_threshold": bool(res["above"][r]),
+                "crossed": bool(res["crossed"][r]),
+            })
+        out["since"] = res["since"]
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "samples": self.count,
+            "capacity": self.samples,
+            "assets": len(self.row_of),
+            "dropped": self.dropped,
+            "bytes": int(self.prices.nbytes),
+        }
+
+
+# shared engine for the API process (None without numpy)
+engine: Optional[SignalEngine] = SignalEngine() if np is not None else None
@@ -0,0 +1,127 @@
+# work_queue.py
+import json
+import os
+import sqlite3
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+LEASE_SECONDS = float(os.getenv("SHARD_LEASE_SECONDS", "120"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    shard       INTEGER PRIMARY KEY,
+    state       TEXT NOT NULL DEFAULT 'pending',  -- pending | leased | done
+    owner       TEXT,
+    lease_until REAL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    records     INTEGER NOT NULL DEFAULT 0,       -- records checkpointed so far
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def shard_of(coin: Dict[str, Any], shards: int) -> int:
+    # stable across processes and runs (unlike hash()); id first, symbol as a fallback
+    key = coin.get("id")
+    if key is None:
+        key = coin.get("slug") or coin.get("symbol") or ""
+    return zlib.crc32(str(key).encode("utf-8")) % shards
+
+
+def shard_positions(coins: List[Dict[str, Any]], shards: int) -> List[List[int]]:
+    # dataset positions per shard, ascending: a shard's checkpoint lines follow this order
+    out: List[List[int]] = [[] for _ in range(shards)]
+    for i, c in enumerate(coins):
+        out[shard_of(c, shards)].append(i)
+    return out
+
+
+class ShardQueue:
+    """SQLite-backed queue of enrichment shards shared by local worker processes.
+
+    claim() leases a pending shard, or one whose lease has run out (its worker
+    died or hung), inside a BEGIN IMMEDIATE transaction, so two processes can
+    never hold the same shard. Workers heartbeat() to extend the lease while
+    alive and before each checkpoint write; release() hands a dead worker's
+    shards back right away instead of waiting for expiry.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._db = sqlite3.connect(path, timeout=30.0, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def _tx(self):
+        self._db.execute("BEGIN IMMEDIATE")
+
+    def prepare(self, shards: int, signature: Dict[str, Any]) -> bool:
+        """Create the shard rows for this universe; True if earlier progress is kept.
+
+        A queue built for different input (signature mismatch) or shard count is reset.
+        """
+        sig = json.dumps({"shards": shards, **signature}, sort_keys=True)
+        self._tx()
+        try:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+            resume = row is not None and row[0] == sig
+            if not resume:
+                self._db.execute("DELETE FROM shards")
+                self._db.executemany("INSERT INTO shards (shard) VALUES (?)", [(k,) for k in range(shards)])
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES ('signature', ?)", (sig,))
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        return resume
+
+    def claim(self, owner: str) -> Optional[Tuple[int, int]]:
+        # (shard, records already checkpointed) or None when nothing is claimable right now
+        now = time.time()
+        self._tx()
+        try:
+            row = self._db.execute(
+                "SELECT shard, records FROM shards WHERE state = 'pending' "
+                "OR (state = 'leased' AND lease_until < ?) ORDER BY state = 'leased', shard LIMIT 1", (now,)).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE shards SET state = 'leased', owner = ?, lease_until = ?, "
+                                 "attempts = attempts + 1 WHERE shard = ?", (owner, now + self.lease_seconds, row[0]))
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        return (row[0], row[1]) if row is not None else None
+
+    def heartbeat(self, shard: int, owner: str, records: Optional[int] = None) -> bool:
+        # False if the lease was lost (expired and reclaimed): the caller must stop working on it
+        cur = self._db.execute("UPDATE shards SET lease_until = ?, records = COALESCE(?, records) "
+                               "WHERE shard = ? AND owner = ? AND state = 'leased'",
+                               (time.time() + self.lease_seconds, records, shard, owner))
+        return cur.rowcount == 1
+
+    def complete(self, shard: int, owner: str, records: int) -> bool:
+        cur = self._db.execute("UPDATE shards SET state = 'done', lease_until = NULL, records = ?, finished_at = ? "
+                               "WHERE shard = ? AND owner = ? AND state = 'leased'",
+                               (records, time.time(), shard, owner))
+        return cur.rowcount == 1
+
+    def release(self, owner: str) -> int:
+        cur = self._db.execute("UPDATE shards SET state = 'pending', owner = NULL, lease_until = NULL "
+                               "WHERE owner = ? AND state = 'leased'", (owner,))
+        return cur.rowcount
+
+    def remaining(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM shards WHERE state != 'done'").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        counts = dict(self._db.execute("SELECT state, COUNT(*) FROM shards GROUP BY state").fetchall())
+        records, reclaimed = self._db.execute(
+            "SELECT COALESCE(SUM(records), 0), COALESCE(SUM(MAX(attempts - 1, 0)), 0) FROM shards").fetchone()
+        return {"pending": counts.get("pending", 0), "leased": counts.get("leased", 0), "done": counts.get("done", 0),
+                "records": records, "reclaimed": reclaimed}